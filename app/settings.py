@@ -14,6 +14,7 @@ from pathlib import Path
 
 import dj_database_url
 from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -60,8 +61,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "donations.logs.CorrelationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "donations.metrics.MetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -72,17 +75,29 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "app.urls"
 
+# Em produção os templates são compilados uma vez por processo (cached
+# loader, aquecido pelo gunicorn.conf.py); em DEBUG, relidos a cada requisição
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "donations.context_processors.cache_settings",
             ],
+            "loaders": (
+                TEMPLATE_LOADERS
+                if DEBUG
+                else [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)]
+            ),
         },
     },
 ]
@@ -95,17 +110,97 @@ WSGI_APPLICATION = "app.wsgi.application"
 
 DATABASE_URL = config("DATABASE_URL", default=None)
 
+# Conexões persistentes: reusadas por até DB_CONN_MAX_AGE segundos (0 abre
+# uma conexão por requisição) e verificadas antes do reuso
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool)
+
+# Pool de conexões nativo do psycopg 3 (requer psycopg[pool] e PostgreSQL).
+# Substitui as conexões persistentes; cada processo mantém de MIN a MAX
+# conexões, e uma requisição espera até DB_POOL_TIMEOUT segundos por uma livre
+DB_POOL_ENABLED = config("DB_POOL_ENABLED", default=False, cast=bool)
+DB_POOL_MIN_SIZE = config("DB_POOL_MIN_SIZE", default=2, cast=int)
+DB_POOL_MAX_SIZE = config("DB_POOL_MAX_SIZE", default=10, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", default=10.0, cast=float)
+
 if DATABASE_URL:
-    DATABASES = {"default": dj_database_url.parse(DATABASE_URL)}
+    DATABASES = {
+        "default": dj_database_url.parse(
+            DATABASE_URL,
+            # O Django não aceita conexões persistentes junto com o pool
+            conn_max_age=0 if DB_POOL_ENABLED else DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
+    }
+    if DB_POOL_ENABLED:
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+        }
 else:
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
         }
     }
 
 
+# Cache
+# Sem CACHE_URL, memória local de cada processo; com redis://host:6379/0
+# (requer o pacote redis), compartilhado entre processos e servidores.
+# FRAGMENT_CACHE_URL configura o cache dos trechos de template ({% cache %}).
+# O cache "shared" guarda o estado que precisa valer para todos os processos
+# (circuit breaker): com Redis, o mesmo servidor; sem CACHE_URL, uma tabela
+# no banco (criada pelo `createcachetable` do entrypoint). locmem:// força a
+# memória local em ambos
+
+CACHE_URL = config("CACHE_URL", default="")
+FRAGMENT_CACHE_URL = config("FRAGMENT_CACHE_URL", default="")
+CACHE_KEY_PREFIX = config("CACHE_KEY_PREFIX", default="projeto-social")
+
+
+def _cache_backend(url: str, location: str) -> dict:
+    if not url or url == "locmem://":
+        return {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": location,
+        }
+    if url.startswith(("redis://", "rediss://")):
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": url,
+            "KEY_PREFIX": CACHE_KEY_PREFIX,
+        }
+    raise ImproperlyConfigured(f"URL de cache não suportada: {url}")
+
+
+def _shared_cache_backend(url: str) -> dict:
+    if url:
+        return _cache_backend(url, "shared")
+    return {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_compartilhado",
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+    }
+
+
+CACHES = {
+    "default": _cache_backend(CACHE_URL, "default"),
+    "template_fragments": _cache_backend(FRAGMENT_CACHE_URL, "template_fragments"),
+    "shared": _shared_cache_backend(CACHE_URL),
+}
+
+# Página de doação em cache para visitantes anônimos (sem sessão), com o
+# token CSRF de cada visitante inserido na resposta; 0 desativa
+PAGE_CACHE_SECONDS = config("PAGE_CACHE_SECONDS", default=300, cast=int)
+# Trechos de template em cache (cabeçalho, menu, rodapé); 0 desativa
+FRAGMENT_CACHE_SECONDS = config("FRAGMENT_CACHE_SECONDS", default=600, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -144,13 +239,21 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
-# Whitenoise configuration
+# Whitenoise configuration: o collectstatic minifica o CSS próprio, gera as
+# variantes das imagens, adiciona o hash ao nome dos arquivos (cache de longo
+# prazo no navegador) e grava versões gzip e Brotli
 STORAGES = {
     "staticfiles": {
-        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+        "BACKEND": "donations.storage.StaticFilesStorage",
     },
 }
 
+# Variantes das imagens geradas no collectstatic (AVIF, WebP e PNG), por
+# largura em pixels, servidas pela tag {% picture %}
+STATIC_IMAGE_VARIANTS = {
+    "logo.png": [40, 64, 80, 120, 240],
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -166,6 +269,115 @@ MP_BASE_API_URL = config("MP_BASE_API_URL", default="https://api.mercadopago.com
 NOTIFICATION_URL = config("NOTIFICATION_URL", default="")
 BASE_APPLICATION_URL = config("BASE_APPLICATION_URL", default="http://localhost:8000")
 
+# Conexões HTTP com o Mercado Pago (pool por processo, keep-alive e retry)
+MP_HTTP_POOL_SIZE = config("MP_HTTP_POOL_SIZE", default=10, cast=int)
+MP_CONNECT_TIMEOUT = config("MP_CONNECT_TIMEOUT", default=5.0, cast=float)
+MP_READ_TIMEOUT = config("MP_READ_TIMEOUT", default=30.0, cast=float)
+MP_MAX_RETRIES = config("MP_MAX_RETRIES", default=2, cast=int)
+MP_RETRY_BACKOFF = config("MP_RETRY_BACKOFF", default=0.5, cast=float)
+MP_PRECONNECT = config("MP_PRECONNECT", default=False, cast=bool)
+# Conexões simultâneas do cliente assíncrono (AsyncMercadoPagoService)
+MP_ASYNC_POOL_SIZE = config("MP_ASYNC_POOL_SIZE", default=100, cast=int)
+
+# Cache em memória de get_payment_info (TTL em segundos; tamanho 0 desativa).
+# Com CACHE_URL, as respostas também ficam no cache padrão, compartilhado
+# com o worker de webhooks
+MP_CACHE_MAX_SIZE = config("MP_CACHE_MAX_SIZE", default=1024, cast=int)
+MP_CACHE_PENDING_TTL = config("MP_CACHE_PENDING_TTL", default=5.0, cast=float)
+MP_CACHE_TERMINAL_TTL = config("MP_CACHE_TERMINAL_TTL", default=3600.0, cast=float)
+
+# Circuit breaker do Mercado Pago: com ao menos MP_BREAKER_MIN_CALLS chamadas
+# na janela (segundos) e essa taxa de falhas (erros ou chamadas mais lentas
+# que MP_BREAKER_SLOW_CALL_SECONDS), as chamadas falham na hora por
+# MP_BREAKER_OPEN_SECONDS. O estado fica no cache "shared", compartilhado
+# entre os workers (Redis com CACHE_URL, senão o banco)
+MP_BREAKER_ENABLED = config("MP_BREAKER_ENABLED", default=True, cast=bool)
+MP_BREAKER_FAILURE_RATE = config("MP_BREAKER_FAILURE_RATE", default=0.5, cast=float)
+MP_BREAKER_MIN_CALLS = config("MP_BREAKER_MIN_CALLS", default=5, cast=int)
+MP_BREAKER_SLOW_CALL_SECONDS = config("MP_BREAKER_SLOW_CALL_SECONDS", default=10.0, cast=float)
+MP_BREAKER_WINDOW = config("MP_BREAKER_WINDOW", default=60, cast=int)
+MP_BREAKER_OPEN_SECONDS = config("MP_BREAKER_OPEN_SECONDS", default=30, cast=int)
+
+# Fila de webhooks do Mercado Pago (comando process_webhooks)
+WEBHOOK_BATCH_SIZE = config("WEBHOOK_BATCH_SIZE", default=50, cast=int)
+WEBHOOK_CONCURRENCY = config("WEBHOOK_CONCURRENCY", default=4, cast=int)
+WEBHOOK_MAX_ATTEMPTS = config("WEBHOOK_MAX_ATTEMPTS", default=8, cast=int)
+WEBHOOK_RETRY_BACKOFF = config("WEBHOOK_RETRY_BACKOFF", default=30, cast=int)
+WEBHOOK_RETRY_MAX_DELAY = config("WEBHOOK_RETRY_MAX_DELAY", default=3600, cast=int)
+WEBHOOK_LOCK_TIMEOUT = config("WEBHOOK_LOCK_TIMEOUT", default=300, cast=int)
+# Notificações do mesmo pagamento recebidas dentro desta janela (segundos) de
+# uma consulta em andamento ou recém-concluída são agrupadas a ela
+WEBHOOK_DEDUP_WINDOW = config("WEBHOOK_DEDUP_WINDOW", default=10, cast=int)
+# Porta das métricas do Prometheus do worker (0 desativa)
+WEBHOOK_METRICS_PORT = config("WEBHOOK_METRICS_PORT", default=0, cast=int)
+
+# Estoque de cobranças PIX pré-criadas para os valores sugeridos (comando
+# refill_pix_pool). Validade e sobra mínima para uso em minutos
+PIX_POOL_ENABLED = config("PIX_POOL_ENABLED", default=False, cast=bool)
+PIX_POOL_AMOUNTS = config("PIX_POOL_AMOUNTS", default="5,10,20,30,40,50,100", cast=Csv())
+PIX_POOL_SIZE = config("PIX_POOL_SIZE", default=5, cast=int)
+PIX_POOL_EXPIRATION = config("PIX_POOL_EXPIRATION", default=1440, cast=int)
+PIX_POOL_MIN_REMAINING = config("PIX_POOL_MIN_REMAINING", default=30, cast=int)
+
+# QR Code PIX gerado localmente a partir do código copia e cola: imagens em
+# cache por processo e, opcionalmente, em disco (compartilhado)
+QR_CACHE_SIZE = config("QR_CACHE_SIZE", default=256, cast=int)
+QR_CACHE_DIR = config("QR_CACHE_DIR", default="")
+QR_DEFAULT_SIZE = config("QR_DEFAULT_SIZE", default=300, cast=int)
+
+# Stream (SSE) de status na página de aguardando pagamento. Ative apenas
+# quando a aplicação for servida via ASGI (app.asgi:application)
+SSE_ENABLED = config("SSE_ENABLED", default=False, cast=bool)
+SSE_POLL_INTERVAL = config("SSE_POLL_INTERVAL", default=0.5, cast=float)
+SSE_HEARTBEAT = config("SSE_HEARTBEAT", default=15.0, cast=float)
+SSE_MAX_DURATION = config("SSE_MAX_DURATION", default=600.0, cast=float)
+
+# Views assíncronas de doação, aguardando pagamento e webhook. Ative apenas
+# quando a aplicação for servida via ASGI (app.asgi:application)
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+
+# Paginação do dashboard por cursor ("mais recentes"/"mais antigas", sem
+# COUNT nem OFFSET). Desative para voltar à paginação numerada
+DASHBOARD_CURSOR_PAGINATION = config("DASHBOARD_CURSOR_PAGINATION", default=True, cast=bool)
+
+# Endpoint /metrics (Prometheus): liberado para a equipe (is_staff) e para
+# estas redes. Vazio por padrão: atrás de um proxy no mesmo host, REMOTE_ADDR
+# é o endereço do proxy e liberar o loopback abriria o endpoint para todos
+METRICS_ALLOWED_NETWORKS = config("METRICS_ALLOWED_NETWORKS", default="", cast=Csv())
+
+# Logs estruturados (JSON, ou "text" em desenvolvimento) gravados no stdout
+# por uma thread dedicada: as requisições só enfileiram o registro (até
+# LOG_QUEUE_SIZE; com a fila cheia, ele é descartado). Valores dos campos
+# extras são truncados em LOG_MAX_FIELD_LENGTH caracteres, e o payload das
+# consultas ao Mercado Pago é registrado em uma fração LOG_PAYLOAD_SAMPLE_RATE
+LOG_LEVEL = config("LOG_LEVEL", default="INFO")
+LOG_FORMAT = config("LOG_FORMAT", default="json")
+LOG_QUEUE_SIZE = config("LOG_QUEUE_SIZE", default=10000, cast=int)
+LOG_MAX_FIELD_LENGTH = config("LOG_MAX_FIELD_LENGTH", default=256, cast=int)
+LOG_PAYLOAD_SAMPLE_RATE = config("LOG_PAYLOAD_SAMPLE_RATE", default=0.0, cast=float)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "correlation": {"()": "donations.logs.CorrelationFilter"},
+    },
+    "handlers": {
+        "queue": {
+            "class": "donations.logs.QueueHandler",
+            "filters": ["correlation"],
+            "log_format": LOG_FORMAT,
+            "max_length": LOG_MAX_FIELD_LENGTH,
+            "queue_size": LOG_QUEUE_SIZE,
+        },
+    },
+    "root": {"handlers": ["queue"], "level": LOG_LEVEL},
+    "loggers": {
+        # Sem os handlers padrão do Django (console e e-mail aos admins)
+        "django": {"handlers": ["queue"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
+
 # Login configuration
 LOGIN_URL = "/admin/login/"
 LOGIN_REDIRECT_URL = "/dashboard/"
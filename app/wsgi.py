@@ -7,10 +7,20 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Sob WSGI cada requisição de uma view assíncrona cria e encerra um event
+# loop, ocupando a thread do worker do mesmo jeito: não há ganho, só custo
+if settings.ASYNC_VIEWS or settings.SSE_ENABLED:
+    logging.getLogger(__name__).warning(
+        "ASYNC_VIEWS/SSE_ENABLED ativos com a aplicação servida via WSGI; "
+        "use app.asgi:application com um worker ASGI (uvicorn)."
+    )
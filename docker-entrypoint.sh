@@ -9,13 +9,19 @@ echo "🚀 Starting Django application..."
 echo "⏳ Checking database connection..."
 python manage.py wait_for_db --timeout=60
 
-# Run migrations
-echo "📦 Running database migrations..."
-python manage.py migrate --noinput
+# Migrations and static files are prepared by the web container only;
+# other services (the webhook worker) set RUN_SETUP=False
+if [ "${RUN_SETUP:-True}" = "True" ]; then
+    # Run migrations
+    echo "📦 Running database migrations..."
+    python manage.py migrate --noinput
+    # Database cache table (shared circuit breaker state without CACHE_URL)
+    python manage.py createcachetable
 
-# Collect static files
-echo "📁 Collecting static files..."
-python manage.py collectstatic --noinput
+    # Collect static files
+    echo "📁 Collecting static files..."
+    python manage.py collectstatic --noinput
+fi
 
 echo "✅ Django application is ready!"
 
@@ -1,18 +1,79 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db import transaction
 
-from .models import Payment
+from .models import DonationRollup, Payment, PixPoolCharge
+from .pagination import EstimatedCountPaginator
+from .rollups import ROLLUP_FIELDS, record_change, record_changes, save_payment, snapshot
+
+
+class PaymentChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        # A listagem carrega apenas as colunas exibidas
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.only(*PaymentAdmin.list_display)
 
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ["id", "valor", "tipo_doacao", "status", "nome_doador", "data"]
     list_filter = ["status", "tipo_doacao", "data"]
-    search_fields = ["nome_doador", "email_doador", "payment_id"]
+    date_hierarchy = "data"
+    # ID do Mercado Pago e email por igualdade (índices único e em
+    # UPPER(email_doador)); o nome por trecho (índice trigram no PostgreSQL)
+    search_fields = ["payment_id__exact", "email_doador__iexact", "nome_doador"]
+    search_help_text = "ID do pagamento ou email completos, ou parte do nome do doador"
     readonly_fields = ["data"]
     list_per_page = 20
+    # Sem COUNT(*) da tabela inteira; a contagem filtrada é estimada
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
     fieldsets = (
         ("Informações da Doação", {"fields": ("valor", "tipo_doacao", "status")}),
         ("Dados do Doador", {"fields": ("nome_doador", "email_doador")}),
         ("Informações do Pagamento", {"fields": ("payment_id", "payment_url", "data")}),
     )
+
+    def get_changelist(self, request, **kwargs):
+        return PaymentChangeList
+
+    # Alterações feitas pelo admin também atualizam os totais por período
+    def save_model(self, request, obj, form, change):
+        save_payment(obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            before = snapshot(obj)
+            super().delete_model(request, obj)
+            record_change(before, None)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            befores = [snapshot(payment) for payment in queryset.only(*ROLLUP_FIELDS)]
+            super().delete_queryset(request, queryset)
+            record_changes((before, None) for before in befores)
+
+
+@admin.register(PixPoolCharge)
+class PixPoolChargeAdmin(admin.ModelAdmin):
+    list_display = ["id", "valor", "payment_id", "expira_em", "descartada", "criado_em"]
+    list_filter = ["valor", "descartada"]
+    readonly_fields = ["criado_em"]
+    exclude = ["qr_code_png", "qr_code_emv"]
+    list_per_page = 20
+
+
+@admin.register(DonationRollup)
+class DonationRollupAdmin(admin.ModelAdmin):
+    list_display = ["inicio", "granularidade", "status", "tipo_doacao", "quantidade", "total"]
+    list_filter = ["granularidade", "status", "tipo_doacao"]
+    date_hierarchy = "inicio"
+    list_per_page = 50
+
+    # Mantidos pelo sistema (e recalculados com `rebuild_rollups`)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -6,4 +6,6 @@ class DonationsConfig(AppConfig):
     name = "donations"
 
     def ready(self):
+        import donations.checks  # noqa
+        import donations.metrics  # noqa
         import donations.signals  # noqa
@@ -0,0 +1,88 @@
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+
+@register()
+def check_database_connections(app_configs, **kwargs):
+    """
+    Valida a configuração de conexões com o banco (DB_CONN_* e DB_POOL_*).
+
+    Executado pelo `migrate` do docker-entrypoint.sh, então uma configuração
+    inválida impede a aplicação de subir em vez de falhar na primeira
+    requisição.
+    """
+    errors = []
+
+    if settings.DB_CONN_MAX_AGE < 0:
+        errors.append(
+            Error(
+                "DB_CONN_MAX_AGE não pode ser negativo.",
+                hint="Use 0 para abrir uma conexão por requisição.",
+                id="donations.E001",
+            )
+        )
+
+    if settings.DB_POOL_ENABLED:
+        engine = settings.DATABASES["default"]["ENGINE"]
+        if "postgresql" not in engine:
+            errors.append(
+                Error(
+                    f"DB_POOL_ENABLED requer PostgreSQL (banco configurado: {engine}).",
+                    hint="Configure DATABASE_URL ou desative DB_POOL_ENABLED.",
+                    id="donations.E002",
+                )
+            )
+        elif find_spec("psycopg") is None or find_spec("psycopg_pool") is None:
+            errors.append(
+                Error(
+                    "DB_POOL_ENABLED requer o psycopg 3 com o pacote de pool.",
+                    hint='Instale "psycopg[binary,pool]".',
+                    id="donations.E003",
+                )
+            )
+
+        if not 0 < settings.DB_POOL_MIN_SIZE <= settings.DB_POOL_MAX_SIZE:
+            errors.append(
+                Error(
+                    "DB_POOL_MIN_SIZE deve ser maior que zero e não maior que DB_POOL_MAX_SIZE.",
+                    id="donations.E004",
+                )
+            )
+        if settings.DB_POOL_TIMEOUT <= 0:
+            errors.append(
+                Error("DB_POOL_TIMEOUT deve ser maior que zero.", id="donations.E005")
+            )
+    elif settings.DB_CONN_MAX_AGE and (settings.ASYNC_VIEWS or settings.SSE_ENABLED):
+        # Sob ASGI cada requisição roda em outra thread/contexto e as conexões
+        # persistentes não são reaproveitadas, apenas acumulam
+        errors.append(
+            Warning(
+                "Conexões persistentes (DB_CONN_MAX_AGE) não são reaproveitadas sob ASGI.",
+                hint="Com ASYNC_VIEWS ou SSE_ENABLED, use DB_POOL_ENABLED ou DB_CONN_MAX_AGE=0.",
+                id="donations.W001",
+            )
+        )
+
+    return errors
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    O estado do circuit breaker fica no cache "shared": em memória local
+    (CACHE_URL=locmem://), cada worker tem o seu e abre (ou fecha) o
+    circuito sozinho.
+    """
+    backend = settings.CACHES["shared"]["BACKEND"]
+    if settings.MP_BREAKER_ENABLED and backend.endswith("LocMemCache"):
+        return [
+            Warning(
+                "MP_BREAKER_ENABLED com cache em memória local: o estado do "
+                "circuit breaker não é compartilhado entre os workers.",
+                hint="Configure CACHE_URL com o Redis ou deixe-o vazio (cache no banco).",
+                id="donations.W002",
+            )
+        ]
+    return []
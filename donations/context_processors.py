@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def cache_settings(request):
+    """Tempo de cache dos trechos de template, usado pela tag {% cache %}."""
+    return {"fragment_cache_timeout": settings.FRAGMENT_CACHE_SECONDS}
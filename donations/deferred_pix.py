@@ -0,0 +1,40 @@
+"""
+Doações com o PIX adiado: registradas com o circuito do Mercado Pago aberto,
+têm a cobrança gerada quando a página de aguardando pagamento é recarregada
+com o serviço de volta.
+
+A marcação fica no banco (`Payment.pix_adiado_em`), visível a todos os
+workers e preservada entre reinícios.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Payment
+
+# Por quanto tempo ainda se tenta gerar o PIX de uma doação adiada
+DEFERRED_PIX_TIMEOUT = timedelta(hours=24)
+
+
+def defer_pix(payment):
+    payment.pix_adiado_em = timezone.now()
+    Payment.objects.filter(pk=payment.pk).update(pix_adiado_em=payment.pix_adiado_em)
+
+
+def claim_deferred_pix(payment) -> bool:
+    """
+    Retira a marcação com um UPDATE condicional; só uma requisição a obtém,
+    então só ela gera o PIX (quem falhar ao gerar deve chamar `defer_pix`
+    de novo).
+    """
+    claimed = Payment.objects.filter(
+        pk=payment.pk,
+        status="pending",
+        payment_id__isnull=True,
+        pix_adiado_em__gte=timezone.now() - DEFERRED_PIX_TIMEOUT,
+    ).update(pix_adiado_em=None)
+    if claimed:
+        # Evita que o `save()` seguinte regrave a marcação já retirada
+        payment.pix_adiado_em = None
+    return bool(claimed)
@@ -0,0 +1,90 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Payment
+
+
+def _fetch_statuses(payment_ids: list[int]) -> dict[int, str]:
+    close_old_connections()
+    try:
+        return dict(
+            Payment.objects.filter(pk__in=payment_ids).values_list("id", "status")
+        )
+    finally:
+        close_old_connections()
+
+
+class PaymentStatusBroadcaster:
+    """
+    Distribui mudanças de status de pagamento para as conexões SSE do processo.
+
+    O status é gravado pelo worker de webhooks (outro processo), então um
+    único loop por processo consulta o banco a cada `interval` segundos, com
+    uma só query para todos os pagamentos observados, e entrega as mudanças
+    às filas dos assinantes. Assim o custo não cresce com o número de
+    doadores conectados ao mesmo pagamento nem exige uma conexão com o banco
+    por cliente.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+        self._last_status: dict[int, str] = {}
+        self._task = None
+
+    def subscribe(self, payment_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(payment_id, set()).add(queue)
+
+        # O status atual é entregue imediatamente se já for conhecido
+        if payment_id in self._last_status:
+            queue.put_nowait(self._last_status[payment_id])
+
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, payment_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(payment_id)
+        if queues is None:
+            return
+
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[payment_id]
+            self._last_status.pop(payment_id, None)
+
+    async def _run(self):
+        while self._subscribers:
+            payment_ids = list(self._subscribers)
+            try:
+                statuses = await sync_to_async(_fetch_statuses, thread_sensitive=False)(
+                    payment_ids
+                )
+            except Exception:
+                statuses = {}  # Falha temporária do banco: tenta no próximo ciclo
+
+            for payment_id, status in statuses.items():
+                if self._last_status.get(payment_id) == status:
+                    continue
+                self._last_status[payment_id] = status
+                for queue in self._subscribers.get(payment_id, ()):
+                    queue.put_nowait(status)
+
+            await asyncio.sleep(self.interval)
+
+
+_broadcaster = None
+
+
+def get_broadcaster() -> PaymentStatusBroadcaster:
+    """Retorna o broadcaster do processo (criado no event loop atual)."""
+    global _broadcaster
+
+    if _broadcaster is None:
+        _broadcaster = PaymentStatusBroadcaster(interval=settings.SSE_POLL_INTERVAL)
+    return _broadcaster
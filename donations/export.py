@@ -0,0 +1,175 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Payment
+
+# Colunas exportadas (nunca o QR Code, que fica em PaymentPixArtifact)
+EXPORT_FIELDS = [
+    "id",
+    "data",
+    "valor",
+    "status",
+    "tipo_doacao",
+    "nome_doador",
+    "email_doador",
+    "payment_id",
+    "atualizado_em",
+]
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+# Linhas lidas do banco por vez e linhas agrupadas em cada bloco gerado
+CHUNK_SIZE = 2000
+
+# Início de célula que o Excel/LibreOffice interpretam como fórmula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def parse_filters(status: str | None, start: str | None, end: str | None):
+    """
+    Valida os filtros da exportação (datas no formato AAAA-MM-DD).
+
+    Returns:
+        tuple: (filtros para `export_queryset`, mensagem de erro ou None)
+    """
+    if status and status not in dict(Payment.STATUS_CHOICES):
+        return None, f"Status inválido: {status}."
+
+    filters = {"status": status or None}
+    for name, value in (("start", start), ("end", end)):
+        try:
+            filters[name] = parse_date(value) if value else None
+        except ValueError:
+            filters[name] = None
+        if value and filters[name] is None:
+            return None, f"Data inválida: {value} (use AAAA-MM-DD)."
+
+    if filters["start"] and filters["end"] and filters["start"] > filters["end"]:
+        return None, "A data inicial deve ser anterior à data final."
+    return filters, None
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(status: str | None = None, start: date | None = None, end: date | None = None):
+    """
+    Pagamentos a exportar, como tuplas na ordem de `EXPORT_FIELDS`.
+
+    `start` e `end` são dias inclusivos; o filtro é uma faixa de `data`
+    (e não `data__date`) para usar os índices.
+    """
+    queryset = Payment.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    if start:
+        queryset = queryset.filter(data__gte=_day_start(start))
+    if end:
+        queryset = queryset.filter(data__lt=_day_start(end + timedelta(days=1)))
+    return queryset.order_by("data", "id").values_list(*EXPORT_FIELDS)
+
+
+def _rows(queryset, chunk_size: int):
+    # iterator() não guarda as linhas no cache do queryset; no PostgreSQL usa
+    # um cursor no servidor, lendo `chunk_size` linhas por vez
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def csv_safe(value):
+    """
+    Neutraliza textos que a planilha executaria como fórmula (o nome do
+    doador vem do formulário público), prefixando-os com `'`.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def iter_csv(queryset, chunk_size: int = CHUNK_SIZE):
+    """Gera o CSV (com cabeçalho) em blocos de até `chunk_size` linhas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+
+    for count, row in enumerate(_rows(queryset, chunk_size), start=1):
+        writer.writerow([csv_safe(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_jsonl(queryset, chunk_size: int = CHUNK_SIZE):
+    """Gera um objeto JSON por linha (JSON Lines), em blocos de `chunk_size` linhas."""
+    lines = []
+    for row in _rows(queryset, chunk_size):
+        lines.append(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder, ensure_ascii=False)
+        )
+        if len(lines) == chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_export(queryset, fmt: str, compress: bool = False, chunk_size: int = CHUNK_SIZE):
+    """
+    Gera a exportação em blocos de bytes, opcionalmente compactada em gzip.
+
+    A memória usada não depende do número de pagamentos: apenas um bloco de
+    linhas existe de cada vez.
+    """
+    chunks = iter_csv(queryset, chunk_size) if fmt == "csv" else iter_jsonl(queryset, chunk_size)
+
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode()
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def aiter_export(queryset, fmt: str, compress: bool = False, chunk_size: int = CHUNK_SIZE):
+    """
+    Versão assíncrona de `iter_export`, para respostas servidas via ASGI.
+
+    Sob ASGI, o Django consome um iterador síncrono inteiro (em memória)
+    antes de enviar a resposta. Aqui cada bloco é gerado na thread das
+    views síncronas (a mesma conexão com o banco e o mesmo cursor) e
+    enviado antes do próximo. Se o cliente desconectar, o gerador (e o
+    cursor do banco) é fechado nessa mesma thread.
+    """
+    chunks = iter_export(queryset, fmt, compress, chunk_size)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def export_filename(fmt: str, compress: bool = False) -> str:
+    name = f"doacoes-{timezone.localdate():%Y%m%d}.{fmt}"
+    return f"{name}.gz" if compress else name
@@ -0,0 +1,273 @@
+"""
+Logs estruturados (JSON) que não bloqueiam as requisições.
+
+O handler da aplicação apenas coloca o registro em uma fila em memória; uma
+thread dedicada (QueueListener) monta o JSON e grava no stdout. Com a fila
+cheia, o registro é descartado em vez de a requisição esperar.
+
+Cada registro leva os IDs de correlação do contexto atual (`request_id`,
+`donation_id`, `mp_payment_id`, `webhook_job_id`), que ligam a doação, o
+pagamento no Mercado Pago e os webhooks. Nos campos extras, as chaves
+sensíveis são mascaradas e os valores grandes, truncados.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Chaves mascaradas em qualquer nível dos campos extras
+SENSITIVE_KEYS = {
+    "access_token",
+    "address",
+    "authorization",
+    "card_number",
+    "cardholder",
+    "cpf",
+    "email",
+    "first_name",
+    "identification",
+    "last_name",
+    "password",
+    "phone",
+    "security_code",
+    "token",
+}
+REDACTED = "[redacted]"
+MAX_ITEMS = 20
+MAX_DEPTH = 5
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Atributos próprios do LogRecord; os demais vieram de `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def redact(value, max_length: int = 256, depth: int = 0):
+    """Cópia de `value` com chaves sensíveis mascaradas e valores grandes truncados."""
+    if depth > MAX_DEPTH:
+        return "[...]"
+    if isinstance(value, dict):
+        return {
+            key: REDACTED
+            if str(key).lower() in SENSITIVE_KEYS
+            else redact(item, max_length, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple, set)):
+        items = [redact(item, max_length, depth + 1) for item in list(value)[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            items.append(f"[+{len(value) - MAX_ITEMS} itens]")
+        return items
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+
+    value = str(value)
+    if len(value) > max_length:
+        return f"{value[:max_length]}[+{len(value) - max_length} caracteres]"
+    return value
+
+
+def payment_log_fields(data: dict) -> dict:
+    """
+    Campos de log de um pagamento do Mercado Pago: o resumo sempre, o payload
+    completo (mascarado e truncado na gravação) só em uma amostra de
+    LOG_PAYLOAD_SAMPLE_RATE.
+    """
+    fields = {
+        "mp_payment_id": data.get("id"),
+        "mp_status": data.get("status"),
+        "mp_status_detail": data.get("status_detail"),
+    }
+    if random.random() < settings.LOG_PAYLOAD_SAMPLE_RATE:
+        fields["payload"] = data
+    return fields
+
+
+# --- IDs de correlação ---
+
+# IDs do escopo atual (requisição ou job), aberto por `correlation`. O
+# dicionário é compartilhado com as threads do sync_to_async, que copiam o
+# contexto: o que elas acrescentam vale para o resto da requisição
+_correlation = ContextVar("log_correlation", default=None)
+
+
+def _valid(ids: dict) -> dict:
+    return {key: value for key, value in ids.items() if value is not None}
+
+
+@contextmanager
+def correlation(**ids):
+    """Abre um escopo de correlação, herdando os IDs do escopo externo."""
+    token = _correlation.set({**(_correlation.get() or {}), **_valid(ids)})
+    try:
+        yield
+    finally:
+        _correlation.reset(token)
+
+
+def bind(**ids):
+    """Acrescenta IDs ao escopo atual (fora de um escopo, não faz nada)."""
+    current = _correlation.get()
+    if current is not None:
+        current.update(_valid(ids))
+
+
+class CorrelationFilter(logging.Filter):
+    """Copia os IDs de correlação para o registro (os de `extra` têm precedência)."""
+
+    def filter(self, record):
+        for key, value in (_correlation.get() or {}).items():
+            record.__dict__.setdefault(key, value)
+        return True
+
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[\w.-]{1,64}$")
+
+
+class CorrelationMiddleware:
+    """
+    Identifica cada requisição (`request_id`): reaproveita o X-Request-ID do
+    proxy, se válido, e o devolve na resposta.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def request_id(self, request) -> str:
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        return incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        request_id = self.request_id(request)
+        with correlation(request_id=request_id):
+            response = self.get_response(request)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id = self.request_id(request)
+        with correlation(request_id=request_id):
+            response = await self.get_response(request)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+# --- Formatação e gravação ---
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos extras mascarados."""
+
+    def __init__(self, max_length: int = 256):
+        super().__init__()
+        self.max_length = max_length
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        extra = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+        entry.update(redact(extra, self.max_length))
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_queue_handlers = weakref.WeakSet()
+_exception_formatter = logging.Formatter()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Handler dos logs da aplicação: enfileira o registro e retorna; a gravação
+    no `stream` (stdout) fica com a thread do QueueListener.
+    """
+
+    def __init__(self, log_format="json", max_length=256, queue_size=10000, stream=None):
+        # SimpleQueue (implementada em C) custa menos por registro que
+        # queue.Queue; o limite de tamanho é verificado em `enqueue`
+        super().__init__(queue.SimpleQueue())
+        self.queue_size = queue_size
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(
+            JsonFormatter(max_length) if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+        )
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+        # Registros descartados com a fila cheia
+        self.dropped = 0
+        _queue_handlers.add(self)
+
+    def prepare(self, record):
+        # Na thread da requisição, só o que não pode esperar: a mensagem e o
+        # traceback (que referencia frames ainda vivos). O JSON é montado na
+        # thread do listener. O registro não é copiado: os demais handlers
+        # (se houver) continuam obtendo a mesma mensagem e traceback
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.queue_size:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+    def close(self):
+        # Grava o que ainda está na fila (chamado pelo logging.shutdown na saída)
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+    def _restart_after_fork(self):
+        self.queue = queue.SimpleQueue()
+        self.listener.queue = self.queue
+        self.listener._thread = None
+        self.listener.start()
+
+
+def _restart_listeners():
+    # A thread do listener não existe no processo filho (ex.: workers do
+    # gunicorn com preload_app): cada handler ganha uma nova fila e thread
+    for handler in list(_queue_handlers):
+        handler._restart_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners)
@@ -0,0 +1,106 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from donations.models import Payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a latência por requisição do acesso ao banco com uma conexão nova "
+        "por requisição e com a configuração atual (conexões persistentes ou pool)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requisições simuladas por modo (padrão: 200)",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Banco de dados (padrão: default)",
+        )
+
+    def simulate(self, alias: str, requests: int) -> list[float]:
+        """
+        Simula `requests` requisições com uma consulta simples cada.
+
+        Os sinais de início e fim de requisição aplicam a política de conexões
+        do Django (fechar, manter ou devolver ao pool), como no servidor.
+        """
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            Payment.objects.using(alias).filter(pk=0).exists()
+            request_finished.send(sender=self.__class__)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def run_mode(self, alias: str, requests: int, overrides: dict) -> list[float]:
+        connection = connections[alias]
+        settings_dict = connection.settings_dict
+        original = {
+            "CONN_MAX_AGE": settings_dict["CONN_MAX_AGE"],
+            "OPTIONS": settings_dict["OPTIONS"],
+        }
+
+        connection.close()
+        settings_dict.update(overrides)
+        try:
+            self.simulate(alias, min(10, requests))  # Aquecimento
+            return self.simulate(alias, requests)
+        finally:
+            connection.close()
+            settings_dict.update(original)
+
+    def report(self, label: str, timings: list[float]):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+        self.stdout.write(
+            f"   {label:<42} média {statistics.mean(timings):7.2f} ms | "
+            f"p50 {statistics.median(timings):7.2f} ms | p95 {p95:7.2f} ms"
+        )
+
+    def handle(self, *args, **options):
+        requests, alias = options["requests"], options["database"]
+        if requests < 1:
+            raise CommandError("--requests deve ser maior que zero.")
+        if alias not in connections:
+            raise CommandError(f"Banco de dados desconhecido: {alias}")
+
+        settings_dict = connections[alias].settings_dict
+        pool = settings_dict["OPTIONS"].get("pool")
+        if pool:
+            configured = "pool de conexões"
+        elif settings_dict["CONN_MAX_AGE"]:
+            configured = f"persistente ({settings_dict['CONN_MAX_AGE']}s)"
+        else:
+            configured = "sem reuso (DB_CONN_MAX_AGE=0)"
+
+        self.stdout.write(
+            f"⏱️  {requests} requisições por modo no banco '{alias}' "
+            f"({settings_dict['ENGINE'].rsplit('.', 1)[-1]})"
+        )
+
+        options_without_pool = {
+            key: value for key, value in settings_dict["OPTIONS"].items() if key != "pool"
+        }
+        fresh = self.run_mode(
+            alias, requests, {"CONN_MAX_AGE": 0, "OPTIONS": options_without_pool}
+        )
+        current = self.run_mode(alias, requests, {})
+
+        self.report("conexão nova por requisição", fresh)
+        self.report(f"configuração atual: {configured}", current)
+
+        saved = statistics.mean(fresh) - statistics.mean(current)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Economia por requisição: {saved:.2f} ms (média)")
+        )
@@ -0,0 +1,112 @@
+import logging
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from donations.logs import QueueHandler, payment_log_fields
+
+# Resposta típica de GET /v1/payments/{id} para um PIX (com o QR Code em base64)
+SAMPLE_PAYMENT = {
+    "id": 125381511429,
+    "status": "pending",
+    "status_detail": "pending_waiting_transfer",
+    "transaction_amount": 20.0,
+    "currency_id": "BRL",
+    "description": "Doação ToyLink - Brinquedos",
+    "date_created": "2026-10-18T09:12:41.000-04:00",
+    "date_of_expiration": "2026-10-19T09:12:41.000-04:00",
+    "payer": {
+        "email": "doacao@example.com",
+        "identification": {"type": "CPF", "number": "00000000000"},
+    },
+    "point_of_interaction": {
+        "type": "PIX",
+        "transaction_data": {
+            "qr_code": "00020126580014br.gov.bcb.pix0136" + "a" * 120,
+            "qr_code_base64": "iVBORw0KGgoAAAANSUhEUgAAAV4AAAFeAQAAAADlUEq3" + "A" * 4000,
+            "ticket_url": "https://www.mercadopago.com.br/payments/125381511429/ticket",
+        },
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede, por consulta de pagamento, o tempo gasto com log na thread da "
+        "requisição e o volume gravado: print() do payload (antes) e log "
+        "estruturado em fila (atual)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Consultas simuladas por modo (padrão: 2000)",
+        )
+
+    def run_print(self, path: str, requests: int) -> float:
+        # Gravação por linha, como o stdout com PYTHONUNBUFFERED (Dockerfile)
+        with open(path, "w", buffering=1) as stream, redirect_stdout(stream):
+            started = time.perf_counter()
+            for _ in range(requests):
+                print(f"Dados do pagamento: {SAMPLE_PAYMENT}")
+            return time.perf_counter() - started
+
+    def run_logging(self, path: str, requests: int) -> float:
+        logger = logging.getLogger("benchmark_logging")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+        with open(path, "w") as stream:
+            handler = QueueHandler(
+                max_length=settings.LOG_MAX_FIELD_LENGTH, queue_size=requests + 1, stream=stream
+            )
+            logger.addHandler(handler)
+            try:
+                started = time.perf_counter()
+                for _ in range(requests):
+                    logger.info(
+                        "Pagamento consultado no Mercado Pago",
+                        extra=payment_log_fields(SAMPLE_PAYMENT),
+                    )
+                return time.perf_counter() - started
+            finally:
+                logger.removeHandler(handler)
+                handler.close()  # Aguarda a gravação do que ficou na fila
+
+    def report(self, label: str, requests: int, elapsed: float, size: int):
+        self.stdout.write(
+            f"   {label:<28} {elapsed / requests * 1_000_000:8.1f} µs por consulta | "
+            f"{size / requests:8.0f} bytes por consulta"
+        )
+
+    def handle(self, *args, **options):
+        requests = options["requests"]
+        if requests < 1:
+            raise CommandError("--requests deve ser maior que zero.")
+
+        self.stdout.write(f"⏱️  {requests} consultas de pagamento por modo")
+
+        with tempfile.TemporaryDirectory() as directory:
+            print_path = os.path.join(directory, "print.log")
+            logging_path = os.path.join(directory, "logging.log")
+
+            printed = self.run_print(print_path, requests)
+            logged = self.run_logging(logging_path, requests)
+
+            print_size = os.path.getsize(print_path)
+            logging_size = os.path.getsize(logging_path)
+
+        self.report("print() do payload", requests, printed, print_size)
+        self.report("log estruturado em fila", requests, logged, logging_size)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {printed / logged:.1f}x menos tempo na requisição e "
+                f"{print_size / logging_size:.1f}x menos volume de log"
+            )
+        )
@@ -0,0 +1,96 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede requisições por segundo de uma página sem cache (templates relidos "
+        "a cada requisição) e com cache (cached loader, trechos e página em cache)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Requisições por modo (padrão: 500)",
+        )
+        parser.add_argument(
+            "--path",
+            default="/",
+            help="Página medida (padrão: /, a página de doação)",
+        )
+
+    def templates(self, cached: bool) -> list[dict]:
+        loaders = settings.TEMPLATE_LOADERS
+        if cached:
+            loaders = [("django.template.loaders.cached.Loader", loaders)]
+        return [
+            {**engine, "OPTIONS": {**engine["OPTIONS"], "loaders": loaders}}
+            for engine in settings.TEMPLATES
+        ]
+
+    def run_mode(self, path: str, requests: int, overrides: dict) -> float:
+        """GETs anônimos em `path`; retorna a duração total em segundos."""
+        with override_settings(**overrides):
+            for alias in ("default", "template_fragments"):
+                caches[alias].clear()
+
+            client = Client()
+            for _ in range(min(20, requests)):  # Aquecimento
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {path} retornou {response.status_code}")
+
+            started = time.perf_counter()
+            for _ in range(requests):
+                client.get(path)
+            return time.perf_counter() - started
+
+    def report(self, label: str, requests: int, elapsed: float):
+        self.stdout.write(
+            f"   {label:<34} {requests / elapsed:8.1f} req/s | "
+            f"{elapsed / requests * 1000:6.2f} ms por requisição"
+        )
+
+    def handle(self, *args, **options):
+        requests, path = options["requests"], options["path"]
+        if requests < 1:
+            raise CommandError("--requests deve ser maior que zero.")
+
+        self.stdout.write(f"⏱️  {requests} requisições anônimas por modo em {path}")
+
+        allowed_hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        uncached = self.run_mode(
+            path,
+            requests,
+            {
+                "ALLOWED_HOSTS": allowed_hosts,
+                "TEMPLATES": self.templates(cached=False),
+                "PAGE_CACHE_SECONDS": 0,
+                "FRAGMENT_CACHE_SECONDS": 0,
+            },
+        )
+        cached = self.run_mode(
+            path,
+            requests,
+            {
+                "ALLOWED_HOSTS": allowed_hosts,
+                "TEMPLATES": self.templates(cached=True),
+                "PAGE_CACHE_SECONDS": settings.PAGE_CACHE_SECONDS or 300,
+                "FRAGMENT_CACHE_SECONDS": settings.FRAGMENT_CACHE_SECONDS or 600,
+            },
+        )
+
+        self.report("sem cache", requests, uncached)
+        self.report("com cache", requests, cached)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {uncached / cached:.1f}x mais requisições por segundo com cache"
+            )
+        )
@@ -0,0 +1,67 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from donations import export
+
+
+class Command(BaseCommand):
+    help = "Exporta as doações em CSV ou JSON Lines, lendo o banco em blocos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=sorted(export.FORMATS),
+            default="csv",
+            help="Formato da exportação (padrão: csv)",
+        )
+        parser.add_argument("--status", help="Exporta apenas pagamentos com este status")
+        parser.add_argument("--start", help="Data inicial, inclusiva (AAAA-MM-DD)")
+        parser.add_argument("--end", help="Data final, inclusiva (AAAA-MM-DD)")
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Compacta a saída em gzip",
+        )
+        parser.add_argument(
+            "--output",
+            "-o",
+            help="Arquivo de saída (padrão: saída padrão)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=export.CHUNK_SIZE,
+            help=f"Linhas lidas do banco por vez (padrão: {export.CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size deve ser maior que zero.")
+
+        filters, error = export.parse_filters(
+            options["status"], options["start"], options["end"]
+        )
+        if error:
+            raise CommandError(error)
+
+        chunks = export.iter_export(
+            export.export_queryset(**filters),
+            options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+
+        # Os dados vão para a saída (ou arquivo); as mensagens, para stderr
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
+
+        if options["output"]:
+            self.stderr.write(self.style.SUCCESS(f"✅ Doações exportadas para {options['output']}"))
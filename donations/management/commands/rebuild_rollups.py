@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from donations.export import parse_filters
+from donations.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcula os totais de doações por hora e por dia a partir dos pagamentos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Primeiro dia a recalcular (AAAA-MM-DD)")
+        parser.add_argument("--end", help="Último dia a recalcular (AAAA-MM-DD)")
+
+    def handle(self, *args, **options):
+        filters, error = parse_filters(None, options["start"], options["end"])
+        if error:
+            raise CommandError(error)
+
+        self.stdout.write("🔄 Recalculando totais por período...")
+        started = time.monotonic()
+
+        created = rebuild_rollups(filters["start"], filters["end"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {created} totais gravados em {time.monotonic() - started:.1f}s"
+            )
+        )
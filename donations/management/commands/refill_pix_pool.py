@@ -0,0 +1,67 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from donations.pix_pool import pool_stats, refill_pool
+
+
+class Command(BaseCommand):
+    help = "Mantém o estoque de cobranças PIX pré-criadas para os valores sugeridos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=settings.PIX_POOL_SIZE,
+            help=f"Cobranças em estoque por valor (padrão: {settings.PIX_POOL_SIZE})",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Chamadas simultâneas ao Mercado Pago (padrão: 4)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=60.0,
+            help="Intervalo em segundos entre as reposições (padrão: 60)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Repõe o estoque uma vez e encerra",
+        )
+
+    def handle(self, *args, **options):
+        if options["size"] < 0 or options["concurrency"] < 1:
+            raise CommandError("--size não pode ser negativo e --concurrency deve ser maior que zero.")
+
+        if not settings.PIX_POOL_ENABLED:
+            raise CommandError("Estoque de cobranças PIX desativado (PIX_POOL_ENABLED=False).")
+
+        self.stdout.write("🔄 Repondo estoque de cobranças PIX...")
+
+        try:
+            while True:
+                result = refill_pool(options["size"], options["concurrency"])
+                stats = pool_stats()
+
+                depth = ", ".join(
+                    f"R$ {valor}: {total}" for valor, total in stats["depth"].items()
+                )
+                self.stdout.write(
+                    f"📦 {result['created']} criadas, {result['expired']} vencidas removidas, "
+                    f"{result['failed']} falhas | estoque: {depth or '-'} | "
+                    f"acertos: {stats['hits']}/{stats['hits'] + stats['misses']} "
+                    f"({stats['hit_rate']:.0%})"
+                )
+
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("✅ Reposição do estoque PIX encerrada"))
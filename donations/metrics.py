@@ -0,0 +1,258 @@
+"""
+Métricas no formato do Prometheus.
+
+Sob o gunicorn (PROMETHEUS_MULTIPROC_DIR definido no gunicorn.conf.py), cada
+processo grava seus valores em arquivos nesse diretório e o endpoint
+/metrics soma os de todos os workers; sem ele, os valores ficam na memória
+do processo. O worker de webhooks (outro container) expõe os seus em uma
+porta própria (`start_exporter`), coletada pelo Prometheus como outro alvo.
+"""
+
+import ipaddress
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+http_request_duration = Histogram(
+    "django_http_request_duration_seconds",
+    "Duração das requisições por view",
+    ["view", "method", "status"],
+)
+http_request_queries = Histogram(
+    "django_http_request_db_queries",
+    "Consultas ao banco por requisição",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, float("inf")),
+)
+mercadopago_request_duration = Histogram(
+    "mercadopago_request_duration_seconds",
+    "Duração das chamadas à API do Mercado Pago, incluindo novas tentativas",
+    ["endpoint", "method", "status"],
+)
+mercadopago_request_errors = Counter(
+    "mercadopago_request_errors",
+    "Chamadas à API do Mercado Pago que falharam, por tipo de erro",
+    ["endpoint", "method", "error"],
+)
+mercadopago_cache_requests = Counter(
+    "mercadopago_payment_cache_requests",
+    "Consultas de pagamento ao cache do Mercado Pago (hit, shared_hit, miss, coalesced)",
+    ["result"],
+)
+pix_pool_requests = Counter(
+    "pix_pool_requests",
+    "Doações de valor sugerido atendidas (hit) ou não (miss) pelo estoque PIX",
+    ["result"],
+)
+payment_status_transitions = Counter(
+    "payment_status_transitions",
+    "Mudanças de status dos pagamentos (from_status=none para pagamentos novos)",
+    ["from_status", "to_status"],
+)
+circuit_breaker_transitions = Counter(
+    "mercadopago_circuit_breaker_transitions",
+    "Mudanças de estado do circuit breaker (closed, open, half_open)",
+    ["breaker", "from_state", "to_state"],
+)
+circuit_breaker_rejections = Counter(
+    "mercadopago_circuit_breaker_rejected_calls",
+    "Chamadas recusadas na hora com o circuito aberto",
+    ["breaker"],
+)
+
+
+def mercadopago_endpoint(path: str) -> str:
+    """Caminho sem IDs, para não criar uma série por pagamento."""
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path.split("?", 1)[0])
+
+
+class _Observation:
+    status = "error"
+
+
+@contextmanager
+def observe_mercadopago_request(method: str, path: str):
+    """
+    Mede uma chamada ao Mercado Pago. Quem chama informa `status` ao obter a
+    resposta; exceções são contadas pelo nome da classe e propagadas.
+    """
+    endpoint = mercadopago_endpoint(path)
+    observation = _Observation()
+    started = time.perf_counter()
+    try:
+        yield observation
+    except Exception as e:
+        mercadopago_request_errors.labels(endpoint, method, type(e).__name__).inc()
+        raise
+    finally:
+        mercadopago_request_duration.labels(endpoint, method, str(observation.status)).observe(
+            time.perf_counter() - started
+        )
+
+
+class _QueryCounter:
+    count = 0
+
+
+# Contador da requisição atual. Fica no contexto (e não na conexão) porque,
+# sob ASGI, as views síncronas rodam em outra thread, com outra conexão; o
+# sync_to_async copia o contexto para essa thread
+_request_queries = ContextVar("request_queries", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class MetricsMiddleware:
+    """
+    Registra a duração e o número de consultas ao banco de cada requisição,
+    pelo nome da URL (arquivos estáticos, servidos antes, não são medidos).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        counter = _QueryCounter()
+        token = _request_queries.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter.count)
+        return response
+
+    async def __acall__(self, request):
+        counter = _QueryCounter()
+        token = _request_queries.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter.count)
+        return response
+
+    def observe(self, request, response, duration: float, queries: int):
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+        http_request_duration.labels(view, request.method, str(response.status_code)).observe(
+            duration
+        )
+        http_request_queries.labels(view).observe(queries)
+
+
+class PixPoolCollector:
+    """Estoque de cobranças PIX por valor, lido do banco a cada coleta."""
+
+    def collect(self):
+        from .pix_pool import pool_depth  # pix_pool importa este módulo
+
+        gauge = GaugeMetricFamily(
+            "pix_pool_depth", "Cobranças PIX utilizáveis em estoque", labels=["valor"]
+        )
+        for valor, quantidade in sorted(pool_depth().items()):
+            gauge.add_metric([str(valor)], quantidade)
+        yield gauge
+
+
+class CircuitBreakerCollector:
+    """Estado atual do circuit breaker, lido do cache (compartilhado) a cada coleta."""
+
+    def collect(self):
+        from services.circuit_breaker import (  # circuit_breaker importa este módulo
+            CLOSED,
+            HALF_OPEN,
+            OPEN,
+            mercadopago_breaker,
+        )
+
+        gauge = GaugeMetricFamily(
+            "mercadopago_circuit_breaker_state",
+            "Estado do circuit breaker (1 no estado atual)",
+            labels=["breaker", "state"],
+        )
+        current = mercadopago_breaker.state()
+        for state in (CLOSED, OPEN, HALF_OPEN):
+            gauge.add_metric([mercadopago_breaker.name, state], int(state == current))
+        yield gauge
+
+
+def is_allowed(request) -> bool:
+    """Usuários da equipe ou requisições vindas de METRICS_ALLOWED_NETWORKS."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+def start_exporter(port: int, addr: str = "0.0.0.0"):
+    """
+    Serve as métricas deste processo em http://addr:port/ numa thread, para
+    processos fora do gunicorn (o worker de webhooks, onde ocorre a maior
+    parte das mudanças de status). Sem autenticação: exponha a porta apenas
+    na rede interna do Prometheus.
+
+    Returns:
+        tuple: (servidor, thread) do `prometheus_client`
+    """
+    return start_http_server(port, addr=addr, registry=REGISTRY)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Métricas no formato de texto do Prometheus e o content type."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    # Métricas calculadas na coleta, a partir do banco e do cache
+    shared = CollectorRegistry()
+    shared.register(PixPoolCollector())
+    shared.register(CircuitBreakerCollector())
+    return generate_latest(registry) + generate_latest(shared), CONTENT_TYPE_LATEST
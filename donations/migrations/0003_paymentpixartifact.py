@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0002_payment_qr_code_payment_qr_code_base64'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentPixArtifact',
+            fields=[
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pix_artifact', serialize=False, to='donations.payment', verbose_name='Pagamento')),
+                ('qr_code_png', models.BinaryField(blank=True, null=True, verbose_name='QR Code PIX (PNG)')),
+                ('qr_code_emv', models.BinaryField(blank=True, null=True, verbose_name='QR Code PIX (texto comprimido)')),
+            ],
+            options={
+                'verbose_name': 'Artefato PIX',
+                'verbose_name_plural': 'Artefatos PIX',
+            },
+        ),
+    ]
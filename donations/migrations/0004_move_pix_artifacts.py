@@ -0,0 +1,73 @@
+import base64
+import zlib
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def move_to_artifacts(apps, schema_editor):
+    Payment = apps.get_model("donations", "Payment")
+    PaymentPixArtifact = apps.get_model("donations", "PaymentPixArtifact")
+
+    rows = (
+        Payment.objects.exclude(qr_code__isnull=True, qr_code_base64__isnull=True)
+        .values_list("id", "qr_code", "qr_code_base64")
+        .order_by("id")
+    )
+
+    batch = []
+    for payment_id, qr_code, qr_code_base64 in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(
+            PaymentPixArtifact(
+                payment_id=payment_id,
+                qr_code_emv=zlib.compress(qr_code.encode("utf-8"), 9) if qr_code else None,
+                qr_code_png=base64.b64decode(qr_code_base64) if qr_code_base64 else None,
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            PaymentPixArtifact.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        PaymentPixArtifact.objects.bulk_create(batch)
+
+
+def move_back_to_payments(apps, schema_editor):
+    Payment = apps.get_model("donations", "Payment")
+    PaymentPixArtifact = apps.get_model("donations", "PaymentPixArtifact")
+
+    batch = []
+    for artifact in PaymentPixArtifact.objects.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+        batch.append(
+            Payment(
+                id=artifact.payment_id,
+                qr_code=(
+                    zlib.decompress(bytes(artifact.qr_code_emv)).decode("utf-8")
+                    if artifact.qr_code_emv
+                    else None
+                ),
+                qr_code_base64=(
+                    base64.b64encode(bytes(artifact.qr_code_png)).decode("ascii")
+                    if artifact.qr_code_png
+                    else None
+                ),
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            Payment.objects.bulk_update(batch, ["qr_code", "qr_code_base64"])
+            batch = []
+
+    if batch:
+        Payment.objects.bulk_update(batch, ["qr_code", "qr_code_base64"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0003_paymentpixartifact'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_artifacts, move_back_to_payments),
+    ]
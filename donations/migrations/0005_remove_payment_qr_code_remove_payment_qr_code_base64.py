@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0004_move_pix_artifacts'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='payment',
+            name='qr_code',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='qr_code_base64',
+        ),
+    ]
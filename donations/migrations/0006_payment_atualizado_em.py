@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0005_remove_payment_qr_code_remove_payment_qr_code_base64'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Atualizado em'),
+            preserve_default=False,
+        ),
+    ]
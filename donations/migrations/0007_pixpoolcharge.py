@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0006_payment_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PixPoolCharge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qr_code_png', models.BinaryField(blank=True, null=True, verbose_name='QR Code PIX (PNG)')),
+                ('qr_code_emv', models.BinaryField(blank=True, null=True, verbose_name='QR Code PIX (texto comprimido)')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor')),
+                ('payment_id', models.CharField(max_length=255, verbose_name='ID do Pagamento')),
+                ('payment_url', models.URLField(blank=True, null=True, verbose_name='URL do Pagamento')),
+                ('expira_em', models.DateTimeField(verbose_name='Expira em')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Cobrança PIX pré-criada',
+                'verbose_name_plural': 'Cobranças PIX pré-criadas',
+                'indexes': [models.Index(fields=['valor', 'expira_em'], name='pixpool_valor_expira_idx')],
+            },
+        ),
+    ]
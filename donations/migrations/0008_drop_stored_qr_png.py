@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def drop_stored_png(apps, schema_editor):
+    # O PNG passa a ser gerado do código copia e cola; só é mantido nos
+    # registros sem o código
+    for model_name in ("PaymentPixArtifact", "PixPoolCharge"):
+        model = apps.get_model("donations", model_name)
+        model.objects.filter(qr_code_emv__isnull=False, qr_code_png__isnull=False).update(
+            qr_code_png=None
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0007_pixpoolcharge'),
+    ]
+
+    # A reversão não recria os PNGs apagados: isso exigiria o gerador de QR
+    # Code da aplicação (donations.qr), cuja API pode mudar e quebraria esta
+    # migração histórica. Voltando a uma versão anterior à geração local, os
+    # pagamentos com apenas o código copia e cola (qr_code_emv) ficam sem a
+    # imagem; o código continua disponível para o doador copiar
+    operations = [
+        migrations.RunPython(drop_stored_png, migrations.RunPython.noop),
+    ]
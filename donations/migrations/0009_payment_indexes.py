@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:34
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Duplicatas listadas na mensagem de erro
+MAX_LISTED = 20
+
+
+def clean_payment_ids(apps, schema_editor):
+    Payment = apps.get_model("donations", "Payment")
+
+    # Versões anteriores gravavam str(None) quando o Mercado Pago não
+    # devolvia o ID; vários pagamentos com "None" violariam o índice único
+    Payment.objects.filter(payment_id__in=["None", ""]).update(payment_id=None)
+
+    duplicates = list(
+        Payment.objects.filter(payment_id__isnull=False)
+        .values("payment_id")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+        .order_by("payment_id")
+        .values_list("payment_id", flat=True)[: MAX_LISTED + 1]
+    )
+    if not duplicates:
+        return
+
+    lines = [
+        f"  payment_id {payment_id}: pagamentos "
+        + ", ".join(
+            f"#{pk}"
+            for pk in Payment.objects.filter(payment_id=payment_id)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        for payment_id in duplicates[:MAX_LISTED]
+    ]
+    if len(duplicates) > MAX_LISTED:
+        lines.append("  ...")
+    raise RuntimeError(
+        "Há pagamentos com o mesmo payment_id; o índice único não pode ser criado. "
+        "Corrija-os (mantendo um pagamento por ID do Mercado Pago) e rode o "
+        "migrate novamente:\n" + "\n".join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    # A limpeza é gravada antes do ALTER TABLE (no PostgreSQL, atualizar e
+    # alterar a tabela na mesma transação pode falhar com eventos pendentes)
+    atomic = False
+
+    dependencies = [
+        ('donations', '0008_drop_stored_qr_png'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_payment_ids, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='ID do Pagamento'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'data'], name='payment_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['data', 'id'], name='payment_data_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:41
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Índice trigram para a busca por trecho do nome no admin
+# (UPPER(nome_doador) LIKE UPPER('%...%')); apenas no PostgreSQL
+TRIGRAM_INDEX = "payment_nome_trgm_idx"
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON donations_payment "
+        "USING gin (UPPER(nome_doador::text) gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0009_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(django.db.models.functions.text.Upper('email_doador'), name='payment_email_upper_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:44
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    # Totais do histórico; a partir daqui são mantidos incrementalmente
+    Payment = apps.get_model("donations", "Payment")
+    DonationRollup = apps.get_model("donations", "DonationRollup")
+
+    for granularidade, trunc in (("hour", TruncHour), ("day", TruncDay)):
+        rows = (
+            Payment.objects.order_by()
+            .annotate(inicio=trunc("data"))
+            .values("inicio", "status", "tipo_doacao")
+            .annotate(quantidade=Count("id"), total=Sum("valor"))
+        )
+        DonationRollup.objects.bulk_create(
+            (
+                DonationRollup(
+                    granularidade=granularidade,
+                    inicio=row["inicio"],
+                    status=row["status"],
+                    tipo_doacao=row["tipo_doacao"] or "",
+                    quantidade=row["quantidade"],
+                    total=row["total"],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0010_payment_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidade', models.CharField(choices=[('hour', 'Hora'), ('day', 'Dia')], max_length=4, verbose_name='Granularidade')),
+                ('inicio', models.DateTimeField(verbose_name='Início do intervalo')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('approved', 'Aprovado'), ('rejected', 'Rejeitado'), ('cancelled', 'Cancelado')], max_length=20, verbose_name='Status')),
+                ('tipo_doacao', models.CharField(blank=True, default='', max_length=20, verbose_name='Tipo de Doação')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Total por período',
+                'verbose_name_plural': 'Totais por período',
+                'constraints': [models.UniqueConstraint(fields=('granularidade', 'inicio', 'status', 'tipo_doacao'), name='rollup_unique_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
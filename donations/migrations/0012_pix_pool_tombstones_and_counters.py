@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0011_donationrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PixPoolCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resultado', models.CharField(choices=[('hit', 'Atendida pelo estoque'), ('miss', 'Sem cobrança em estoque')], max_length=4, unique=True, verbose_name='Resultado')),
+                ('total', models.PositiveBigIntegerField(default=0, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Contador do estoque PIX',
+                'verbose_name_plural': 'Contadores do estoque PIX',
+            },
+        ),
+        migrations.AddField(
+            model_name='pixpoolcharge',
+            name='descartada',
+            field=models.BooleanField(default=False, verbose_name='Descartada (vencida)'),
+        ),
+        migrations.AlterField(
+            model_name='pixpoolcharge',
+            name='payment_id',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='ID do Pagamento'),
+        ),
+    ]
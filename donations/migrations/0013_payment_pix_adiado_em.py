@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0012_pix_pool_tombstones_and_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='pix_adiado_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='PIX adiado em'),
+        ),
+    ]
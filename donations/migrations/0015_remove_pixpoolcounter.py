@@ -0,0 +1,16 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0014_shared_cache_table'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PixPoolCounter',
+        ),
+    ]
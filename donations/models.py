@@ -1,6 +1,13 @@
+import base64
+import hashlib
+import zlib
+
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
+from . import qr
+
 
 class Payment(models.Model):
     TIPO_DOACAO_CHOICES = [
@@ -18,17 +25,11 @@ class Payment(models.Model):
     valor = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
     data = models.DateTimeField(default=timezone.now, verbose_name="Data")
     payment_id = models.CharField(
-        max_length=255, blank=True, null=True, verbose_name="ID do Pagamento"
+        max_length=255, blank=True, null=True, unique=True, verbose_name="ID do Pagamento"
     )
     payment_url = models.URLField(
         blank=True, null=True, verbose_name="URL do Pagamento"
     )
-    qr_code = models.TextField(
-        blank=True, null=True, verbose_name="QR Code PIX (texto)"
-    )
-    qr_code_base64 = models.TextField(
-        blank=True, null=True, verbose_name="QR Code PIX (Base64)"
-    )
     tipo_doacao = models.CharField(
         max_length=20,
         choices=TIPO_DOACAO_CHOICES,
@@ -45,12 +46,200 @@ class Payment(models.Model):
     email_doador = models.EmailField(
         blank=True, null=True, verbose_name="Email do Doador"
     )
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    # Registrada com o circuito do Mercado Pago aberto: PIX ainda por gerar
+    pix_adiado_em = models.DateTimeField(blank=True, null=True, verbose_name="PIX adiado em")
 
     class Meta:
         verbose_name = "Pagamento"
         verbose_name_plural = "Pagamentos"
         ordering = ["-data"]
+        indexes = [
+            # Dashboard: filtro por status ordenado por data
+            models.Index(fields=["status", "data"], name="payment_status_data_idx"),
+            # Listagens ordenadas por data (dashboard sem filtro, admin)
+            models.Index(fields=["data", "id"], name="payment_data_id_idx"),
+            # Busca por email no admin (email_doador__iexact)
+            models.Index(Upper("email_doador"), name="payment_email_upper_idx"),
+        ]
 
     def __str__(self):
         tipo = self.get_tipo_doacao_display() if self.tipo_doacao else "Geral"
         return f"Doação de R$ {self.valor} - {tipo} - {self.data.strftime('%d/%m/%Y')}"
+
+
+class PixArtifactFields(models.Model):
+    """
+    Campos do QR Code PIX: o código copia e cola (EMV) é comprimido com zlib
+    e a imagem é gerada a partir dele (`donations.qr`). O PNG em bytes só
+    existe em registros antigos, anteriores à geração local.
+    """
+
+    qr_code_png = models.BinaryField(
+        blank=True, null=True, verbose_name="QR Code PIX (PNG)"
+    )
+    qr_code_emv = models.BinaryField(
+        blank=True, null=True, verbose_name="QR Code PIX (texto comprimido)"
+    )
+
+    class Meta:
+        abstract = True
+
+    def set_transaction_data(self, transaction_data: dict):
+        """
+        Copia o código copia e cola do `transaction_data` do Mercado Pago. O
+        `qr_code_base64` não é gravado: a imagem é gerada do próprio código.
+        """
+        self.qr_code = transaction_data.get("qr_code")
+
+    @property
+    def qr_code(self):
+        """Código PIX copia e cola (EMV) descomprimido."""
+        if not self.qr_code_emv:
+            return None
+        return zlib.decompress(bytes(self.qr_code_emv)).decode("utf-8")
+
+    @qr_code.setter
+    def qr_code(self, value):
+        self.qr_code_emv = zlib.compress(value.encode("utf-8"), 9) if value else None
+
+    @property
+    def qr_code_base64(self):
+        """PNG do QR Code em base64, para uso em `data:` URIs."""
+        if not self.qr_code_png:
+            return None
+        return base64.b64encode(bytes(self.qr_code_png)).decode("ascii")
+
+    @qr_code_base64.setter
+    def qr_code_base64(self, value):
+        self.qr_code_png = base64.b64decode(value) if value else None
+
+    @property
+    def has_qr_image(self):
+        return bool(self.qr_code_emv) or bool(self.qr_code_png)
+
+    @property
+    def qr_code_hash(self):
+        """Versão da imagem do QR Code, usada na URL (`?v=`) da imagem."""
+        if self.qr_code_emv:
+            content = f"{qr.RENDER_VERSION}:{self.qr_code}".encode("utf-8")
+        elif self.qr_code_png:
+            content = bytes(self.qr_code_png)
+        else:
+            return None
+        return hashlib.sha256(content).hexdigest()[:16]
+
+
+class PaymentPixArtifact(PixArtifactFields):
+    """
+    Artefatos PIX de um pagamento (QR Code e código copia e cola).
+
+    Ficam fora da tabela de pagamentos para que listagens, dashboard, admin e
+    webhook não carreguem esses dados.
+    """
+
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="pix_artifact",
+        verbose_name="Pagamento",
+    )
+
+    class Meta:
+        verbose_name = "Artefato PIX"
+        verbose_name_plural = "Artefatos PIX"
+
+    def __str__(self):
+        return f"Artefato PIX do pagamento #{self.payment_id}"
+
+    @classmethod
+    def from_transaction_data(cls, payment, transaction_data: dict):
+        """
+        Cria (sem salvar) o artefato a partir do `transaction_data` do Mercado Pago.
+        """
+        artifact = cls(payment=payment)
+        artifact.set_transaction_data(transaction_data)
+        return artifact
+
+
+class PixPoolCharge(PixArtifactFields):
+    """
+    Cobrança PIX criada antecipadamente no Mercado Pago para um valor sugerido.
+
+    O comando `refill_pix_pool` mantém o estoque de cada valor; uma doação
+    com o mesmo valor reivindica (e remove) uma cobrança do estoque em vez de
+    esperar o Mercado Pago (ver `donations.pix_pool`).
+
+    Cobranças vencidas não são apagadas na hora, apenas marcadas como
+    `descartada`: o Mercado Pago ainda envia notificações delas, e o worker
+    de webhooks as reconhece por este registro.
+    """
+
+    valor = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
+    payment_id = models.CharField(
+        max_length=255, db_index=True, verbose_name="ID do Pagamento"
+    )
+    payment_url = models.URLField(
+        blank=True, null=True, verbose_name="URL do Pagamento"
+    )
+    expira_em = models.DateTimeField(verbose_name="Expira em")
+    descartada = models.BooleanField(default=False, verbose_name="Descartada (vencida)")
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+
+    class Meta:
+        verbose_name = "Cobrança PIX pré-criada"
+        verbose_name_plural = "Cobranças PIX pré-criadas"
+        indexes = [
+            models.Index(fields=["valor", "expira_em"], name="pixpool_valor_expira_idx"),
+        ]
+
+    def __str__(self):
+        return f"Cobrança PIX de R$ {self.valor} (expira em {self.expira_em:%d/%m/%Y %H:%M})"
+
+
+
+class DonationRollup(models.Model):
+    """
+    Totais de pagamentos por hora ou dia, status e tipo de doação.
+
+    Mantido incrementalmente a cada mudança de pagamento (ver
+    `donations.rollups`), permite consultar séries históricas lendo uma
+    linha por intervalo em vez de todos os pagamentos. O comando
+    `rebuild_rollups` recalcula os totais a partir de `Payment`.
+    """
+
+    GRANULARIDADE_CHOICES = [
+        ("hour", "Hora"),
+        ("day", "Dia"),
+    ]
+
+    granularidade = models.CharField(
+        max_length=4, choices=GRANULARIDADE_CHOICES, verbose_name="Granularidade"
+    )
+    inicio = models.DateTimeField(verbose_name="Início do intervalo")
+    status = models.CharField(
+        max_length=20, choices=Payment.STATUS_CHOICES, verbose_name="Status"
+    )
+    # Vazio para pagamentos sem tipo (NULL não entraria na restrição de unicidade)
+    tipo_doacao = models.CharField(
+        max_length=20, blank=True, default="", verbose_name="Tipo de Doação"
+    )
+    quantidade = models.IntegerField(default=0, verbose_name="Quantidade")
+    total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="Total"
+    )
+
+    class Meta:
+        verbose_name = "Total por período"
+        verbose_name_plural = "Totais por período"
+        constraints = [
+            # Também serve às consultas por granularidade e faixa de início
+            models.UniqueConstraint(
+                fields=["granularidade", "inicio", "status", "tipo_doacao"],
+                name="rollup_unique_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_granularidade_display()} {self.inicio:%d/%m/%Y %H:%M} - {self.status}"
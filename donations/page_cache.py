@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template.loader import render_to_string
+
+# Marcador gravado no lugar do token CSRF na página em cache
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+
+def is_anonymous_request(request) -> bool:
+    """
+    GET sem cookie de sessão nem de mensagens: a página não depende do
+    visitante (usuário, mensagens), exceto pelo token CSRF.
+    """
+    return (
+        request.method in ("GET", "HEAD")
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def page_cache_key(template_name: str) -> str:
+    return f"pagina:{template_name}"
+
+
+def render_cached(request, template_name: str) -> HttpResponse:
+    """
+    Renderiza `template_name`, servindo visitantes anônimos a partir do
+    cache (por PAGE_CACHE_SECONDS).
+
+    A página é guardada com um marcador no lugar do token CSRF, substituído
+    pelo token do visitante a cada resposta; `get_token` também envia o
+    cookie csrftoken, então o formulário continua válido.
+    """
+    timeout = settings.PAGE_CACHE_SECONDS
+    if not timeout or not is_anonymous_request(request):
+        return render(request, template_name)
+
+    key = page_cache_key(template_name)
+    content = cache.get(key)
+    if content is None:
+        content = render_to_string(template_name, {"csrf_token": CSRF_PLACEHOLDER}, request)
+        cache.set(key, content, timeout)
+
+    return HttpResponse(content.replace(CSRF_PLACEHOLDER, get_token(request)))
@@ -0,0 +1,146 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def encode_cursor(payment) -> str:
+    """Cursor (opaco na URL) da posição de um pagamento na ordem (data, id)."""
+    raw = f"{payment.data.isoformat()}|{payment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None):
+    """
+    Retorna a posição (data, id) de um cursor, ou None se ele for inválido.
+    """
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        data, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(data), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self._has_previous else None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self._has_next else None
+
+
+class KeysetPaginator:
+    """
+    Paginação por cursor na ordem (data, id), do pagamento mais recente para
+    o mais antigo.
+
+    Diferente do `Paginator`, não executa `COUNT(*)` nem usa OFFSET: cada
+    página é uma única consulta por faixa do índice a partir da posição do
+    último (ou primeiro) pagamento da página anterior, então o custo não
+    cresce com a profundidade da página. Em troca, não há números de página,
+    apenas "mais recentes" e "mais antigas".
+    """
+
+    def __init__(self, queryset, per_page: int):
+        self.queryset = queryset.order_by()
+        self.per_page = per_page
+
+    def get_page(self, older: str | None = None, newer: str | None = None) -> KeysetPage:
+        """
+        Página seguinte a `older` (pagamentos mais antigos que o cursor) ou
+        anterior a `newer` (mais recentes). Sem cursor válido, retorna a
+        primeira página.
+        """
+        position = decode_cursor(newer)
+        if position:
+            data, pk = position
+            rows = list(
+                self.queryset.filter(data__gte=data)
+                .filter(Q(data__gt=data) | Q(id__gt=pk))
+                .order_by("data", "id")[: self.per_page + 1]
+            )
+            if rows:
+                has_previous = len(rows) > self.per_page
+                return KeysetPage(rows[: self.per_page][::-1], has_previous, has_next=True)
+
+        # Sem `newer` (ou nada mais recente que ele): primeira página ou a
+        # página mais antiga que `older`
+        queryset = self.queryset
+        position = decode_cursor(older)
+        if position:
+            data, pk = position
+            queryset = queryset.filter(data__lte=data).filter(
+                Q(data__lt=data) | Q(id__lt=pk)
+            )
+
+        rows = list(queryset.order_by("-data", "-id")[: self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(rows[: self.per_page], bool(position), has_next)
+
+
+def estimated_count(queryset) -> int | None:
+    """
+    Número de linhas estimado pelo planner do PostgreSQL para o queryset
+    (EXPLAIN, sem executar a consulta), ou None nos demais bancos.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    `Paginator` que, em tabelas grandes, usa a estimativa do planner em vez
+    de `COUNT(*)`.
+
+    O `COUNT(*)` lê todas as linhas que atendem aos filtros; com milhões de
+    pagamentos ele domina o tempo da listagem do admin. Abaixo de
+    `exact_count_limit` linhas estimadas a contagem exata é barata e é usada.
+    """
+
+    exact_count_limit = 10_000
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate > self.exact_count_limit:
+            return estimate
+        return super().count
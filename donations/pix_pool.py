@@ -0,0 +1,250 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from services.mercadopago import MercadoPagoService
+
+from .metrics import pix_pool_requests
+from .models import Payment, PaymentPixArtifact, PixPoolCharge
+from .rollups import save_payment
+
+logger = logging.getLogger(__name__)
+
+# Por quanto tempo as cobranças vencidas continuam registradas (descartadas),
+# para que as notificações do Mercado Pago sobre elas sejam reconhecidas
+DISCARDED_RETENTION = timedelta(days=7)
+
+
+def pix_request(valor) -> dict:
+    """Argumentos de `pay_with_pix` para uma doação."""
+    return {
+        "amount": float(valor),
+        "payer_email": "doacao@example.com",
+        "payer_cpf": "00000000000",
+        "description": "Doação ToyLink - Brinquedos",
+    }
+
+
+def _to_valor(valor) -> Decimal | None:
+    try:
+        return Decimal(str(valor)).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def pool_amounts() -> list[Decimal]:
+    """Valores sugeridos que têm estoque de cobranças (PIX_POOL_AMOUNTS)."""
+    return [_to_valor(valor) for valor in settings.PIX_POOL_AMOUNTS if _to_valor(valor)]
+
+
+def _usable_after():
+    # Cobranças que vencem antes disso não dão tempo ao doador para pagar
+    return timezone.now() + timedelta(minutes=settings.PIX_POOL_MIN_REMAINING)
+
+
+def _counter_key(resultado: str) -> str:
+    return f"pix-pool:{resultado}"
+
+
+def _count(resultado: str):
+    """
+    Incrementa o contador de acertos (hit) ou falhas (miss) do estoque: a
+    métrica do Prometheus e, para o `refill_pix_pool`, um `incr` no cache
+    padrão (somando os workers com CACHE_URL), sem escrita no banco.
+    """
+    pix_pool_requests.labels(resultado).inc()
+
+    key = _counter_key(resultado)
+    try:
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:  # Removido entre o add e o incr
+            cache.set(key, 1, timeout=None)
+    except Exception:
+        # Sem o cache, a doação segue; só o contador fica para trás
+        logger.warning("Falha ao contar o uso do estoque PIX", exc_info=True)
+
+
+def claim_charge(valor: Decimal) -> PixPoolCharge | None:
+    """
+    Reivindica e remove do estoque a cobrança do valor que vence primeiro.
+
+    No PostgreSQL usa `SELECT ... FOR UPDATE SKIP LOCKED`, para que doações
+    simultâneas nunca recebam a mesma cobrança; nos demais bancos a
+    cobrança só é entregue se o DELETE deste processo a removeu.
+    """
+    available = PixPoolCharge.objects.filter(
+        valor=valor, expira_em__gt=_usable_after()
+    ).order_by("expira_em", "id")
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            charge = available.select_for_update(skip_locked=True).first()
+            if charge is not None:
+                PixPoolCharge.objects.filter(pk=charge.pk).delete()
+            return charge
+
+    for charge in available[:5]:
+        deleted, _ = PixPoolCharge.objects.filter(pk=charge.pk).delete()
+        if deleted:
+            return charge
+    return None
+
+
+def create_payment_from_pool(valor, **fields) -> Payment | None:
+    """
+    Cria o pagamento de uma doação a partir de uma cobrança do estoque.
+
+    Retorna None (sem tocar no banco) quando o estoque está desativado ou o
+    valor não é um dos sugeridos, e também quando não há cobrança disponível:
+    nesses casos a cobrança deve ser criada na hora no Mercado Pago.
+    """
+    valor = _to_valor(valor)
+    if not settings.PIX_POOL_ENABLED or valor not in pool_amounts():
+        return None
+
+    # A cobrança só sai do estoque se o pagamento for gravado
+    with transaction.atomic():
+        charge = claim_charge(valor)
+        if charge is not None:
+            payment = Payment(
+                valor=valor,
+                status="pending",
+                payment_id=charge.payment_id,
+                payment_url=charge.payment_url,
+                **fields,
+            )
+            save_payment(payment)
+            PaymentPixArtifact.objects.create(
+                payment=payment,
+                qr_code_png=charge.qr_code_png,
+                qr_code_emv=charge.qr_code_emv,
+            )
+
+    if charge is None:
+        _count("miss")
+        return None
+
+    _count("hit")
+    return payment
+
+
+def _expiration(mp_response: dict) -> datetime:
+    try:
+        return datetime.fromisoformat(mp_response["date_of_expiration"])
+    except (KeyError, TypeError, ValueError):
+        return timezone.now() + timedelta(minutes=settings.PIX_POOL_EXPIRATION)
+
+
+def _create_charge(valor: Decimal) -> PixPoolCharge:
+    """Cria (sem salvar) uma cobrança PIX no Mercado Pago para o estoque."""
+    mp_response = MercadoPagoService().pay_with_pix(
+        **pix_request(valor), expiration_minutes=settings.PIX_POOL_EXPIRATION
+    )
+    if mp_response.get("id") is None:
+        raise RuntimeError("Resposta do Mercado Pago sem ID do pagamento.")
+
+    transaction_data = mp_response.get("point_of_interaction", {}).get(
+        "transaction_data", {}
+    )
+
+    charge = PixPoolCharge(
+        valor=valor,
+        payment_id=str(mp_response.get("id")),
+        payment_url=transaction_data.get("ticket_url"),
+        expira_em=_expiration(mp_response),
+    )
+    charge.set_transaction_data(transaction_data)
+    return charge
+
+
+def pool_depth() -> dict:
+    """Cobranças utilizáveis em estoque por valor: {Decimal: quantidade}."""
+    depth = dict.fromkeys(pool_amounts(), 0)
+    depth.update(
+        PixPoolCharge.objects.filter(expira_em__gt=_usable_after())
+        .values_list("valor")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    return depth
+
+
+def pool_stats() -> dict:
+    """
+    Métricas do estoque.
+
+    Returns:
+        dict: {"hits", "misses", "hit_rate", "depth"}
+    """
+    totals = cache.get_many([_counter_key("hit"), _counter_key("miss")])
+    hits = totals.get(_counter_key("hit"), 0)
+    misses = totals.get(_counter_key("miss"), 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "depth": pool_depth(),
+    }
+
+
+def pool_payment_ids(payment_ids) -> set[str]:
+    """Quais de `payment_ids` são cobranças do estoque (inclusive as descartadas)."""
+    return set(
+        PixPoolCharge.objects.filter(payment_id__in=list(payment_ids)).values_list(
+            "payment_id", flat=True
+        )
+    )
+
+
+def refill_pool(size: int, concurrency: int = 4) -> dict:
+    """
+    Descarta as cobranças vencidas (ou perto de vencer) e completa o estoque
+    de cada valor sugerido até `size` cobranças, com até `concurrency`
+    chamadas simultâneas ao Mercado Pago.
+
+    As descartadas perdem o QR Code, mas continuam registradas por
+    `DISCARDED_RETENTION`: cada uma é um pagamento real no Mercado Pago, que
+    ainda envia notificações dela.
+
+    Returns:
+        dict: {"created", "expired", "failed"}
+    """
+    expired = PixPoolCharge.objects.filter(
+        descartada=False, expira_em__lte=_usable_after()
+    ).update(descartada=True, qr_code_png=None, qr_code_emv=None, payment_url=None)
+    PixPoolCharge.objects.filter(
+        descartada=True, expira_em__lt=timezone.now() - DISCARDED_RETENTION
+    ).delete()
+
+    missing = [
+        valor
+        for valor, total in pool_depth().items()
+        for _ in range(max(0, size - total))
+    ]
+
+    def create(valor):
+        try:
+            return _create_charge(valor)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(create, missing))
+
+    charges = [charge for charge in results if charge is not None]
+    PixPoolCharge.objects.bulk_create(charges)
+
+    return {
+        "created": len(charges),
+        "expired": expired,
+        "failed": len(results) - len(charges),
+    }
@@ -0,0 +1,528 @@
+"""
+Geração local do QR Code PIX a partir do código copia e cola (EMV).
+
+O codificador implementa o padrão QR Code (ISO/IEC 18004) no modo byte,
+com versões 1 a 40 e os quatro níveis de correção de erro; a renderização
+usa o Pillow (PNG e WebP) ou gera SVG diretamente.
+"""
+
+import functools
+import hashlib
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from PIL import Image
+
+# Incrementar quando a saída do renderizador mudar (invalida URLs e caches)
+RENDER_VERSION = 1
+
+FORMATS = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+# Nível de correção de erro: bits de formato
+ERROR_CORRECTION = {"L": 1, "M": 0, "Q": 3, "H": 2}
+_ECL_INDEX = {"L": 0, "M": 1, "Q": 2, "H": 3}
+
+# Codewords de correção por bloco e número de blocos, por nível e versão
+_ECC_CODEWORDS_PER_BLOCK = (
+    (-1, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28, 28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),  # noqa: E501
+    (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26, 26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),  # noqa: E501
+    (-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30, 28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),  # noqa: E501
+    (-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28, 30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),  # noqa: E501
+)
+_NUM_ERROR_CORRECTION_BLOCKS = (
+    (-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8, 8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),  # noqa: E501
+    (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16, 17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),  # noqa: E501
+    (-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20, 23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),  # noqa: E501
+    (-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25, 25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),  # noqa: E501
+)
+
+# Pesos das regras de penalidade usadas na escolha da máscara
+_PENALTY_N1 = 3
+_PENALTY_N2 = 3
+_PENALTY_N3 = 40
+_PENALTY_N4 = 10
+
+_MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+
+# --- Reed-Solomon sobre GF(256), polinômio 0x11D ---
+
+_GF_EXP = [0] * 512
+_GF_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _GF_EXP[_i] = _value
+    _GF_LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _i in range(255, 512):
+    _GF_EXP[_i] = _GF_EXP[_i - 255]
+
+
+def _gf_mul(x: int, y: int) -> int:
+    if x == 0 or y == 0:
+        return 0
+    return _GF_EXP[_GF_LOG[x] + _GF_LOG[y]]
+
+
+@functools.lru_cache(maxsize=None)
+def _rs_divisor(degree: int) -> tuple:
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _gf_mul(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_mul(root, 0x02)
+    return tuple(result)
+
+
+def _rs_remainder(data: list[int], divisor: tuple) -> list[int]:
+    result = [0] * len(divisor)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        for i, coefficient in enumerate(divisor):
+            result[i] ^= _gf_mul(coefficient, factor)
+    return result
+
+
+# --- Capacidade e montagem dos codewords ---
+
+
+def _num_raw_data_modules(version: int) -> int:
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        num_align = version // 7 + 2
+        result -= (25 * num_align - 10) * num_align - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def _num_data_codewords(version: int, ecl: str) -> int:
+    index = _ECL_INDEX[ecl]
+    return (
+        _num_raw_data_modules(version) // 8
+        - _ECC_CODEWORDS_PER_BLOCK[index][version] * _NUM_ERROR_CORRECTION_BLOCKS[index][version]
+    )
+
+
+def _data_codewords(data: bytes, version: int, ecl: str) -> list[int]:
+    """Segmento em modo byte, terminador e bytes de preenchimento."""
+    bits = []
+
+    def append(value, length):
+        bits.extend((value >> i) & 1 for i in reversed(range(length)))
+
+    append(0b0100, 4)
+    append(len(data), 8 if version <= 9 else 16)
+    for byte in data:
+        append(byte, 8)
+
+    capacity = _num_data_codewords(version, ecl) * 8
+    bits.extend([0] * min(4, capacity - len(bits)))
+    bits.extend([0] * (-len(bits) % 8))
+
+    codewords = [
+        int("".join(map(str, bits[i : i + 8])), 2) for i in range(0, len(bits), 8)
+    ]
+    pad = 0xEC
+    while len(codewords) < capacity // 8:
+        codewords.append(pad)
+        pad ^= 0xEC ^ 0x11
+    return codewords
+
+
+def _add_error_correction(data: list[int], version: int, ecl: str) -> list[int]:
+    """Divide em blocos, calcula a correção de cada um e intercala."""
+    index = _ECL_INDEX[ecl]
+    num_blocks = _NUM_ERROR_CORRECTION_BLOCKS[index][version]
+    block_ecc_len = _ECC_CODEWORDS_PER_BLOCK[index][version]
+    raw_codewords = _num_raw_data_modules(version) // 8
+    num_short_blocks = num_blocks - raw_codewords % num_blocks
+    short_block_len = raw_codewords // num_blocks
+
+    divisor = _rs_divisor(block_ecc_len)
+    blocks = []
+    k = 0
+    for i in range(num_blocks):
+        length = short_block_len - block_ecc_len + (0 if i < num_short_blocks else 1)
+        block = data[k : k + length]
+        k += length
+        ecc = _rs_remainder(block, divisor)
+        if i < num_short_blocks:
+            block.append(0)
+        blocks.append(block + ecc)
+
+    result = []
+    for i in range(len(blocks[0])):
+        for j, block in enumerate(blocks):
+            # Pula a posição de preenchimento dos blocos curtos
+            if i != short_block_len - block_ecc_len or j >= num_short_blocks:
+                result.append(block[i])
+    return result
+
+
+# --- Matriz de módulos ---
+
+
+class _Matrix:
+    def __init__(self, version: int):
+        self.version = version
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.is_function = [[False] * self.size for _ in range(self.size)]
+
+    def set_function(self, x: int, y: int, dark: bool):
+        self.modules[y][x] = dark
+        self.is_function[y][x] = True
+
+    def alignment_positions(self) -> list[int]:
+        if self.version == 1:
+            return []
+        num_align = self.version // 7 + 2
+        step = (self.version * 8 + num_align * 3 + 5) // (num_align * 4 - 4) * 2
+        result = [self.size - 7 - i * step for i in range(num_align - 1)] + [6]
+        return list(reversed(result))
+
+    def draw_function_patterns(self, ecl: str):
+        size = self.size
+        for i in range(size):
+            self.set_function(6, i, i % 2 == 0)
+            self.set_function(i, 6, i % 2 == 0)
+
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self.set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+
+        positions = self.alignment_positions()
+        last = len(positions) - 1
+        for i, cx in enumerate(positions):
+            for j, cy in enumerate(positions):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue  # Sobreposição com os padrões localizadores
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self.set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+
+        self.draw_format_bits(ecl, 0)  # Reserva as posições
+        self.draw_version()
+
+    def draw_format_bits(self, ecl: str, mask: int):
+        data = ERROR_CORRECTION[ecl] << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        bits = (data << 10 | remainder) ^ 0x5412
+
+        def bit(i):
+            return (bits >> i) & 1 != 0
+
+        size = self.size
+        for i in range(6):
+            self.set_function(8, i, bit(i))
+        self.set_function(8, 7, bit(6))
+        self.set_function(8, 8, bit(7))
+        self.set_function(7, 8, bit(8))
+        for i in range(9, 15):
+            self.set_function(14 - i, 8, bit(i))
+
+        for i in range(8):
+            self.set_function(size - 1 - i, 8, bit(i))
+        for i in range(8, 15):
+            self.set_function(8, size - 15 + i, bit(i))
+        self.set_function(8, size - 8, True)  # Módulo escuro fixo
+
+    def draw_version(self):
+        if self.version < 7:
+            return
+        remainder = self.version
+        for _ in range(12):
+            remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+        bits = self.version << 12 | remainder
+
+        for i in range(18):
+            dark = (bits >> i) & 1 != 0
+            a = self.size - 11 + i % 3
+            b = i // 3
+            self.set_function(a, b, dark)
+            self.set_function(b, a, dark)
+
+    def draw_codewords(self, codewords: list[int]):
+        size = self.size
+        total_bits = len(codewords) * 8
+        i = 0
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5  # Pula a coluna do padrão de temporização
+            upward = (right + 1) & 2 == 0
+            for vert in range(size):
+                y = size - 1 - vert if upward else vert
+                for x in (right, right - 1):
+                    if not self.is_function[y][x] and i < total_bits:
+                        self.modules[y][x] = (codewords[i >> 3] >> (7 - (i & 7))) & 1 != 0
+                        i += 1
+            right -= 2
+
+    def apply_mask(self, mask: int):
+        condition = _MASKS[mask]
+        for y in range(self.size):
+            row = self.modules[y]
+            function_row = self.is_function[y]
+            for x in range(self.size):
+                if not function_row[x] and condition(x, y):
+                    row[x] = not row[x]
+
+    def penalty(self) -> int:
+        size = self.size
+        modules = self.modules
+        result = 0
+
+        for lines in (modules, list(zip(*modules))):
+            for line in lines:
+                run_color = False
+                run_length = 0
+                history = [0] * 7
+                for dark in line:
+                    if dark == run_color:
+                        run_length += 1
+                        if run_length == 5:
+                            result += _PENALTY_N1
+                        elif run_length > 5:
+                            result += 1
+                    else:
+                        _add_run_history(run_length, history, size)
+                        if not run_color:
+                            result += _count_finder_patterns(history) * _PENALTY_N3
+                        run_color = dark
+                        run_length = 1
+                if run_color:
+                    _add_run_history(run_length, history, size)
+                    run_length = 0
+                _add_run_history(run_length + size, history, size)
+                result += _count_finder_patterns(history) * _PENALTY_N3
+
+        for y in range(size - 1):
+            row, next_row = modules[y], modules[y + 1]
+            for x in range(size - 1):
+                if row[x] == row[x + 1] == next_row[x] == next_row[x + 1]:
+                    result += _PENALTY_N2
+
+        dark = sum(sum(row) for row in modules)
+        total = size * size
+        k = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+        result += k * _PENALTY_N4
+        return result
+
+
+def _add_run_history(run_length: int, history: list[int], size: int):
+    if history[0] == 0:
+        run_length += size  # Borda clara antes da primeira sequência
+    history.pop()
+    history.insert(0, run_length)
+
+
+def _count_finder_patterns(history: list[int]) -> int:
+    n = history[1]
+    core = n > 0 and history[2] == history[4] == history[5] == n and history[3] == n * 3
+    return (1 if core and history[0] >= n * 4 and history[6] >= n else 0) + (
+        1 if core and history[6] >= n * 4 and history[0] >= n else 0
+    )
+
+
+def encode(text: str, ecl: str = "M", mask: int | None = None) -> list[list[bool]]:
+    """
+    Codifica `text` (UTF-8, modo byte) na menor versão que comporta os dados.
+
+    Returns:
+        list: matriz de módulos (True = escuro), sem a zona de silêncio
+    """
+    if ecl not in ERROR_CORRECTION:
+        raise ValueError(f"Nível de correção inválido: {ecl}")
+
+    data = text.encode("utf-8")
+    for version in range(1, 41):
+        count_bits = 8 if version <= 9 else 16
+        if 4 + count_bits + len(data) * 8 <= _num_data_codewords(version, ecl) * 8:
+            break
+    else:
+        raise ValueError("Texto grande demais para um QR Code.")
+
+    codewords = _add_error_correction(_data_codewords(data, version, ecl), version, ecl)
+
+    matrix = _Matrix(version)
+    matrix.draw_function_patterns(ecl)
+    matrix.draw_codewords(codewords)
+
+    if mask is None:
+        best_penalty = None
+        for candidate in range(8):
+            matrix.apply_mask(candidate)
+            matrix.draw_format_bits(ecl, candidate)
+            penalty = matrix.penalty()
+            if best_penalty is None or penalty < best_penalty:
+                mask, best_penalty = candidate, penalty
+            matrix.apply_mask(candidate)  # Desfaz (XOR)
+
+    matrix.apply_mask(mask)
+    matrix.draw_format_bits(ecl, mask)
+    return matrix.modules
+
+
+# --- Renderização ---
+
+
+def _to_png_or_webp(modules, fmt: str, scale: int, border: int) -> bytes:
+    size = len(modules) + border * 2
+    light = b"\xff" * border
+    pixels = b"".join(
+        light + bytes(0 if dark else 255 for dark in row) + light for row in modules
+    )
+    blank = b"\xff" * (size * border)
+    image = Image.frombytes("L", (size, size), blank + pixels + blank)
+    image = image.resize((size * scale, size * scale), Image.NEAREST).convert("1")
+
+    output = io.BytesIO()
+    if fmt == "webp":
+        image.convert("L").save(output, format="WEBP", lossless=True)
+    else:
+        image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def _to_svg(modules, scale: int, border: int) -> bytes:
+    size = len(modules) + border * 2
+    path = []
+    for y, row in enumerate(modules):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                path.append(f"M{start + border},{y + border}h{x - start}v1h-{x - start}z")
+            x += 1
+
+    pixels = size * scale
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'width="{pixels}" height="{pixels}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="#fff"/>'
+        f'<path d="{"".join(path)}" fill="#000"/></svg>'
+    ).encode("ascii")
+
+
+def scale_for(text: str, size: int, border: int = 4) -> int:
+    """Pixels por módulo para que a imagem tenha até `size` pixels de lado."""
+    modules = len(encode_cached(text)) + border * 2
+    return max(1, size // modules)
+
+
+@functools.lru_cache(maxsize=64)
+def encode_cached(text: str) -> tuple:
+    return tuple(tuple(row) for row in encode(text))
+
+
+def cache_key(text: str, fmt: str, scale: int, border: int = 4) -> str:
+    """Identificador estável da imagem (usado no ETag, na URL e no disco)."""
+    raw = f"{RENDER_VERSION}:{fmt}:{scale}:{border}:{text}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _disk_path(key: str, fmt: str) -> str | None:
+    if not settings.QR_CACHE_DIR:
+        return None
+    return os.path.join(settings.QR_CACHE_DIR, f"{key}.{fmt}")
+
+
+def _read_disk(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def _write_disk(path: str, content: bytes):
+    """Grava de forma atômica (arquivo temporário + rename); falhas são ignoradas."""
+    directory = os.path.dirname(path)
+    temp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        os.replace(temp_path, path)
+    except OSError:
+        if temp_path is not None:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+
+def _render(text: str, fmt: str, scale: int, border: int) -> bytes:
+    key = cache_key(text, fmt, scale, border)
+    path = _disk_path(key, fmt)
+    if path:
+        content = _read_disk(path)
+        if content is not None:
+            return content
+
+    modules = encode_cached(text)
+    if fmt == "svg":
+        content = _to_svg(modules, scale, border)
+    else:
+        content = _to_png_or_webp(modules, fmt, scale, border)
+
+    if path:
+        _write_disk(path, content)
+    return content
+
+
+_render_cached = None
+
+
+def render(text: str, fmt: str = "png", scale: int = 8, border: int = 4) -> bytes:
+    """
+    Renderiza o QR Code de `text` em PNG, WebP ou SVG.
+
+    O resultado fica em um cache LRU em memória (QR_CACHE_SIZE imagens por
+    processo) e, se QR_CACHE_DIR estiver configurado, também em disco,
+    compartilhado entre os processos.
+    """
+    global _render_cached
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de imagem inválido: {fmt}")
+
+    if _render_cached is None:
+        _render_cached = functools.lru_cache(maxsize=settings.QR_CACHE_SIZE)(_render)
+    return _render_cached(text, fmt, scale, border)
+
+
+def render_cache_info():
+    """Estatísticas do cache em memória (hits, misses, maxsize, currsize)."""
+    return _render_cached.cache_info() if _render_cached else None
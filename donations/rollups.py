@@ -0,0 +1,203 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .metrics import payment_status_transitions
+from .models import DonationRollup, Payment
+
+# Campos do pagamento que definem em qual total ele entra
+ROLLUP_FIELDS = ("data", "status", "tipo_doacao", "valor")
+
+GRANULARITIES = {
+    "hour": TruncHour,
+    "day": TruncDay,
+}
+
+
+def snapshot(payment: Payment) -> tuple:
+    """Estado do pagamento relevante para os totais (na ordem de ROLLUP_FIELDS)."""
+    return tuple(getattr(payment, field) for field in ROLLUP_FIELDS)
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """
+    Início do intervalo (hora ou dia, no fuso de TIME_ZONE) que contém `value`;
+    o mesmo resultado de TruncHour/TruncDay no banco.
+    """
+    local = timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        local = local.replace(hour=0)
+    return local
+
+
+def _add(deltas: dict, state: tuple | None, sign: int):
+    if state is None:
+        return
+    data, status, tipo_doacao, valor = state
+    for granularity in GRANULARITIES:
+        key = (granularity, bucket_start(data, granularity), status, tipo_doacao or "")
+        deltas[key][0] += sign
+        deltas[key][1] += sign * Decimal(str(valor))
+
+
+def _apply(deltas: dict):
+    for (granularity, inicio, status, tipo_doacao), (quantidade, total) in deltas.items():
+        if not quantidade and not total:
+            continue
+
+        lookup = {
+            "granularidade": granularity,
+            "inicio": inicio,
+            "status": status,
+            "tipo_doacao": tipo_doacao,
+        }
+        increment = {"quantidade": F("quantidade") + quantidade, "total": F("total") + total}
+
+        if DonationRollup.objects.filter(**lookup).update(**increment):
+            continue
+        try:
+            # O savepoint permite repetir o UPDATE se outra transação criou
+            # a linha entre o UPDATE e o INSERT
+            with transaction.atomic():
+                DonationRollup.objects.create(**lookup, quantidade=quantidade, total=total)
+        except IntegrityError:
+            DonationRollup.objects.filter(**lookup).update(**increment)
+
+
+def _count_transitions(transitions: list[tuple[str, str]]):
+    for from_status, to_status in transitions:
+        payment_status_transitions.labels(from_status, to_status).inc()
+
+
+def record_changes(changes):
+    """
+    Aplica aos totais as mudanças de pagamentos, dadas como pares
+    (estado anterior, estado novo) de `snapshot` (None para pagamento novo ou
+    removido).
+
+    Cada total afetado recebe um único UPDATE com F(), então atualizações
+    simultâneas do mesmo intervalo não se perdem. As mudanças de status são
+    contadas nas métricas quando a transação é confirmada.
+    """
+    deltas = defaultdict(lambda: [0, Decimal("0")])
+    transitions = []
+    for before, after in changes:
+        if before == after:
+            continue
+        _add(deltas, before, -1)
+        _add(deltas, after, 1)
+        if after is not None and (before is None or before[1] != after[1]):
+            transitions.append((before[1] if before else "none", after[1]))
+    _apply(deltas)
+    if transitions:
+        transaction.on_commit(lambda: _count_transitions(transitions))
+
+
+def record_change(before: tuple | None, after: tuple | None):
+    record_changes([(before, after)])
+
+
+def _locked_snapshots(payment_ids) -> dict:
+    # Estado atual no banco, com lock até o fim da transação: duas
+    # atualizações simultâneas do mesmo pagamento (webhook e verificação
+    # manual) não contam a mesma transição duas vezes
+    rows = (
+        Payment.objects.select_for_update()
+        .filter(pk__in=payment_ids)
+        .order_by("pk")
+        .values_list("pk", *ROLLUP_FIELDS)
+    )
+    return {row[0]: row[1:] for row in rows}
+
+
+def save_payment(payment: Payment, **save_kwargs):
+    """Grava o pagamento e aplica a mudança aos totais na mesma transação."""
+    with transaction.atomic():
+        before = _locked_snapshots([payment.pk]).get(payment.pk) if payment.pk else None
+        payment.save(**save_kwargs)
+        record_change(before, snapshot(payment))
+
+
+def bulk_update_payments(payments: list[Payment], fields: list[str], batch_size=None):
+    """`bulk_update` dos pagamentos, aplicando as mudanças aos totais."""
+    with transaction.atomic():
+        befores = _locked_snapshots([payment.pk for payment in payments])
+        Payment.objects.bulk_update(payments, fields, batch_size=batch_size)
+        record_changes((befores.get(payment.pk), snapshot(payment)) for payment in payments)
+
+
+def rebuild_rollups(start: date | None = None, end: date | None = None) -> int:
+    """
+    Recalcula os totais a partir de `Payment`, dos dias `start` a `end`
+    (inclusivos; sem limites, todo o histórico).
+
+    Returns:
+        int: quantidade de totais gravados
+    """
+    payments = Payment.objects.order_by()
+    rollups = DonationRollup.objects.all()
+    if start is not None:
+        start = timezone.make_aware(datetime.combine(start, time.min))
+        payments = payments.filter(data__gte=start)
+        rollups = rollups.filter(inicio__gte=start)
+    if end is not None:
+        end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        payments = payments.filter(data__lt=end)
+        rollups = rollups.filter(inicio__lt=end)
+
+    with transaction.atomic():
+        rollups.delete()
+
+        created = 0
+        for granularity, trunc in GRANULARITIES.items():
+            rows = (
+                payments.annotate(inicio=trunc("data"))
+                .values("inicio", "status", "tipo_doacao")
+                .annotate(quantidade=Count("id"), total=Sum("valor"))
+            )
+            created += len(
+                DonationRollup.objects.bulk_create(
+                    (
+                        DonationRollup(
+                            granularidade=granularity,
+                            inicio=row["inicio"],
+                            status=row["status"],
+                            tipo_doacao=row["tipo_doacao"] or "",
+                            quantidade=row["quantidade"],
+                            total=row["total"],
+                        )
+                        for row in rows.iterator()
+                    ),
+                    batch_size=1000,
+                )
+            )
+    return created
+
+
+def rollup_series(granularity: str, start: datetime, end: datetime, status=None, tipo_doacao=None):
+    """
+    Série de totais por intervalo entre `start` (inclusivo) e `end`
+    (exclusivo), agrupada por início do intervalo e status.
+
+    Lê apenas os totais: o custo depende do número de intervalos, não de
+    pagamentos.
+    """
+    rollups = DonationRollup.objects.filter(
+        granularidade=granularity, inicio__gte=start, inicio__lt=end
+    )
+    if status:
+        rollups = rollups.filter(status=status)
+    if tipo_doacao is not None:
+        rollups = rollups.filter(tipo_doacao=tipo_doacao)
+
+    return list(
+        rollups.values("inicio", "status")
+        .annotate(quantidade=Sum("quantidade"), total=Sum("total"))
+        .filter(quantidade__gt=0)
+        .order_by("inicio", "status")
+    )
@@ -1,8 +1,12 @@
+import logging
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models.signals import post_migrate
 from django.dispatch import receiver
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_migrate)
 def create_superuser(sender, **kwargs):
@@ -23,4 +27,4 @@ def create_superuser(sender, **kwargs):
                 email="",  # Email vazio
                 password=password,
             )
-            print(f"✅ Superusuário criado: {username}")
+            logger.info("Superusuário criado", extra={"username": username})
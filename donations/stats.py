@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Payment
+
+_ZERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _filter_payments(queryset=None, start=None, end=None, tipo_doacao=None):
+    """
+    Aplica os filtros opcionais de período e tipo de doação.
+
+    `start` é inclusivo e `end` é exclusivo, ambos comparados com `Payment.data`.
+    """
+    if queryset is None:
+        queryset = Payment.objects.all()
+
+    if start is not None:
+        queryset = queryset.filter(data__gte=start)
+    if end is not None:
+        queryset = queryset.filter(data__lt=end)
+    if tipo_doacao:
+        queryset = queryset.filter(tipo_doacao=tipo_doacao)
+
+    # Remove a ordenação padrão (-data), desnecessária para agregações
+    return queryset.order_by()
+
+
+def _aggregates():
+    approved = Q(status="approved")
+    pending = Q(status="pending")
+    return {
+        "total_arrecadado": Coalesce(Sum("valor", filter=approved), _ZERO),
+        "total_pendente": Coalesce(Sum("valor", filter=pending), _ZERO),
+        "total_doacoes": Count("id", filter=approved),
+        "total_pendentes": Count("id", filter=pending),
+    }
+
+
+def payment_totals(queryset=None, start=None, end=None, tipo_doacao=None) -> dict:
+    """
+    Calcula os totais do dashboard em uma única consulta agregada.
+
+    Returns:
+        dict: {
+            "total_arrecadado": Decimal,  # soma dos pagamentos aprovados
+            "total_pendente": Decimal,    # soma dos pagamentos pendentes
+            "total_doacoes": int,         # quantidade de pagamentos aprovados
+            "total_pendentes": int,       # quantidade de pagamentos pendentes
+        }
+    """
+    queryset = _filter_payments(queryset, start, end, tipo_doacao)
+    return queryset.aggregate(**_aggregates())
+
+
+def payment_totals_by_tipo(queryset=None, start=None, end=None) -> list[dict]:
+    """
+    Calcula os mesmos totais de `payment_totals`, agrupados por `tipo_doacao`.
+
+    Executa uma única consulta com GROUP BY, independente da quantidade de linhas.
+    """
+    queryset = _filter_payments(queryset, start, end)
+    return list(
+        queryset.values("tipo_doacao")
+        .annotate(**_aggregates())
+        .order_by("tipo_doacao")
+    )
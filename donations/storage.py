@@ -0,0 +1,108 @@
+import io
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, features
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+# Formatos das variantes de imagem, do mais ao menos compacto
+IMAGE_FORMATS = {
+    "avif": {"format": "AVIF", "quality": 60},
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "png": {"format": "PNG", "optimize": True},
+}
+
+
+def image_formats() -> list[str]:
+    """Formatos que o Pillow instalado consegue gravar."""
+    return [fmt for fmt in IMAGE_FORMATS if fmt == "png" or features.check(fmt)]
+
+
+def variant_name(name: str, width: int, fmt: str) -> str:
+    """Nome da variante: `logo.png`, 120, "webp" -> `logo-120.webp`."""
+    root, _ = posixpath.splitext(name)
+    return f"{root}-{width}.{fmt}"
+
+
+def minify_css(css: str) -> str:
+    """
+    Remove comentários (exceto os /*! de licença) e espaços desnecessários.
+
+    Conservador: só remove espaços ao redor de chaves, ponto e vírgula,
+    vírgulas e do combinador `>`, e depois de dois-pontos (antes deles, o
+    espaço muda o seletor: `a :hover`).
+    """
+    css = re.sub(r"/\*(?!!).*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Armazenamento dos arquivos estáticos em produção.
+
+    Antes do hash e da compressão (WhiteNoise), o `collectstatic`:
+
+    - minifica o CSS próprio (os `.min.css` de terceiros já vêm minificados);
+    - gera as variantes redimensionadas de STATIC_IMAGE_VARIANTS, em AVIF,
+      WebP e PNG.
+
+    Os arquivos gerados passam pelo mesmo processo dos demais: nome com hash
+    (cache de longo prazo) e versões gzip/Brotli.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            self._minify_css(paths)
+            self._build_image_variants(paths)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def _replace(self, name: str, content: bytes):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))
+
+    def _minify_css(self, paths: dict):
+        # Apenas o CSS do projeto (STATICFILES_DIRS), não o de apps de terceiros
+        own_locations = {
+            os.path.realpath(entry[1] if isinstance(entry, (list, tuple)) else entry)
+            for entry in settings.STATICFILES_DIRS
+        }
+        for name, (storage, path) in list(paths.items()):
+            if not name.endswith(".css") or name.endswith(".min.css"):
+                continue
+            if os.path.realpath(getattr(storage, "location", "")) not in own_locations:
+                continue
+            with storage.open(path) as file:
+                css = file.read().decode("utf-8")
+            self._replace(name, minify_css(css).encode("utf-8"))
+            # O hash passa a ser calculado sobre o arquivo minificado
+            paths[name] = (self, name)
+
+    def _build_image_variants(self, paths: dict):
+        formats = image_formats()
+        for name, widths in settings.STATIC_IMAGE_VARIANTS.items():
+            if name not in paths:
+                continue
+            storage, path = paths[name]
+            with storage.open(path) as file:
+                image = Image.open(file)
+                image.load()
+
+            for width in widths:
+                if width > image.width:
+                    continue
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                for fmt in formats:
+                    buffer = io.BytesIO()
+                    resized.save(buffer, **IMAGE_FORMATS[fmt])
+                    variant = variant_name(name, width, fmt)
+                    self._replace(variant, buffer.getvalue())
+                    paths[variant] = (self, variant)
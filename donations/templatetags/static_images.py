@@ -0,0 +1,69 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..storage import IMAGE_FORMATS, variant_name
+
+register = template.Library()
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "png": "image/png"}
+
+
+def _variant_url(name: str, width: int, fmt: str) -> str | None:
+    """
+    URL da variante gerada no collectstatic, ou None se ela não existir
+    (DEBUG, testes ou imagem fora de STATIC_IMAGE_VARIANTS).
+    """
+    if settings.DEBUG:
+        return None
+    variant = variant_name(name, width, fmt)
+    if variant not in getattr(staticfiles_storage, "hashed_files", {}):
+        return None
+    return static(variant)
+
+
+@register.simple_tag
+def image_variant(name: str, width: int, fmt: str = "png") -> str:
+    """URL da variante de `name` com a largura e o formato dados, ou da original."""
+    return _variant_url(name, width, fmt) or static(name)
+
+
+def _srcset(name: str, width: int, fmt: str):
+    candidates = [
+        (url, f"{density}x")
+        for density in (1, 2)
+        if (url := _variant_url(name, width * density, fmt))
+    ]
+    return format_html_join(", ", "{} {}", candidates) if candidates else None
+
+
+@register.simple_tag
+def picture(name: str, width: int, **attrs) -> str:
+    """
+    `<picture>` com as variantes AVIF e WebP de `name` (1x e 2x) e uma
+    `<img>` PNG redimensionada; sem variantes, a `<img>` aponta para a
+    imagem original.
+
+    Os argumentos nomeados viram atributos da `<img>`:
+    {% picture 'logo.png' 120 alt="Logo" class="mb-3" %}
+    """
+    attributes = format_html_join(" ", '{}="{}"', attrs.items())
+
+    png_srcset = _srcset(name, width, "png")
+    if png_srcset is None:
+        return format_html('<img src="{}" {}>', static(name), attributes)
+
+    sources = [
+        (MIME_TYPES[fmt], srcset)
+        for fmt in IMAGE_FORMATS
+        if fmt != "png" and (srcset := _srcset(name, width, fmt))
+    ]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" {}></picture>',
+        format_html_join("", '<source type="{}" srcset="{}">', sources),
+        _variant_url(name, width, "png") or static(name),
+        png_srcset,
+        attributes,
+    )
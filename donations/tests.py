@@ -1,3 +1,1623 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+from django.test import AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from . import export, qr
+from services.circuit_breaker import CircuitOpenError
+
+from .checks import check_database_connections, check_shared_cache
+from .deferred_pix import DEFERRED_PIX_TIMEOUT, claim_deferred_pix
+from .logs import CorrelationFilter, QueueHandler, bind, correlation, redact
+from .models import (
+    DonationRollup,
+    Payment,
+    PaymentPixArtifact,
+    PixPoolCharge,
+)
+from .page_cache import CSRF_PLACEHOLDER
+from .pagination import EstimatedCountPaginator
+from .pix_pool import create_payment_from_pool, pool_payment_ids, pool_stats, refill_pool
+from .rollups import bucket_start, rebuild_rollups, save_payment
+from .stats import payment_totals, payment_totals_by_tipo
+from .storage import image_formats, minify_css
+from .views import donation_page_async, export_payments, waiting_payment_async
+
+# Os testes de views não dependem do manifest gerado pelo collectstatic
+TEST_STORAGES = {
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+
+PIX_CODE = (
+    "00020101021226830014br.gov.bcb.pix2561qrpix.bradesco.com.br/qr/v2/cobv/"
+    "5f3c1a2e-7d3b-4c2f-9f7e-1a2b3c4d5e6f5204000053039865802BR5925ASSOCIACAO "
+    "TOYLINK PROJETO6009SAO PAULO62070503***6304ABCD"
+)
+PIX_CODE_MATRIX_SHA256 = "3c79f07c0d39f70a2a97adaa8863d0c42292c64ddf046fc40bc3978a16229210"
+
+
+def create_payments(count, status="approved", valor="10.00", tipo_doacao="brinquedos", **extra):
+    Payment.objects.bulk_create(
+        Payment(valor=Decimal(valor), status=status, tipo_doacao=tipo_doacao, **extra)
+        for _ in range(count)
+    )
+
+
+class PaymentStatsTests(TestCase):
+    def test_totals(self):
+        create_payments(3, status="approved", valor="10.00")
+        create_payments(2, status="pending", valor="5.50")
+        create_payments(1, status="rejected", valor="100.00")
+
+        totals = payment_totals()
+
+        self.assertEqual(totals["total_arrecadado"], Decimal("30.00"))
+        self.assertEqual(totals["total_pendente"], Decimal("11.00"))
+        self.assertEqual(totals["total_doacoes"], 3)
+        self.assertEqual(totals["total_pendentes"], 2)
+
+    def test_totals_empty_table(self):
+        totals = payment_totals()
+
+        self.assertEqual(totals["total_arrecadado"], Decimal("0"))
+        self.assertEqual(totals["total_pendente"], Decimal("0"))
+        self.assertEqual(totals["total_doacoes"], 0)
+
+    def test_totals_date_range_and_tipo(self):
+        now = timezone.now()
+        create_payments(2, data=now - timedelta(days=10))
+        create_payments(1, data=now)
+        create_payments(4, data=now, tipo_doacao="alimentacao")
+
+        totals = payment_totals(start=now - timedelta(days=1), tipo_doacao="brinquedos")
+
+        self.assertEqual(totals["total_doacoes"], 1)
+        self.assertEqual(totals["total_arrecadado"], Decimal("10.00"))
+
+    def test_totals_by_tipo(self):
+        create_payments(2, tipo_doacao="brinquedos")
+        create_payments(3, status="pending", tipo_doacao="alimentacao")
+
+        rows = {row["tipo_doacao"]: row for row in payment_totals_by_tipo()}
+
+        self.assertEqual(rows["brinquedos"]["total_doacoes"], 2)
+        self.assertEqual(rows["alimentacao"]["total_pendentes"], 3)
+        self.assertEqual(rows["alimentacao"]["total_pendente"], Decimal("30.00"))
+
+    def test_totals_single_query_regardless_of_size(self):
+        create_payments(10)
+        with self.assertNumQueries(1):
+            payment_totals()
+
+        create_payments(1000)
+        with self.assertNumQueries(1):
+            payment_totals()
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class DashboardTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("staff", password="senha")
+        self.client.force_login(user)
+
+    def dashboard_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return ctx.captured_queries
+
+    def test_dashboard_query_count_is_flat(self):
+        create_payments(5)
+        small = len(self.dashboard_queries())
+
+        create_payments(1000)
+        create_payments(1000, status="pending")
+        large = len(self.dashboard_queries())
+
+        self.assertEqual(small, large)
+
+    def test_dashboard_totals(self):
+        create_payments(2, valor="15.00")
+        create_payments(1, status="pending", valor="7.00")
+
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(response.context["total_arrecadado"], Decimal("30.00"))
+        self.assertEqual(response.context["total_pendente"], Decimal("7.00"))
+        self.assertEqual(response.context["total_doacoes"], 2)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("staff", password="senha")
+        self.client.force_login(user)
+
+        # Pagamentos com datas repetidas: o id desempata a ordem
+        now = timezone.now()
+        for i in range(45):
+            Payment.objects.create(
+                valor=Decimal("10.00"),
+                status="approved" if i % 3 else "pending",
+                data=now - timedelta(minutes=i // 2),
+            )
+        self.expected = list(Payment.objects.order_by("-data", "-id").values_list("id", flat=True))
+
+    def get(self, **params):
+        response = self.client.get(reverse("dashboard"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["page_obj"]
+
+    def ids(self, page):
+        return [payment.id for payment in page]
+
+    def test_walks_all_pages_both_ways(self):
+        pages = [self.get()]
+        while pages[-1].has_next():
+            pages.append(self.get(older=pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual(sum((self.ids(page) for page in pages), []), self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        page = self.get(newer=pages[-1].previous_cursor)
+        self.assertEqual(self.ids(page), self.ids(pages[1]))
+        page = self.get(newer=page.previous_cursor)
+        self.assertEqual(self.ids(page), self.ids(pages[0]))
+        self.assertFalse(page.has_previous())
+
+    def test_status_filter(self):
+        first = self.get(status="approved")
+        second = self.get(status="approved", older=first.next_cursor)
+
+        expected = list(
+            Payment.objects.filter(status="approved")
+            .order_by("-data", "-id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(self.ids(first) + self.ids(second), expected)
+        self.assertFalse(second.has_next())
+
+    def test_single_range_query_without_count_or_offset(self):
+        cursor = self.get().next_cursor
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.get(older=cursor)
+
+        page_queries = [
+            query["sql"] for query in ctx.captured_queries if "ORDER BY" in query["sql"]
+        ]
+        self.assertEqual(len(page_queries), 1)
+        self.assertNotIn("OFFSET", page_queries[0])
+        self.assertFalse(any("COUNT(*)" in query["sql"] for query in ctx.captured_queries))
+
+    def test_invalid_cursor_returns_first_page(self):
+        self.assertEqual(self.ids(self.get(older="nao-e-um-cursor")), self.expected[:20])
+        self.assertEqual(self.ids(self.get(newer="%%%")), self.expected[:20])
+
+    def test_renders_cursor_links(self):
+        response = self.client.get(reverse("dashboard"), {"status": "approved"})
+
+        self.assertContains(response, "Mais antigas")
+        self.assertContains(response, "?older=")
+        self.assertContains(response, "&status=approved")
+        self.assertNotContains(response, "?page=")
+
+    @override_settings(DASHBOARD_CURSOR_PAGINATION=False)
+    def test_numbered_pages(self):
+        page = self.get(page="3")
+
+        self.assertEqual(page.number, 3)
+        self.assertEqual(page.paginator.count, 45)
+
+
+class ExportPaymentsTests(TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user("staff", password="senha", is_staff=True)
+        self.client.force_login(self.staff)
+
+        day = timezone.make_aware(datetime(2025, 3, 10, 12, 0))
+        Payment.objects.create(valor=Decimal("10.00"), status="approved", data=day, nome_doador="Ana")
+        Payment.objects.create(
+            valor=Decimal("20.00"), status="pending", data=day + timedelta(days=1)
+        )
+        Payment.objects.create(
+            valor=Decimal("30.00"), status="approved", data=day + timedelta(days=2)
+        )
+
+    def export(self, **params):
+        response = self.client.get(reverse("export_payments"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_with_filters(self):
+        response, content = self.export(status="approved", start="2025-03-10", end="2025-03-11")
+
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], export.EXPORT_FIELDS)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][2:4], ["10.00", "approved"])
+        self.assertEqual(rows[1][5], "Ana")
+        self.assertIn("attachment;", response["Content-Disposition"])
+
+    def test_jsonl_gzip(self):
+        response, content = self.export(format="jsonl", gzip="1")
+
+        lines = gzip.decompress(content).decode().splitlines()
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn(".jsonl.gz", response["Content-Disposition"])
+        self.assertEqual([json.loads(line)["valor"] for line in lines], ["10.00", "20.00", "30.00"])
+
+    def test_streams_in_chunks_without_qr_columns(self):
+        rows = export.export_queryset()
+
+        with CaptureQueriesContext(connection) as ctx:
+            chunks = list(export.iter_export(rows, "csv", chunk_size=1))
+
+        self.assertEqual(len(chunks), 3)  # um bloco por linha (o primeiro com o cabeçalho)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("qr_code", ctx.captured_queries[0]["sql"])
+
+    def test_csv_neutralizes_formulas(self):
+        Payment.objects.update(nome_doador='=HYPERLINK("http://x","clique")')
+        Payment.objects.filter(valor=Decimal("20.00")).update(nome_doador="@SUM(A1)")
+
+        _, content = self.export()
+
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[1][5], '\'=HYPERLINK("http://x","clique")')
+        self.assertEqual(rows[2][5], "'@SUM(A1)")
+        self.assertEqual(rows[1][2], "10.00")
+
+    async def test_asgi_streams_with_async_iterator(self):
+        request = AsyncRequestFactory().get(reverse("export_payments"))
+        request.user = self.staff
+
+        response = await sync_to_async(export_payments)(request)
+
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual(len(rows), 4)
+
+    async def test_async_export_closes_generator_on_disconnect(self):
+        closed = []
+
+        def iter_export(*args):
+            try:
+                yield b"1"
+                yield b"2"
+            finally:
+                closed.append(threading.current_thread())
+
+        with mock.patch.object(export, "iter_export", iter_export):
+            chunks = export.aiter_export(None, "csv")
+            self.assertEqual(await anext(chunks), b"1")
+            await chunks.aclose()  # Cliente desconectou
+
+        self.assertEqual(len(closed), 1)
+        self.assertIsNot(closed[0], threading.current_thread())
+
+    def test_invalid_filters(self):
+        for params in ({"format": "xml"}, {"status": "x"}, {"start": "10/03/2025"}, {"start": "2025-02-30"}):
+            response = self.client.get(reverse("export_payments"), params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_staff_only(self):
+        self.client.force_login(get_user_model().objects.create_user("comum", password="senha"))
+
+        response = self.client.get(reverse("export_payments"))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "doacoes.csv.gz")
+            call_command("export_payments", "--status", "pending", "--gzip", "-o", path, stderr=io.StringIO())
+
+            with gzip.open(path, "rt") as file:
+                rows = list(csv.reader(file))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][3], "pending")
+
+    def test_command_invalid_date(self):
+        with self.assertRaises(CommandError):
+            call_command("export_payments", "--end", "amanhã")
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PaymentAdminTests(TestCase):
+    def setUp(self):
+        admin_user = get_user_model().objects.create_superuser("root", password="senha")
+        self.client.force_login(admin_user)
+
+        Payment.objects.create(
+            valor=Decimal("10.00"), payment_id="123456", email_doador="Ana@Example.com", nome_doador="Ana Souza"
+        )
+        Payment.objects.create(valor=Decimal("20.00"), payment_id="1234", nome_doador="Bruno")
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin:donations_payment_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query["sql"] for query in ctx.captured_queries]
+
+    def found(self, term):
+        response, _ = self.changelist(q=term)
+        return sorted(payment.nome_doador for payment in response.context["cl"].result_list)
+
+    def test_search(self):
+        self.assertEqual(self.found("1234"), ["Bruno"])  # ID exato, não por trecho
+        self.assertEqual(self.found("ana@example.com"), ["Ana Souza"])
+        self.assertEqual(self.found("souza"), ["Ana Souza"])
+        self.assertEqual(self.found("example"), [])
+
+    def test_list_query_loads_only_displayed_columns(self):
+        response, queries = self.changelist()
+
+        list_query = next(sql for sql in queries if sql.startswith('SELECT "donations_payment"."id"'))
+        self.assertNotIn("payment_url", list_query)
+        self.assertNotIn("email_doador", list_query)
+        self.assertContains(response, "Ana Souza")
+
+    def test_no_full_count_when_filtered(self):
+        _, queries = self.changelist(status__exact="approved")
+
+        counts = [sql for sql in queries if "COUNT(*)" in sql]
+        self.assertEqual(len(counts), 1)
+        self.assertIn("WHERE", counts[0])
+
+    def test_date_hierarchy(self):
+        response, _ = self.changelist()
+
+        self.assertContains(response, f"data__year={timezone.now().year}")
+
+    def test_estimated_count(self):
+        queryset = Payment.objects.all()
+
+        with mock.patch("donations.pagination.estimated_count", return_value=5_000_000):
+            with self.assertNumQueries(0):
+                self.assertEqual(EstimatedCountPaginator(queryset, 20).count, 5_000_000)
+
+        # Estimativa pequena (ou banco sem estimativa): contagem exata
+        with mock.patch("donations.pagination.estimated_count", return_value=50):
+            self.assertEqual(EstimatedCountPaginator(queryset, 20).count, 2)
+        self.assertEqual(EstimatedCountPaginator(queryset, 20).count, 2)
+
+
+class DonationRollupTests(TestCase):
+    def setUp(self):
+        self.now = timezone.make_aware(datetime(2025, 3, 10, 14, 25))
+
+    def totals(self, granularity="day"):
+        return {
+            (rollup.inicio, rollup.status, rollup.tipo_doacao): (rollup.quantidade, rollup.total)
+            for rollup in DonationRollup.objects.filter(granularidade=granularity)
+            if rollup.quantidade
+        }
+
+    def new_payment(self, valor="10.00", **fields):
+        payment = Payment(valor=Decimal(valor), data=self.now, tipo_doacao="brinquedos", **fields)
+        save_payment(payment)
+        return payment
+
+    def test_bucket_start(self):
+        self.assertEqual(bucket_start(self.now, "hour"), self.now.replace(minute=0))
+        self.assertEqual(bucket_start(self.now, "day"), self.now.replace(hour=0, minute=0))
+
+    def test_status_transition(self):
+        payment = self.new_payment()
+        self.new_payment("5.00")
+        day = bucket_start(self.now, "day")
+
+        payment.status = "approved"
+        save_payment(payment)
+
+        self.assertEqual(
+            self.totals(),
+            {
+                (day, "pending", "brinquedos"): (1, Decimal("5.00")),
+                (day, "approved", "brinquedos"): (1, Decimal("10.00")),
+            },
+        )
+        self.assertEqual(len(self.totals("hour")), 2)
+
+    def test_approval_date_moves_bucket(self):
+        payment = self.new_payment()
+
+        payment.status = "approved"
+        payment.data = self.now + timedelta(days=1)
+        save_payment(payment)
+
+        self.assertEqual(
+            self.totals(),
+            {(bucket_start(payment.data, "day"), "approved", "brinquedos"): (1, Decimal("10.00"))},
+        )
+
+    def test_stale_instances_count_transition_once(self):
+        payment = self.new_payment()
+        first, second = Payment.objects.get(pk=payment.pk), Payment.objects.get(pk=payment.pk)
+
+        first.status = second.status = "approved"
+        save_payment(first)
+        save_payment(second)
+
+        self.assertEqual(
+            self.totals(),
+            {(bucket_start(self.now, "day"), "approved", "brinquedos"): (1, Decimal("10.00"))},
+        )
+
+    def test_rebuild_matches_incremental_updates(self):
+        for i in range(6):
+            payment = self.new_payment(f"{i + 1}.00")
+            if i % 2:
+                payment.status = "approved"
+                payment.data = self.now + timedelta(hours=i)
+                save_payment(payment)
+        incremental = self.totals("hour"), self.totals("day")
+
+        DonationRollup.objects.all().delete()
+        call_command("rebuild_rollups", stdout=io.StringIO())
+
+        self.assertEqual((self.totals("hour"), self.totals("day")), incremental)
+
+    def test_rebuild_date_range(self):
+        self.new_payment()
+        DonationRollup.objects.update(quantidade=99)
+
+        created = rebuild_rollups(start=self.now.date(), end=self.now.date())
+
+        self.assertEqual(created, 2)
+        self.assertEqual(set(DonationRollup.objects.values_list("quantidade", flat=True)), {1})
+
+    @mock.patch("donations.views.MercadoPagoService")
+    def test_waiting_payment_verification(self, service):
+        service.return_value.get_payment_info.return_value = {"status": "approved"}
+        payment = self.new_payment(payment_id="mp-1")
+
+        self.client.post(reverse("waiting_payment", args=[payment.id]))
+
+        self.assertEqual(
+            [status for _, status, _ in self.totals()], ["approved"]
+        )
+
+    def test_admin_delete(self):
+        payment = self.new_payment()
+        self.client.force_login(get_user_model().objects.create_superuser("root", password="senha"))
+
+        self.client.post(
+            reverse("admin:donations_payment_delete", args=[payment.id]), {"post": "yes"}
+        )
+
+        self.assertEqual(self.totals(), {})
+
+
+class DonationRollupsJsonTests(TestCase):
+    def setUp(self):
+        staff = get_user_model().objects.create_user("staff", password="senha", is_staff=True)
+        self.client.force_login(staff)
+
+        day = timezone.make_aware(datetime(2025, 3, 10, 9, 0))
+        for offset, status in ((0, "approved"), (0, "approved"), (1, "pending"), (40, "approved")):
+            save_payment(
+                Payment(valor=Decimal("10.00"), status=status, data=day + timedelta(days=offset))
+            )
+
+    def get(self, **params):
+        return self.client.get(reverse("donation_rollups"), params)
+
+    def test_daily_series(self):
+        response = self.get(start="2025-03-01", end="2025-03-31")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["buckets"],
+            [
+                {"inicio": "2025-03-10T00:00:00-03:00", "status": "approved", "quantidade": 2, "total": "20.00"},
+                {"inicio": "2025-03-11T00:00:00-03:00", "status": "pending", "quantidade": 1, "total": "10.00"},
+            ],
+        )
+
+    def test_hourly_series_with_status(self):
+        response = self.get(granularity="hour", start="2025-03-10", end="2025-03-11", status="pending")
+
+        self.assertEqual(
+            [(row["inicio"], row["quantidade"]) for row in response.json()["buckets"]],
+            [("2025-03-11T09:00:00-03:00", 1)],
+        )
+
+    def test_reads_only_rollups(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.get(start="2020-01-01", end="2029-12-31")
+
+        self.assertFalse(any('"donations_payment"' in query["sql"] for query in ctx.captured_queries))
+
+    def test_invalid_params(self):
+        for params in (
+            {"granularity": "week"},
+            {"start": "ontem"},
+            {"granularity": "hour", "start": "2024-01-01", "end": "2025-01-01"},
+        ):
+            self.assertEqual(self.get(**params).status_code, 400, params)
+
+    def test_staff_only(self):
+        self.client.logout()
+
+        self.assertEqual(self.get().status_code, 302)
+
+
+class DatabaseConnectionTests(TransactionTestCase):
+    def error_ids(self):
+        return [error.id for error in check_database_connections(None)]
+
+    def test_default_settings_are_valid(self):
+        self.assertEqual(self.error_ids(), [])
+
+    @override_settings(DB_POOL_ENABLED=True)
+    def test_pool_requires_postgresql(self):
+        self.assertIn("donations.E002", self.error_ids())
+
+    @override_settings(DB_POOL_ENABLED=True, DB_POOL_MIN_SIZE=5, DB_POOL_MAX_SIZE=2)
+    def test_pool_sizes(self):
+        self.assertIn("donations.E004", self.error_ids())
+
+    @override_settings(DB_CONN_MAX_AGE=-1)
+    def test_negative_max_age(self):
+        self.assertEqual(self.error_ids(), ["donations.E001"])
+
+    @override_settings(DB_CONN_MAX_AGE=60, ASYNC_VIEWS=True)
+    def test_persistent_connections_under_asgi(self):
+        self.assertEqual(self.error_ids(), ["donations.W001"])
+
+    def test_breaker_without_shared_cache(self):
+        # Padrão dos testes (sem CACHE_URL): estado do breaker no banco
+        self.assertEqual(settings.CACHES["shared"]["BACKEND"], "django.core.cache.backends.db.DatabaseCache")
+        self.assertEqual(check_shared_cache(None), [])
+
+        locmem = {**settings.CACHES, "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with self.settings(CACHES=locmem, MP_BREAKER_ENABLED=True):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ["donations.W002"])
+        with self.settings(CACHES=locmem, MP_BREAKER_ENABLED=False):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_benchmark(self):
+        stdout = io.StringIO()
+        settings_dict = connection.settings_dict.copy()
+
+        call_command("benchmark_db_connections", "--requests", "20", stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn("conexão nova por requisição", output)
+        self.assertIn("Economia por requisição", output)
+        self.assertEqual(connection.settings_dict, settings_dict)
+
+
+@override_settings(STATIC_IMAGE_VARIANTS={"logo.png": [40, 80, 120, 240]})
+class StaticAssetPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        cls.storage_settings = override_settings(
+            STATIC_ROOT=cls.static_root,
+            STORAGES={"staticfiles": {"BACKEND": "donations.storage.StaticFilesStorage"}},
+        )
+        with cls.storage_settings:
+            call_command("collectstatic", interactive=False, verbosity=0, ignore_patterns=["admin"])
+        with open(os.path.join(cls.static_root, "staticfiles.json")) as file:
+            cls.manifest = json.load(file)["paths"]
+
+    def setUp(self):
+        cache.clear()
+        caches["template_fragments"].clear()
+
+    def test_minify_css(self):
+        css = "/*! licença */\n/* comentário */\na :hover , b > c {\n  color : red ;\n}\n"
+
+        self.assertEqual(minify_css(css), "/*! licença */ a :hover,b>c{color :red}")
+
+    def test_collectstatic_builds_fingerprinted_assets(self):
+        manifest = self.manifest
+        css_path = os.path.join(self.static_root, manifest["css/base.css"])
+
+        with open(css_path) as file:
+            css = file.read()
+        self.assertNotIn("\n", css)
+        self.assertIn(".card{border:none;", css)
+        self.assertTrue(os.path.exists(css_path + ".gz"))
+
+        for fmt in image_formats():
+            self.assertIn(f"logo-120.{fmt}", manifest)
+        with Image.open(os.path.join(self.static_root, manifest["logo-120.png"])) as image:
+            self.assertEqual(image.width, 120)
+        self.assertIn("logo-240.png", manifest)
+
+    @override_settings(DEBUG=False)
+    def test_picture_uses_generated_variants(self):
+        manifest = self.manifest
+
+        with self.storage_settings:
+            response = self.client.get(reverse("donation_page"))
+
+        self.assertContains(response, "<picture>")
+        self.assertContains(
+            response, f'<source type="image/webp" srcset="/static/{manifest["logo-120.webp"]} 1x'
+        )
+        self.assertContains(response, f'<img src="/static/{manifest["logo-120.png"]}"')
+        self.assertContains(response, manifest["css/base.css"])
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_picture_falls_back_to_original_image(self):
+        response = self.client.get(reverse("donation_page"))
+
+        self.assertNotContains(response, "<picture>")
+        self.assertContains(response, '<img src="/static/logo.png" alt="ToyLink Logo"')
+
+
+@override_settings(STORAGES=TEST_STORAGES, PAGE_CACHE_SECONDS=300)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["template_fragments"].clear()
+
+    def csrf_token(self, response):
+        match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode())
+        return match.group(1)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        self.client.get(reverse("donation_page"))
+
+        response = Client().get(reverse("donation_page"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateNotUsed(response, "donations/donation_page.html")
+        self.assertContains(response, "Faça uma Doação")
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+
+    @mock.patch("donations.views.MercadoPagoService")
+    def test_cached_page_issues_valid_csrf_token(self, service):
+        service.return_value.pay_with_pix.return_value = {"id": "mp-1"}
+        Client().get(reverse("donation_page"))
+
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(reverse("donation_page"))
+        self.assertTemplateNotUsed(response, "donations/donation_page.html")
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+        response = client.post(
+            reverse("donation_page"), {"valor": "15", "csrfmiddlewaretoken": self.csrf_token(response)}
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Payment.objects.filter(payment_id="mp-1").exists())
+
+    def test_each_visitor_gets_own_token(self):
+        first = Client().get(reverse("donation_page"))
+        second = Client().get(reverse("donation_page"))
+
+        self.assertNotEqual(
+            first.cookies[settings.CSRF_COOKIE_NAME].value,
+            second.cookies[settings.CSRF_COOKIE_NAME].value,
+        )
+
+    def test_logged_in_user_bypasses_page_cache(self):
+        self.client.get(reverse("donation_page"))
+        self.client.force_login(get_user_model().objects.create_user("staff", password="senha"))
+
+        response = self.client.get(reverse("donation_page"))
+
+        self.assertTemplateUsed(response, "donations/donation_page.html")
+        # O menu em cache varia conforme o usuário está logado
+        self.assertContains(response, reverse("dashboard"))
+
+    def test_pending_messages_bypass_page_cache(self):
+        self.client.get(reverse("donation_page"))
+        self.client.cookies[CookieStorage.cookie_name] = "mensagens"
+
+        response = self.client.get(reverse("donation_page"))
+
+        self.assertTemplateUsed(response, "donations/donation_page.html")
+
+    @override_settings(PAGE_CACHE_SECONDS=0)
+    def test_page_cache_can_be_disabled(self):
+        self.client.get(reverse("donation_page"))
+
+        response = Client().get(reverse("donation_page"))
+
+        self.assertTemplateUsed(response, "donations/donation_page.html")
+
+
+def metric(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class MetricsTests(TestCase):
+    def test_middleware_records_latency_and_queries_by_view(self):
+        payment = Payment.objects.create(valor=Decimal("10.00"))
+        requests = metric(
+            "django_http_request_duration_seconds_count",
+            view="payment_status", method="GET", status="200",
+        )
+        queries = metric("django_http_request_db_queries_sum", view="payment_status")
+
+        self.client.get(reverse("payment_status", args=[payment.id]))
+
+        self.assertEqual(
+            metric(
+                "django_http_request_duration_seconds_count",
+                view="payment_status", method="GET", status="200",
+            ),
+            requests + 1,
+        )
+        self.assertEqual(metric("django_http_request_db_queries_sum", view="payment_status"), queries + 1)
+
+    def test_status_transitions_counted_on_commit(self):
+        created = metric("payment_status_transitions_total", from_status="none", to_status="pending")
+        approved = metric(
+            "payment_status_transitions_total", from_status="pending", to_status="approved"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment(valor=Decimal("10.00"), status="pending")
+            save_payment(payment)
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.status = "approved"
+            save_payment(payment)
+            payment.valor = Decimal("20.00")
+            save_payment(payment)
+
+        self.assertEqual(
+            metric("payment_status_transitions_total", from_status="none", to_status="pending"),
+            created + 1,
+        )
+        self.assertEqual(
+            metric("payment_status_transitions_total", from_status="pending", to_status="approved"),
+            approved + 1,
+        )
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=["127.0.0.1/32"])
+    def test_metrics_endpoint_from_allowed_network(self):
+        PixPoolCharge.objects.create(
+            valor=Decimal("10.00"), payment_id="mp-1", expira_em=timezone.now() + timedelta(days=1)
+        )
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        content = response.content.decode()
+        self.assertIn("# TYPE django_http_request_duration_seconds histogram", content)
+        self.assertIn("# TYPE mercadopago_request_duration_seconds histogram", content)
+        self.assertIn('pix_pool_depth{valor="10.00"} 1.0', content)
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=["10.0.0.0/8"])
+    def test_metrics_endpoint_restricted(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse("metrics"), REMOTE_ADDR="10.1.2.3").status_code, 200
+        )
+
+        self.client.force_login(get_user_model().objects.create_user("user", password="senha"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+        self.client.force_login(
+            get_user_model().objects.create_user("staff", password="senha", is_staff=True)
+        )
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=[])
+    def test_metrics_endpoint_staff_only_without_networks(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+        self.client.force_login(
+            get_user_model().objects.create_user("staff", password="senha", is_staff=True)
+        )
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class StructuredLoggingTests(TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = QueueHandler(max_length=50, stream=self.stream)
+        self.handler.addFilter(CorrelationFilter())
+        self.logger = logging.getLogger("donations.tests.logs")
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(self.handler.close)
+
+    def entries(self):
+        self.handler.close()  # Grava o que está na fila
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_redact_masks_sensitive_keys_and_truncates(self):
+        payload = {
+            "id": 1,
+            "payer": {"email": "a@b.com", "identification": {"number": "12345678900"}},
+            "qr_code_base64": "A" * 100,
+            "items": list(range(30)),
+        }
+
+        redacted = redact(payload, max_length=10)
+
+        self.assertEqual(redacted["id"], 1)
+        self.assertEqual(redacted["payer"], {"email": "[redacted]", "identification": "[redacted]"})
+        self.assertEqual(redacted["qr_code_base64"], "AAAAAAAAAA[+90 caracteres]")
+        self.assertEqual(len(redacted["items"]), 21)
+        self.assertEqual(payload["payer"]["email"], "a@b.com")
+
+    def test_json_lines_with_correlation_ids(self):
+        with correlation(request_id="req-1", donation_id=7):
+            bind(mp_payment_id="mp-9")
+            self.logger.info(
+                "Pagamento %s consultado", "mp-9", extra={"payload": {"email": "a@b.com"}}
+            )
+        self.logger.info("Fora da requisição")
+
+        first, second = self.entries()
+        self.assertEqual(first["message"], "Pagamento mp-9 consultado")
+        self.assertEqual(first["level"], "INFO")
+        self.assertEqual(first["request_id"], "req-1")
+        self.assertEqual(first["donation_id"], 7)
+        self.assertEqual(first["mp_payment_id"], "mp-9")
+        self.assertEqual(first["payload"], {"email": "[redacted]"})
+        self.assertNotIn("request_id", second)
+
+    def test_bind_outside_a_scope_is_ignored(self):
+        bind(donation_id=1)
+        self.logger.info("Sem escopo")
+
+        self.assertNotIn("donation_id", self.entries()[0])
+
+    def test_exception_is_kept(self):
+        try:
+            raise ValueError("falhou")
+        except ValueError:
+            self.logger.exception("Erro")
+
+        self.assertIn("ValueError: falhou", self.entries()[0]["exception"])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        self.handler.listener.stop()
+        self.handler.queue_size = 1
+
+        for _ in range(3):
+            self.logger.info("Registro")
+
+        self.assertEqual(self.handler.dropped, 2)
+
+    def test_request_id_header(self):
+        response = self.client.get(reverse("donation_page"))
+        self.assertRegex(response["X-Request-ID"], r"^[0-9a-f]{32}$")
+
+        response = self.client.get(reverse("donation_page"), HTTP_X_REQUEST_ID="proxy-123")
+        self.assertEqual(response["X-Request-ID"], "proxy-123")
+
+        response = self.client.get(reverse("donation_page"), HTTP_X_REQUEST_ID="id inválido")
+        self.assertNotEqual(response["X-Request-ID"], "id inválido")
+
+
+class PaymentIdMigrationTests(TransactionTestCase):
+    """Migração 0009: limpeza dos payment_id antes do índice único."""
+
+    before = [("donations", "0008_drop_stored_qr_png")]
+    after = [("donations", "0009_payment_indexes")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        self.addCleanup(self.migrate_to_latest)
+
+    def migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def create_payments(self, *payment_ids):
+        Payment = self.executor.loader.project_state(self.before).apps.get_model(
+            "donations", "Payment"
+        )
+        Payment.objects.bulk_create(
+            Payment(valor=Decimal("10.00"), payment_id=payment_id) for payment_id in payment_ids
+        )
+
+    def migrate(self):
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.after)
+
+    def test_none_strings_become_null(self):
+        self.create_payments("None", "None", "", "123")
+
+        self.migrate()
+
+        self.assertCountEqual(
+            Payment.objects.values_list("payment_id", flat=True), [None, None, None, "123"]
+        )
+
+    def test_real_duplicates_fail_with_listing(self):
+        self.create_payments("123", "123", "456")
+        first, second = Payment.objects.filter(payment_id="123").order_by("id").values_list(
+            "id", flat=True
+        )
+
+        with self.assertRaisesMessage(
+            RuntimeError, f"payment_id 123: pagamentos #{first}, #{second}"
+        ):
+            self.migrate()
+
+        # Para voltar à última migração
+        Payment.objects.filter(pk=second).update(payment_id="789")
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class QueryBudgetTests(TestCase):
+    """
+    Número de consultas por view: um aumento aqui costuma ser um N+1 ou uma
+    consulta nova no caminho da doação.
+    """
+
+    def setUp(self):
+        self.payment = Payment.objects.create(
+            valor=Decimal("10.00"), payment_id="mp-1", tipo_doacao="brinquedos"
+        )
+        PaymentPixArtifact.from_transaction_data(self.payment, {"qr_code": PIX_CODE}).save()
+        # Totais da hora e do dia atuais já existem, como na maior parte do tempo
+        rebuild_rollups()
+
+    def test_donation_page_get(self):
+        with self.assertNumQueries(0):
+            self.client.get(reverse("donation_page"))
+
+    @mock.patch("donations.views.MercadoPagoService")
+    def test_donation_page_post(self, service):
+        service.return_value.pay_with_pix.return_value = {
+            "id": "mp-2",
+            "point_of_interaction": {"transaction_data": {"qr_code": PIX_CODE}},
+        }
+
+        # Transação com o INSERT do pagamento e os UPDATEs dos totais da hora
+        # e do dia, UPDATE com os dados do Mercado Pago e INSERT dos artefatos PIX
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse("donation_page"), {"valor": "15"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Payment.objects.get(payment_id="mp-2").pix_artifact.qr_code, PIX_CODE)
+
+    def test_waiting_payment(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse("waiting_payment", args=[self.payment.id]))
+
+    def test_dashboard(self):
+        self.client.force_login(get_user_model().objects.create_user("staff", password="senha"))
+        create_payments(30)
+
+        # Sessão, usuário, totais e a página (sem COUNT)
+        with self.assertNumQueries(4):
+            self.client.get(reverse("dashboard"), {"status": "approved"})
+
+    def test_payment_status(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse("payment_status", args=[self.payment.id]))
+
+
+class PaymentIndexTests(TestCase):
+    """
+    Os caminhos de consulta mais frequentes precisam de um índice: sem ele a
+    consulta funciona nos testes, mas vira uma leitura da tabela inteira (e
+    uma ordenação em memória) em produção.
+    """
+
+    def assertUsesIndex(self, queryset, index=None):
+        if connection.vendor == "postgresql":
+            # Em tabelas pequenas o planner prefere a leitura sequencial;
+            # desligada, só a escolhe se não houver índice utilizável
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+            self.assertNotIn("Seq Scan", plan)
+            self.assertNotRegex(plan, r"(?<!Incremental )Sort\b")
+        else:
+            plan = queryset.explain()
+            self.assertNotRegex(plan, r"SCAN donations_payment(?! USING)")
+            self.assertNotIn("TEMP B-TREE", plan)
+
+        if index:
+            self.assertIn(index, plan)
+
+    def test_webhook_lookup_by_payment_id(self):
+        # `update_payment_status` busca o pagamento pelo ID do Mercado Pago
+        self.assertUsesIndex(Payment.objects.filter(payment_id="123"))
+
+    def test_dashboard_status_filter(self):
+        self.assertUsesIndex(
+            Payment.objects.filter(status="approved").order_by("-data")[:20],
+            "payment_status_data_idx",
+        )
+
+    def test_dashboard_ordering(self):
+        self.assertUsesIndex(Payment.objects.order_by("-data")[:20], "payment_data_id_idx")
+
+    def test_dashboard_cursor_page(self):
+        # Consulta de `KeysetPaginator.get_page(older=...)` com filtro de status
+        payment = Payment.objects.create(valor=Decimal("10.00"))
+        data = payment.data
+        self.assertUsesIndex(
+            Payment.objects.filter(status="approved", data__lte=data)
+            .filter(Q(data__lt=data) | Q(id__lt=payment.id))
+            .order_by("-data", "-id")[:21],
+            "payment_status_data_idx",
+        )
+
+    def test_admin_email_search(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("No SQLite, iexact usa LIKE e não o índice em UPPER(email_doador)")
+        self.assertUsesIndex(
+            Payment.objects.filter(email_doador__iexact="ana@example.com"),
+            "payment_email_upper_idx",
+        )
+
+    def test_waiting_payment_artifact(self):
+        self.assertUsesIndex(PaymentPixArtifact.objects.filter(payment_id=1))
+
+    def test_payment_id_is_unique(self):
+        Payment.objects.create(valor=Decimal("10.00"), payment_id="123")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(valor=Decimal("10.00"), payment_id="123")
+
+        # Pagamentos sem ID do Mercado Pago (falha ao gerar o PIX) continuam permitidos
+        Payment.objects.create(valor=Decimal("10.00"))
+        Payment.objects.create(valor=Decimal("10.00"))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PaymentPixArtifactTests(TestCase):
+    def setUp(self):
+        self.payment = Payment.objects.create(valor=Decimal("10.00"))
+
+    def test_round_trip(self):
+        png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+        artifact = PaymentPixArtifact.from_transaction_data(
+            self.payment,
+            {"qr_code": "00020126580014br.gov.bcb.pix", "qr_code_base64": base64.b64encode(png).decode()},
+        )
+        artifact.save()
+
+        artifact = PaymentPixArtifact.objects.get(payment=self.payment)
+        self.assertEqual(artifact.qr_code, "00020126580014br.gov.bcb.pix")
+        # A imagem é gerada do código; o PNG do Mercado Pago não é gravado
+        self.assertIsNone(artifact.qr_code_png)
+        self.assertTrue(artifact.has_qr_image)
+
+    def test_legacy_png(self):
+        png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+        artifact = PaymentPixArtifact(payment=self.payment)
+        artifact.qr_code_base64 = base64.b64encode(png).decode()
+        artifact.save()
+
+        artifact = PaymentPixArtifact.objects.get(payment=self.payment)
+        self.assertEqual(bytes(artifact.qr_code_png), png)
+        self.assertEqual(artifact.qr_code_base64, base64.b64encode(png).decode())
+
+    def test_empty_transaction_data(self):
+        artifact = PaymentPixArtifact.from_transaction_data(self.payment, {})
+
+        self.assertIsNone(artifact.qr_code)
+        self.assertIsNone(artifact.qr_code_base64)
+
+    def test_waiting_payment_renders_artifact(self):
+        PaymentPixArtifact.from_transaction_data(
+            self.payment, {"qr_code": "codigo-pix", "qr_code_base64": "iVBORw0KGgo="}
+        ).save()
+
+        response = self.client.get(reverse("waiting_payment", args=[self.payment.id]))
+
+        artifact = PaymentPixArtifact.objects.get(payment=self.payment)
+        self.assertContains(response, "codigo-pix")
+        self.assertContains(
+            response,
+            f"{reverse('payment_qr_code', args=[self.payment.id, 'png'])}?v={artifact.qr_code_hash}",
+        )
+        self.assertNotContains(response, "data:image/png;base64")
+
+    def test_waiting_payment_without_artifact(self):
+        response = self.client.get(reverse("waiting_payment", args=[self.payment.id]))
+
+        self.assertContains(response, "Aguardando")
+        self.assertNotContains(response, "pixCode\" value")
+
+
+class PaymentQrCodeTests(TestCase):
+    def setUp(self):
+        self.payment = Payment.objects.create(valor=Decimal("10.00"))
+        self.artifact = PaymentPixArtifact(payment=self.payment)
+        self.artifact.qr_code = PIX_CODE
+        self.artifact.save()
+
+    def url(self, fmt="png", payment=None):
+        return reverse("payment_qr_code", args=[(payment or self.payment).id, fmt])
+
+    def test_renders_png_from_code(self):
+        response = self.client.get(self.url(), {"v": self.artifact.qr_code_hash})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response.content, qr.render(PIX_CODE, "png", qr.scale_for(PIX_CODE, 300)))
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_formats_and_size(self):
+        webp = self.client.get(self.url("webp"))
+        svg = self.client.get(self.url("svg"))
+        small = self.client.get(self.url(), {"size": 100})
+        large = self.client.get(self.url(), {"size": 600})
+
+        self.assertEqual(webp.content[8:12], b"WEBP")
+        self.assertTrue(svg.content.startswith(b"<svg"))
+        self.assertNotEqual(small["ETag"], large["ETag"])
+        self.assertLess(len(small.content), len(large.content))
+        self.assertEqual(self.client.get(self.url("gif")).status_code, 404)
+
+    def test_unversioned_url_must_revalidate(self):
+        response = self.client.get(self.url())
+
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url())["ETag"]
+
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_legacy_png(self):
+        png = b"\x89PNG\r\n\x1a\n" + b"\x01" * 32
+        payment = Payment.objects.create(valor=Decimal("10.00"))
+        artifact = PaymentPixArtifact.objects.create(payment=payment, qr_code_png=png)
+
+        response = self.client.get(self.url(payment=payment))
+
+        self.assertEqual(response.content, png)
+        self.assertEqual(response["ETag"], f'"{artifact.qr_code_hash}"')
+        self.assertEqual(self.client.get(self.url("webp", payment)).status_code, 404)
+
+    def test_missing_qr_code(self):
+        other = Payment.objects.create(valor=Decimal("10.00"))
+
+        response = self.client.get(self.url(payment=other))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class QrEncoderTests(TestCase):
+    def test_matrix(self):
+        modules = qr.encode(PIX_CODE)
+
+        # Versão 10 (57 módulos) com correção M para este código
+        self.assertEqual(len(modules), 57)
+        # Padrão localizador no canto superior esquerdo
+        self.assertEqual(modules[0][:7], [True] * 7)
+        self.assertEqual(modules[1][:7], [True, False, False, False, False, False, True])
+        # Matriz de referência (gerada e conferida com um leitor de QR Code)
+        digest = hashlib.sha256(
+            "".join("1" if dark else "0" for row in modules for dark in row).encode()
+        ).hexdigest()
+        self.assertEqual(digest, PIX_CODE_MATRIX_SHA256)
+
+    def test_version_grows_with_data(self):
+        self.assertEqual(len(qr.encode("a" * 10)), 21)  # Versão 1
+        self.assertEqual(len(qr.encode("a" * 2000)), 169)  # Versão 38
+        with self.assertRaises(ValueError):
+            qr.encode("a" * 3000)
+
+    def test_render_formats(self):
+        self.assertTrue(qr.render(PIX_CODE, "png").startswith(b"\x89PNG"))
+        self.assertEqual(qr.render(PIX_CODE, "webp")[8:12], b"WEBP")
+        self.assertIn(b"<path", qr.render(PIX_CODE, "svg"))
+        with self.assertRaises(ValueError):
+            qr.render(PIX_CODE, "gif")
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(QR_CACHE_DIR=directory):
+            content = qr._render(PIX_CODE, "png", 3, 4)
+            path = os.path.join(directory, f"{qr.cache_key(PIX_CODE, 'png', 3)}.png")
+
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(), content)
+            with mock.patch.object(qr, "_to_png_or_webp") as renderer:
+                self.assertEqual(qr._render(PIX_CODE, "png", 3, 4), content)
+            renderer.assert_not_called()
+
+    def test_failed_disk_write_leaves_no_temp_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.object(qr.os, "replace", side_effect=OSError("disco cheio")):
+                qr._write_disk(os.path.join(directory, "qr.png"), b"conteudo")
+
+            self.assertEqual(os.listdir(directory), [])
+
+
+class PaymentStatusJsonTests(TestCase):
+    def setUp(self):
+        self.payment = Payment.objects.create(valor=Decimal("10.00"))
+        self.url = reverse("payment_status", args=[self.payment.id])
+
+    def test_returns_status(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "pending")
+        self.assertIn("atualizado_em", response.json())
+        self.assertTrue(response.has_header("ETag"))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_status_change_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.payment.status = "approved"
+        self.payment.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "approved")
+
+    def test_does_not_touch_session(self):
+        response = self.client.get(self.url)
+
+        self.assertNotIn("sessionid", response.cookies)
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+
+    def test_unknown_payment(self):
+        response = self.client.get(reverse("payment_status", args=[999]))
+
+        self.assertEqual(response.status_code, 404)
+
+
+def create_pool_charge(valor="10.00", minutes=120, payment_id="pool-1"):
+    charge = PixPoolCharge(
+        valor=Decimal(valor),
+        payment_id=payment_id,
+        expira_em=timezone.now() + timedelta(minutes=minutes),
+    )
+    charge.qr_code = f"codigo-{payment_id}"
+    charge.save()
+    return charge
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES,
+    PIX_POOL_ENABLED=True,
+    PIX_POOL_AMOUNTS=["10", "20"],
+    PIX_POOL_MIN_REMAINING=30,
+)
+class PixPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service = mock.patch("donations.views.MercadoPagoService").start()
+        self.service.return_value.pay_with_pix.return_value = {"id": "live-1"}
+        self.addCleanup(mock.patch.stopall)
+
+    def donate(self, valor):
+        return self.client.post(reverse("donation_page"), {"valor": valor})
+
+    def test_preset_value_uses_pool(self):
+        create_pool_charge()
+
+        response = self.donate("10")
+
+        payment = Payment.objects.get()
+        self.assertRedirects(response, reverse("waiting_payment", args=[payment.id]))
+        self.assertEqual(payment.payment_id, "pool-1")
+        self.assertEqual(payment.pix_artifact.qr_code, "codigo-pool-1")
+        self.assertFalse(PixPoolCharge.objects.exists())
+        self.service.return_value.pay_with_pix.assert_not_called()
+        self.assertEqual(pool_stats()["hits"], 1)
+
+    def test_empty_pool_falls_back_to_live_charge(self):
+        self.donate("20")
+
+        self.assertEqual(Payment.objects.get().payment_id, "live-1")
+        self.assertEqual(pool_stats()["misses"], 1)
+
+    def test_charge_close_to_expiring_is_not_used(self):
+        create_pool_charge(minutes=10)
+
+        self.donate("10")
+
+        self.assertEqual(Payment.objects.get().payment_id, "live-1")
+
+    def test_other_values_skip_pool(self):
+        create_pool_charge()
+
+        self.donate("15")
+
+        self.assertEqual(Payment.objects.get().payment_id, "live-1")
+        self.assertEqual(PixPoolCharge.objects.count(), 1)
+        self.assertEqual(pool_stats()["misses"], 0)
+
+    @override_settings(PIX_POOL_ENABLED=False)
+    def test_disabled(self):
+        create_pool_charge()
+
+        self.donate("10")
+
+        self.assertEqual(Payment.objects.get().payment_id, "live-1")
+
+    def test_refill(self):
+        create_pool_charge(valor="10.00", payment_id="old", minutes=5)
+        create_pool_charge(valor="20.00", payment_id="ok")
+        service = mock.patch("donations.pix_pool.MercadoPagoService").start()
+        service.return_value.pay_with_pix.side_effect = [
+            {"id": "a", "date_of_expiration": "2099-01-01T00:00:00.000-03:00"},
+            {"id": "b"},
+            RuntimeError("indisponível"),
+        ]
+
+        result = refill_pool(size=2, concurrency=1)
+
+        self.assertEqual(result, {"created": 2, "expired": 1, "failed": 1})
+        self.assertEqual(pool_stats()["depth"], {Decimal("10.00"): 2, Decimal("20.00"): 1})
+        self.assertEqual(
+            service.return_value.pay_with_pix.call_args.kwargs["expiration_minutes"], 1440
+        )
+
+    def test_refill_keeps_expired_charges_as_discarded(self):
+        create_pool_charge(payment_id="old", minutes=5)
+        create_pool_charge(payment_id="ancient", minutes=-8 * 24 * 60)
+        mock.patch("donations.pix_pool.MercadoPagoService").start()
+
+        self.assertEqual(refill_pool(size=0)["expired"], 2)
+        self.assertEqual(refill_pool(size=0)["expired"], 0)
+
+        # Após DISCARDED_RETENTION, o registro é apagado
+        charge = PixPoolCharge.objects.get()
+        self.assertEqual(charge.payment_id, "old")
+        self.assertTrue(charge.descartada)
+        self.assertIsNone(charge.qr_code)
+        self.assertEqual(pool_payment_ids(["old", "outro"]), {"old"})
+
+    def test_hit_rate_is_counted_without_database_writes(self):
+        create_pool_charge()
+        hits = metric("pix_pool_requests_total", result="hit")
+
+        self.donate("10")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(create_payment_from_pool("10"))
+
+        # Sem cobrança em estoque: só a busca, nenhuma escrita no banco
+        self.assertFalse(
+            [q["sql"] for q in queries.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        )
+
+        stats = pool_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(metric("pix_pool_requests_total", result="hit"), hits + 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class DeferredPixTests(TestCase):
+    """Doações registradas com o circuito do Mercado Pago aberto."""
+
+    def setUp(self):
+        cache.clear()
+        self.service = mock.patch("donations.views.MercadoPagoService").start()
+        self.addCleanup(mock.patch.stopall)
+        self.service.return_value.pay_with_pix.side_effect = CircuitOpenError("aberto")
+
+    def donate(self):
+        response = self.client.post(reverse("donation_page"), {"valor": "15"}, follow=True)
+        return response, Payment.objects.get()
+
+    def test_donation_is_recorded_as_pending_with_pix_deferred(self):
+        response, payment = self.donate()
+
+        self.assertEqual(payment.status, "pending")
+        self.assertIsNone(payment.payment_id)
+        self.assertContains(response, "O PIX será gerado em instantes")
+        self.assertTrue(response.context["pix_deferred"])
+        self.assertIsNotNone(payment.pix_adiado_em)
+
+    def test_pix_generated_when_mercadopago_is_back(self):
+        _, payment = self.donate()
+        self.service.return_value.pay_with_pix.side_effect = None
+        self.service.return_value.pay_with_pix.return_value = {
+            "id": 77,
+            "point_of_interaction": {"transaction_data": {"qr_code": "codigo-pix"}},
+        }
+
+        response = self.client.get(reverse("waiting_payment", args=[payment.id]))
+
+        self.assertFalse(response.context["pix_deferred"])
+        self.assertContains(response, "codigo-pix")
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_id, "77")
+        self.assertIsNone(payment.pix_adiado_em)
+
+        # Gerado uma única vez
+        self.client.get(reverse("waiting_payment", args=[payment.id]))
+        self.assertEqual(self.service.return_value.pay_with_pix.call_count, 3)
+
+    def test_deferral_survives_cache_loss(self):
+        _, payment = self.donate()
+        cache.clear()  # Outro worker ou reinício: a marcação está no banco
+        self.service.return_value.pay_with_pix.side_effect = None
+        self.service.return_value.pay_with_pix.return_value = {
+            "id": 78,
+            "point_of_interaction": {"transaction_data": {"qr_code": "codigo-pix"}},
+        }
+
+        response = self.client.get(reverse("waiting_payment", args=[payment.id]))
+
+        self.assertContains(response, "codigo-pix")
+
+    def test_claim_is_granted_once(self):
+        _, payment = self.donate()
+        other = Payment.objects.get(pk=payment.pk)  # Mesma doação, em outra requisição
+
+        self.assertTrue(claim_deferred_pix(payment))
+        self.assertFalse(claim_deferred_pix(other))
+        self.assertIsNone(payment.pix_adiado_em)
+
+    def test_expired_deferral_is_not_claimed(self):
+        _, payment = self.donate()
+        Payment.objects.filter(pk=payment.pk).update(
+            pix_adiado_em=timezone.now() - DEFERRED_PIX_TIMEOUT - timedelta(minutes=1)
+        )
+
+        self.assertFalse(claim_deferred_pix(payment))
+
+    def test_payments_without_deferred_pix_do_not_call_mercadopago(self):
+        payment = Payment.objects.create(valor=Decimal("10.00"))
+
+        response = self.client.get(reverse("waiting_payment", args=[payment.id]))
+
+        self.assertFalse(response.context["pix_deferred"])
+        self.service.return_value.pay_with_pix.assert_not_called()
+
+    def test_verify_fails_fast_with_circuit_open(self):
+        payment = Payment.objects.create(valor=Decimal("10.00"), payment_id="42")
+        self.service.return_value.get_payment_info.side_effect = CircuitOpenError("aberto")
+
+        response = self.client.post(reverse("waiting_payment", args=[payment.id]), follow=True)
+
+        self.assertContains(response, "Não foi possível consultar o Mercado Pago agora")
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "pending")
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AsyncViewTests(TestCase):
+    def make_request(self, method, path, data=None):
+        request = getattr(AsyncRequestFactory(), method)(path, data=data or {})
+        request._messages = CookieStorage(request)
+        return request
+
+    async def test_donation_creates_pix_payment(self):
+        service = mock.patch("donations.views.AsyncMercadoPagoService").start()
+        self.addCleanup(mock.patch.stopall)
+        service.return_value.pay_with_pix = mock.AsyncMock(
+            return_value={
+                "id": 42,
+                "point_of_interaction": {
+                    "transaction_data": {"qr_code": "codigo-pix", "ticket_url": "https://mp/t"}
+                },
+            }
+        )
+
+        response = await donation_page_async(self.make_request("post", "/", {"valor": "15"}))
+
+        payment = await Payment.objects.aget()
+        self.assertRedirects(
+            response, reverse("waiting_payment", args=[payment.id]), fetch_redirect_response=False
+        )
+        self.assertEqual(payment.payment_id, "42")
+        pix = await PaymentPixArtifact.objects.aget(payment=payment)
+        self.assertEqual(pix.qr_code, "codigo-pix")
+
+    async def test_donation_invalid_value(self):
+        response = await donation_page_async(self.make_request("post", "/", {"valor": "0.5"}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await Payment.objects.aexists())
+
+    async def test_waiting_payment_renders(self):
+        payment = await Payment.objects.acreate(valor=Decimal("10.00"))
+
+        response = await waiting_payment_async(
+            self.make_request("get", f"/aguardando/{payment.id}/"), payment.id
+        )
+
+        self.assertContains(response, "Aguardando")
+
+    async def test_verify_updates_status(self):
+        payment = await Payment.objects.acreate(valor=Decimal("10.00"), payment_id="42")
+        service = mock.patch("donations.views.AsyncMercadoPagoService").start()
+        self.addCleanup(mock.patch.stopall)
+        service.return_value.get_payment_info = mock.AsyncMock(return_value={"status": "approved"})
+
+        await waiting_payment_async(
+            self.make_request("post", f"/aguardando/{payment.id}/"), payment.id
+        )
+
+        await payment.arefresh_from_db()
+        self.assertEqual(payment.status, "approved")
+
+
+@override_settings(SSE_ENABLED=True, SSE_POLL_INTERVAL=0.01)
+class PaymentStatusStreamTests(TransactionTestCase):
+    async def read_events(self, response):
+        chunks = []
+        async for chunk in response.streaming_content:
+            chunks.append(chunk.decode())
+        return "".join(chunks)
+
+    async def test_streams_final_status_and_closes(self):
+        payment = await Payment.objects.acreate(valor=Decimal("10.00"), status="approved")
+
+        response = await self.async_client.get(
+            reverse("payment_status_stream", args=[payment.id])
+        )
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = await self.read_events(response)
+        self.assertIn('event: status\ndata: {"status": "approved"}', body)
+
+    async def test_unknown_payment(self):
+        response = await self.async_client.get(reverse("payment_status_stream", args=[999]))
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(SSE_ENABLED=False)
+    async def test_disabled(self):
+        payment = await Payment.objects.acreate(valor=Decimal("10.00"))
+
+        response = await self.async_client.get(
+            reverse("payment_status_stream", args=[payment.id])
+        )
+
+        self.assertEqual(response.status_code, 404)
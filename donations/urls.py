@@ -1,9 +1,35 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+# Com ASYNC_VIEWS (servidor ASGI) as views que chamam o Mercado Pago são as
+# versões assíncronas, que não bloqueiam o worker durante a chamada
+if settings.ASYNC_VIEWS:
+    donation_view, waiting_view = views.donation_page_async, views.waiting_payment_async
+else:
+    donation_view, waiting_view = views.donation_page, views.waiting_payment
+
 urlpatterns = [
-    path("", views.donation_page, name="donation_page"),
-    path("aguardando/<int:payment_id>/", views.waiting_payment, name="waiting_payment"),
+    path("", donation_view, name="donation_page"),
+    path("aguardando/<int:payment_id>/", waiting_view, name="waiting_payment"),
+    path(
+        "aguardando/<int:payment_id>/qr.<str:fmt>",
+        views.payment_qr_code,
+        name="payment_qr_code",
+    ),
+    path(
+        "aguardando/<int:payment_id>/status.json",
+        views.payment_status,
+        name="payment_status",
+    ),
+    path(
+        "aguardando/<int:payment_id>/eventos/",
+        views.payment_status_stream,
+        name="payment_status_stream",
+    ),
     path("dashboard/", views.dashboard, name="dashboard"),
+    path("dashboard/exportar/", views.export_payments, name="export_payments"),
+    path("dashboard/totais.json", views.donation_rollups, name="donation_rollups"),
+    path("metrics", views.prometheus_metrics, name="metrics"),
 ]
@@ -1,166 +1,521 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import Paginator
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
 
+from services.circuit_breaker import CircuitOpenError, mercadopago_breaker
 from services.mercadopago import MercadoPagoService
+from services.mercadopago_async import AsyncMercadoPagoService
+
+from . import export, metrics, qr
+from .deferred_pix import claim_deferred_pix, defer_pix
+from .events import get_broadcaster
+from .logs import bind
+from .models import Payment, PaymentPixArtifact
+from .page_cache import render_cached
+from .pagination import KeysetPaginator
+from .pix_pool import create_payment_from_pool, pix_request
+from .rollups import GRANULARITIES, rollup_series, save_payment
+from .stats import payment_totals
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_valor(valor):
+    """
+    Valida o valor informado no formulário de doação.
+
+    Returns:
+        tuple: (valor, mensagem de erro) - um dos dois é None
+    """
+    if not valor:
+        return None, "Por favor, informe o valor da doação."
+
+    try:
+        valor = float(valor)
+    except ValueError:
+        return None, "Valor inválido."
+
+    if valor < 1.00:
+        return None, "O valor mínimo é R$ 1,00."
+    return valor, None
+
+
+def _apply_pix_response(payment: Payment, mp_response: dict) -> PaymentPixArtifact:
+    """
+    Copia os dados do Mercado Pago para o pagamento (sem salvar) e retorna os
+    artefatos PIX (QR Code e código copia e cola), também não salvos.
+    """
+    transaction_data = mp_response.get("point_of_interaction", {}).get(
+        "transaction_data", {}
+    )
+    # Sem ID, o campo fica nulo (é único, e "None" colidiria entre pagamentos)
+    mp_id = mp_response.get("id")
+    payment.payment_id = str(mp_id) if mp_id is not None else None
+    payment.payment_url = transaction_data.get("ticket_url")
+    return PaymentPixArtifact.from_transaction_data(payment, transaction_data)
+
+
+def _create_pix(payment: Payment) -> PaymentPixArtifact:
+    """Gera a cobrança PIX no Mercado Pago e grava seus dados no pagamento."""
+    mp_service = MercadoPagoService()
+    mp_response = mp_service.pay_with_pix(**pix_request(payment.valor))
+
+    # QR Code e código copia e cola ficam na tabela de artefatos PIX
+    pix = _apply_pix_response(payment, mp_response)
+    payment.save()
+    pix.save(force_insert=True)
+
+    bind(mp_payment_id=payment.payment_id)
+    logger.info("Cobrança PIX criada")
+    return pix
+
+
+async def _acreate_pix(payment: Payment) -> PaymentPixArtifact:
+    mp_service = AsyncMercadoPagoService()
+    mp_response = await mp_service.pay_with_pix(**pix_request(payment.valor))
+
+    pix = _apply_pix_response(payment, mp_response)
+    await payment.asave()
+    await pix.asave(force_insert=True)
+
+    bind(mp_payment_id=payment.payment_id)
+    logger.info("Cobrança PIX criada")
+    return pix
 
-from .models import Payment
+
+# Exibida quando o PIX fica para depois (circuito do Mercado Pago aberto)
+DEFERRED_PIX_MESSAGE = "Doação registrada! O PIX será gerado em instantes."
+CIRCUIT_OPEN_STATUS_MESSAGE = (
+    "Não foi possível consultar o Mercado Pago agora. "
+    "O status será atualizado automaticamente assim que o pagamento for confirmado."
+)
+
+
+def _apply_verified_status(payment: Payment, mp_status: str):
+    """
+    Aplica (sem salvar) o status consultado no Mercado Pago ao pagamento.
+
+    Returns:
+        tuple: (nível da mensagem, mensagem, se o pagamento foi alterado)
+    """
+    if mp_status == "approved":
+        payment.status = "approved"
+        if not payment.data:
+            payment.data = timezone.now()
+        return messages.SUCCESS, "Pagamento aprovado! Obrigado pela sua doação! 🎉", True
+    if mp_status == "pending":
+        return (
+            messages.INFO,
+            "Pagamento ainda não foi confirmado. Aguarde alguns instantes.",
+            False,
+        )
+    if mp_status == "rejected":
+        payment.status = "rejected"
+        return messages.ERROR, "Pagamento foi recusado.", True
+    if mp_status == "cancelled":
+        payment.status = "cancelled"
+        return messages.WARNING, "Pagamento foi cancelado.", True
+    return messages.WARNING, f"Status do pagamento: {mp_status}", False
+
+
+def _current_status_message(payment: Payment):
+    """
+    Mensagem com o status já gravado, para quando não há o que consultar no
+    Mercado Pago (sem payment_id do MP ou status final).
+
+    Returns:
+        tuple: (nível da mensagem, mensagem)
+    """
+    if payment.status == "pending":
+        return (
+            messages.INFO,
+            "Pagamento ainda não foi confirmado. Aguarde alguns instantes.",
+        )
+    if payment.status == "approved":
+        return messages.SUCCESS, "Pagamento aprovado! Obrigado pela sua doação!"
+    return messages.WARNING, f"Status do pagamento: {payment.get_status_display()}"
+
+
+def _waiting_payment_context(payment: Payment, pix, pix_deferred: bool = False) -> dict:
+    return {
+        "payment": payment,
+        "pix": pix,
+        "pix_deferred": pix_deferred,
+        # Nova tentativa de gerar o PIX quando o circuito liberar chamadas
+        "pix_retry_seconds": max(mercadopago_breaker.retry_after(), 5) if pix_deferred else 0,
+        "status_stream_enabled": settings.SSE_ENABLED,
+    }
 
 
 def donation_page(request):
     """Página de doação onde o usuário escolhe o valor e tipo de doação"""
     if request.method == "POST":
-        valor = request.POST.get("valor")
+        valor, error = _parse_valor(request.POST.get("valor"))
         nome_doador = request.POST.get("nome_doador")
 
         # Tipo de doação agora é sempre brinquedos
         tipo_doacao = "brinquedos"
 
         # Validações
-        if not valor:
-            messages.error(request, "Por favor, informe o valor da doação.")
+        if error:
+            messages.error(request, error)
             return render(request, "donations/donation_page.html")
 
-        try:
-            valor = float(valor)
-            if valor < 1.00:
-                messages.error(request, "O valor mínimo é R$ 1,00.")
-                return render(request, "donations/donation_page.html")
-        except ValueError:
-            messages.error(request, "Valor inválido.")
-            return render(request, "donations/donation_page.html")
+        # Valores sugeridos usam uma cobrança PIX pré-criada, se houver estoque
+        payment = create_payment_from_pool(
+            valor,
+            tipo_doacao=tipo_doacao,
+            nome_doador=nome_doador if nome_doador else None,
+        )
+        if payment:
+            bind(donation_id=payment.id, mp_payment_id=payment.payment_id)
+            logger.info("Doação registrada com cobrança PIX do estoque")
+            messages.success(request, "Pagamento PIX gerado com sucesso!")
+            return redirect("waiting_payment", payment_id=payment.id)
 
         # Criar pagamento no banco de dados
-        payment = Payment.objects.create(
+        payment = Payment(
             valor=valor,
             tipo_doacao=tipo_doacao,
             nome_doador=nome_doador if nome_doador else None,
             status="pending",
         )
+        save_payment(payment)
+        bind(donation_id=payment.id)
+        logger.info("Doação registrada", extra={"valor": valor})
 
         # Criar pagamento PIX no Mercado Pago
         try:
-            # Preparar descrição do pagamento
-            descricao = "Doação ToyLink - Brinquedos"
-
-            # Criar pagamento PIX
-            mp_service = MercadoPagoService()
-            mp_response = mp_service.pay_with_pix(
-                amount=float(valor),
-                payer_email="doacao@example.com",
-                payer_cpf="00000000000",
-                description=descricao,
-            )
+            _create_pix(payment)
+            messages.success(request, "Pagamento PIX gerado com sucesso!")
 
-            # Atualizar payment com dados do Mercado Pago
-            payment.payment_id = str(mp_response.get("id"))
-            payment.payment_url = (
-                mp_response.get("point_of_interaction", {})
-                .get("transaction_data", {})
-                .get("ticket_url")
-            )
-            payment.qr_code = (
-                mp_response.get("point_of_interaction", {})
-                .get("transaction_data", {})
-                .get("qr_code")
-            )
-            payment.qr_code_base64 = (
-                mp_response.get("point_of_interaction", {})
-                .get("transaction_data", {})
-                .get("qr_code_base64")
+        except CircuitOpenError:
+            # Mercado Pago fora do ar: em vez de esperar, a doação fica
+            # registrada e o PIX é gerado na página de aguardando pagamento
+            defer_pix(payment)
+            logger.warning("PIX adiado: circuito do Mercado Pago aberto")
+            messages.info(request, DEFERRED_PIX_MESSAGE)
+
+        except Exception as e:
+            # Se falhar ao criar no Mercado Pago, manter pagamento local
+            logger.warning("Erro ao gerar PIX", exc_info=True)
+            messages.warning(
+                request, f"Doação registrada, mas houve um erro ao gerar PIX: {str(e)}"
             )
-            payment.save()
 
+        return redirect("waiting_payment", payment_id=payment.id)
+
+    return render_cached(request, "donations/donation_page.html")
+
+
+async def donation_page_async(request):
+    """
+    Versão assíncrona de `donation_page` (ativada com ASYNC_VIEWS, via ASGI).
+
+    A chamada ao Mercado Pago não bloqueia um worker: o processo continua
+    atendendo outras requisições enquanto aguarda a resposta.
+    """
+    if request.method == "POST":
+        valor, error = _parse_valor(request.POST.get("valor"))
+        nome_doador = request.POST.get("nome_doador")
+
+        if error:
+            messages.error(request, error)
+            return await sync_to_async(render)(request, "donations/donation_page.html")
+
+        payment = await sync_to_async(create_payment_from_pool)(
+            valor,
+            tipo_doacao="brinquedos",
+            nome_doador=nome_doador if nome_doador else None,
+        )
+        if payment:
+            bind(donation_id=payment.id, mp_payment_id=payment.payment_id)
+            logger.info("Doação registrada com cobrança PIX do estoque")
             messages.success(request, "Pagamento PIX gerado com sucesso!")
+            return redirect("waiting_payment", payment_id=payment.id)
+
+        payment = Payment(
+            valor=valor,
+            tipo_doacao="brinquedos",
+            nome_doador=nome_doador if nome_doador else None,
+            status="pending",
+        )
+        await sync_to_async(save_payment)(payment)
+        bind(donation_id=payment.id)
+        logger.info("Doação registrada", extra={"valor": valor})
+
+        try:
+            await _acreate_pix(payment)
+            messages.success(request, "Pagamento PIX gerado com sucesso!")
+
+        except CircuitOpenError:
+            await sync_to_async(defer_pix)(payment)
+            logger.warning("PIX adiado: circuito do Mercado Pago aberto")
+            messages.info(request, DEFERRED_PIX_MESSAGE)
 
         except Exception as e:
-            # Se falhar ao criar no Mercado Pago, manter pagamento local
+            logger.warning("Erro ao gerar PIX", exc_info=True)
             messages.warning(
                 request, f"Doação registrada, mas houve um erro ao gerar PIX: {str(e)}"
             )
 
         return redirect("waiting_payment", payment_id=payment.id)
 
-    return render(request, "donations/donation_page.html")
+    # O template acessa a sessão (usuário, mensagens), que é síncrona
+    return await sync_to_async(render_cached)(request, "donations/donation_page.html")
 
 
 def waiting_payment(request, payment_id):
     """Página de aguardando pagamento com QR code e opção de verificar status"""
     payment = get_object_or_404(Payment, id=payment_id)
+    bind(donation_id=payment.id, mp_payment_id=payment.payment_id)
 
     if request.method == "POST":
-        # Verificar status no Mercado Pago
-        if payment.payment_id:
+        # Verificar status no Mercado Pago (apenas enquanto pendente: status
+        # finais já foram gravados pelo webhook e não mudam mais)
+        if payment.payment_id and payment.status == "pending":
             try:
                 mp_service = MercadoPagoService()
                 payment_info = mp_service.get_payment_info(payment.payment_id)
 
                 # Atualizar status do pagamento
-                mp_status = payment_info.get("status")
-
-                if mp_status == "approved":
-                    payment.status = "approved"
-                    if not payment.data:
-                        from datetime import datetime
-
-                        payment.data = datetime.now()
-                    payment.save()
-                    messages.success(
-                        request, "Pagamento aprovado! Obrigado pela sua doação! 🎉"
-                    )
-                elif mp_status == "pending":
-                    messages.info(
-                        request,
-                        "Pagamento ainda não foi confirmado. Aguarde alguns instantes.",
-                    )
-                elif mp_status == "rejected":
-                    payment.status = "rejected"
-                    payment.save()
-                    messages.error(request, "Pagamento foi recusado.")
-                elif mp_status == "cancelled":
-                    payment.status = "cancelled"
-                    payment.save()
-                    messages.warning(request, "Pagamento foi cancelado.")
-                else:
-                    messages.warning(request, f"Status do pagamento: {mp_status}")
+                level, message, changed = _apply_verified_status(
+                    payment, payment_info.get("status")
+                )
+                if changed:
+                    save_payment(payment)
+                messages.add_message(request, level, message)
 
+            except CircuitOpenError:
+                messages.info(request, CIRCUIT_OPEN_STATUS_MESSAGE)
             except Exception as e:
                 messages.error(request, f"Erro ao verificar status: {str(e)}")
         else:
-            # Fallback para quando não tem payment_id do MP
-            if payment.status == "pending":
-                messages.info(
-                    request,
-                    "Pagamento ainda não foi confirmado. Aguarde alguns instantes.",
-                )
-            elif payment.status == "approved":
-                messages.success(
-                    request, "Pagamento aprovado! Obrigado pela sua doação!"
-                )
-            else:
-                messages.warning(
-                    request, f"Status do pagamento: {payment.get_status_display()}"
-                )
+            # Fallback para quando não tem payment_id do MP ou o status já é final
+            messages.add_message(request, *_current_status_message(payment))
 
         # Redirecionar para evitar reenvio de formulário ao recarregar
         return redirect("waiting_payment", payment_id=payment.id)
 
-    context = {
-        "payment": payment,
-    }
+    # Única view que carrega os artefatos PIX (código copia e cola; a imagem
+    # do QR Code é servida por `payment_qr_code`)
+    pix = PaymentPixArtifact.objects.filter(payment=payment).defer("qr_code_png").first()
+
+    # PIX adiado na doação (circuito aberto): gerado agora, se o Mercado
+    # Pago voltou; senão a página avisa e tenta de novo mais tarde
+    pix_deferred = False
+    if pix is None and payment.status == "pending" and claim_deferred_pix(payment):
+        try:
+            pix = _create_pix(payment)
+        except Exception:
+            defer_pix(payment)
+            pix_deferred = True
+
+    context = _waiting_payment_context(payment, pix, pix_deferred)
     return render(request, "donations/waiting_payment.html", context)
 
 
+async def waiting_payment_async(request, payment_id):
+    """Versão assíncrona de `waiting_payment` (ativada com ASYNC_VIEWS, via ASGI)"""
+    payment = await aget_object_or_404(Payment, id=payment_id)
+    bind(donation_id=payment.id, mp_payment_id=payment.payment_id)
+
+    if request.method == "POST":
+        if payment.payment_id and payment.status == "pending":
+            try:
+                mp_service = AsyncMercadoPagoService()
+                payment_info = await mp_service.get_payment_info(payment.payment_id)
+
+                level, message, changed = _apply_verified_status(
+                    payment, payment_info.get("status")
+                )
+                if changed:
+                    await sync_to_async(save_payment)(payment)
+                messages.add_message(request, level, message)
+
+            except CircuitOpenError:
+                messages.info(request, CIRCUIT_OPEN_STATUS_MESSAGE)
+            except Exception as e:
+                messages.error(request, f"Erro ao verificar status: {str(e)}")
+        else:
+            messages.add_message(request, *_current_status_message(payment))
+
+        return redirect("waiting_payment", payment_id=payment.id)
+
+    pix = await PaymentPixArtifact.objects.filter(payment=payment).defer("qr_code_png").afirst()
+
+    pix_deferred = False
+    if (
+        pix is None
+        and payment.status == "pending"
+        and await sync_to_async(claim_deferred_pix)(payment)
+    ):
+        try:
+            pix = await _acreate_pix(payment)
+        except Exception:
+            await sync_to_async(defer_pix)(payment)
+            pix_deferred = True
+
+    context = await sync_to_async(_waiting_payment_context)(payment, pix, pix_deferred)
+    return await sync_to_async(render)(request, "donations/waiting_payment.html", context)
+
+
+@require_GET
+def payment_status(request, payment_id):
+    """
+    Status do pagamento em JSON, para o polling da página de aguardando.
+
+    Lê apenas `status` e `atualizado_em` (uma consulta, sem template nem
+    sessão) e responde 304 quando o `If-None-Match` ainda corresponde.
+    """
+    row = (
+        Payment.objects.filter(id=payment_id)
+        .values_list("status", "atualizado_em")
+        .first()
+    )
+    if row is None:
+        raise Http404("Pagamento não encontrado.")
+
+    status, atualizado_em = row
+    etag = f'"{status}-{int(atualizado_em.timestamp() * 1000)}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(
+            {"status": status, "atualizado_em": atualizado_em.isoformat()}
+        )
+    response["ETag"] = etag
+    # O navegador sempre revalida, mas pode reaproveitar o corpo com 304
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _qr_size(request) -> int:
+    try:
+        size = int(request.GET.get("size", settings.QR_DEFAULT_SIZE))
+    except ValueError:
+        size = settings.QR_DEFAULT_SIZE
+    return min(max(size, 64), 1024)
+
+
+@require_GET
+def payment_qr_code(request, payment_id, fmt="png"):
+    """
+    Imagem do QR Code PIX do pagamento (PNG, WebP ou SVG; `?size=` em pixels).
+
+    A imagem é gerada a partir do código copia e cola (`donations.qr`, com
+    cache em memória e em disco). A página referencia a imagem com
+    `?v=<versão>`: com a versão atual a resposta é `immutable` e o navegador
+    a baixa uma única vez; sem ela o navegador sempre revalida pelo ETag.
+    """
+    if fmt not in qr.FORMATS:
+        raise Http404("Formato não suportado.")
+
+    pix = (
+        PaymentPixArtifact.objects.filter(payment_id=payment_id)
+        .defer("qr_code_png")
+        .first()
+    )
+    if pix is None or not pix.has_qr_image:
+        raise Http404("QR Code não encontrado.")
+
+    text = pix.qr_code
+    if text:
+        scale = qr.scale_for(text, _qr_size(request))
+        etag = f'"{qr.cache_key(text, fmt, scale)}"'
+    elif fmt == "png":
+        # Registros antigos: PNG gravado do Mercado Pago
+        etag = f'"{pix.qr_code_hash}"'
+    else:
+        raise Http404("Formato não disponível para este QR Code.")
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content = qr.render(text, fmt, scale) if text else bytes(pix.qr_code_png)
+        response = HttpResponse(content, content_type=qr.FORMATS[fmt])
+    response["ETag"] = etag
+
+    if request.GET.get("v") == pix.qr_code_hash:
+        patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+async def payment_status_stream(request, payment_id):
+    """
+    Stream (Server-Sent Events) com o status do pagamento.
+
+    Envia um evento `status` com o status atual e a cada mudança, encerrando
+    quando o pagamento deixa de estar pendente. Deve ser servido via ASGI
+    (app.asgi): sob WSGI cada conexão aberta ocuparia um worker.
+    """
+    if not settings.SSE_ENABLED:
+        raise Http404("Stream de status desativado.")
+
+    if not await Payment.objects.filter(id=payment_id).aexists():
+        raise Http404("Pagamento não encontrado.")
+
+    async def events():
+        broadcaster = get_broadcaster()
+        queue = broadcaster.subscribe(payment_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SSE_MAX_DURATION
+
+        try:
+            # Intervalo de reconexão do EventSource (ms)
+            yield "retry: 3000\n\n"
+
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    status = await asyncio.wait_for(
+                        queue.get(), timeout=min(settings.SSE_HEARTBEAT, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    # Comentário SSE para manter a conexão viva em proxies
+                    yield ": ping\n\n"
+                    continue
+
+                yield f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+                if status != "pending":
+                    break
+        finally:
+            broadcaster.unsubscribe(payment_id, queue)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Desativa o buffer do nginx
+    return response
+
+
 @login_required
 def dashboard(request):
     """Dashboard administrativo para visualizar doações"""
     payments = Payment.objects.all().order_by("-data")
 
-    # Estatísticas
-    total_arrecadado = sum(p.valor for p in payments if p.status == "approved")
-    total_pendente = sum(p.valor for p in payments if p.status == "pending")
-    total_doacoes = payments.filter(status="approved").count()
+    # Estatísticas (uma única consulta agregada no banco)
+    totals = payment_totals()
 
     # Filtros
     status_filter = request.GET.get("status")
@@ -168,17 +523,129 @@ def dashboard(request):
     if status_filter:
         payments = payments.filter(status=status_filter)
 
-    # Paginação
-    paginator = Paginator(payments, 20)  # 20 doações por página
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # Paginação: por cursor (sem COUNT nem OFFSET) ou por número de página
+    if settings.DASHBOARD_CURSOR_PAGINATION:
+        paginator = KeysetPaginator(payments, 20)  # 20 doações por página
+        page_obj = paginator.get_page(
+            older=request.GET.get("older"), newer=request.GET.get("newer")
+        )
+    else:
+        paginator = Paginator(payments, 20)  # 20 doações por página
+        page_number = request.GET.get("page")
+        page_obj = paginator.get_page(page_number)
 
     context = {
         "page_obj": page_obj,
         "payments": page_obj,  # Mantém compatibilidade com o template
-        "total_arrecadado": total_arrecadado,
-        "total_pendente": total_pendente,
-        "total_doacoes": total_doacoes,
+        "total_arrecadado": totals["total_arrecadado"],
+        "total_pendente": totals["total_pendente"],
+        "total_doacoes": totals["total_doacoes"],
         "status_filter": status_filter,
+        "cursor_pagination": settings.DASHBOARD_CURSOR_PAGINATION,
     }
     return render(request, "donations/dashboard.html", context)
+
+
+@staff_member_required
+@require_GET
+def export_payments(request):
+    """
+    Exporta as doações em CSV ou JSON Lines (opcionalmente em gzip).
+
+    Parâmetros: format (csv, jsonl), status, start e end (AAAA-MM-DD) e
+    gzip=1. As linhas são lidas do banco e enviadas em blocos, sem carregar
+    a exportação inteira na memória (via ASGI, com um iterador assíncrono).
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest(f"Formato inválido: {fmt}.")
+
+    filters, error = export.parse_filters(
+        request.GET.get("status"), request.GET.get("start"), request.GET.get("end")
+    )
+    if error:
+        return HttpResponseBadRequest(error)
+
+    compress = request.GET.get("gzip") in ("1", "true")
+    iter_export = export.aiter_export if isinstance(request, ASGIRequest) else export.iter_export
+    response = StreamingHttpResponse(
+        iter_export(export.export_queryset(**filters), fmt, compress),
+        content_type="application/gzip" if compress else f"{export.FORMATS[fmt]}; charset=utf-8",
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export.export_filename(fmt, compress)}"'
+    )
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+# Período padrão e máximo (em dias) da série de totais, por granularidade
+ROLLUP_DEFAULT_DAYS = {"hour": 2, "day": 30}
+ROLLUP_MAX_DAYS = {"hour": 93, "day": 3660}
+
+
+@staff_member_required
+@require_GET
+def donation_rollups(request):
+    """
+    Série de totais de doações por hora ou dia, para gráficos.
+
+    Parâmetros: granularity (hour, day), start e end (AAAA-MM-DD,
+    inclusivos), status e tipo_doacao. Lê apenas os totais por período
+    (DonationRollup), nunca os pagamentos.
+    """
+    granularity = request.GET.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return HttpResponseBadRequest(f"Granularidade inválida: {granularity}.")
+
+    filters, error = export.parse_filters(
+        request.GET.get("status"), request.GET.get("start"), request.GET.get("end")
+    )
+    if error:
+        return HttpResponseBadRequest(error)
+
+    end = filters["end"] or timezone.localdate()
+    start = filters["start"] or end - timedelta(days=ROLLUP_DEFAULT_DAYS[granularity] - 1)
+    if (end - start).days >= ROLLUP_MAX_DAYS[granularity]:
+        return HttpResponseBadRequest(
+            f"Período máximo para {granularity}: {ROLLUP_MAX_DAYS[granularity]} dias."
+        )
+
+    series = rollup_series(
+        granularity,
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        status=filters["status"],
+        tipo_doacao=request.GET.get("tipo_doacao"),
+    )
+
+    response = JsonResponse(
+        {
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "buckets": [
+                {
+                    "inicio": timezone.localtime(row["inicio"]).isoformat(),
+                    "status": row["status"],
+                    "quantidade": row["quantidade"],
+                    "total": f"{row['total']:.2f}",
+                }
+                for row in series
+            ],
+        }
+    )
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Métricas no formato de texto do Prometheus, somadas entre os workers do
+    gunicorn. Restrito à equipe e a METRICS_ALLOWED_NETWORKS.
+    """
+    if not metrics.is_allowed(request):
+        raise PermissionDenied
+    content, content_type = metrics.render_metrics()
+    return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,142 @@
+"""
+Configuração do gunicorn.
+
+Carregado automaticamente pelo gunicorn a partir do diretório de trabalho.
+Os valores podem ser ajustados por variáveis de ambiente (GUNICORN_*); as
+opções passadas na linha de comando têm precedência.
+"""
+
+import os
+import shutil
+import tempfile
+
+# `config` é o nome de uma opção do gunicorn
+from decouple import config as env
+
+
+def _cpu_count() -> int:
+    """
+    CPUs disponíveis para o processo, respeitando a cota do container
+    (cgroup v2), que `os.cpu_count()` ignora.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            count = min(count, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+bind = env("GUNICORN_BIND", default="0.0.0.0:8000")
+
+# Workers com threads (gthread): enquanto uma thread espera o Mercado Pago,
+# as outras atendem requisições. Cada thread usa sua própria conexão com o
+# banco, então DB_POOL_MAX_SIZE deve ser pelo menos `threads`
+worker_class = env("GUNICORN_WORKER_CLASS", default="gthread")
+workers = env(
+    "GUNICORN_WORKERS", default=env("WEB_CONCURRENCY", default=_cpu_count() * 2 + 1), cast=int
+)
+threads = env("GUNICORN_THREADS", default=4, cast=int)
+
+# Carrega a aplicação no processo principal antes do fork: os workers sobem
+# prontos e compartilham a memória do código (copy-on-write)
+preload_app = env("GUNICORN_PRELOAD", default=True, cast=bool)
+
+# Recicla cada worker após um número de requisições (com variação, para que
+# não reiniciem todos ao mesmo tempo), limitando vazamentos de memória
+max_requests = env("GUNICORN_MAX_REQUESTS", default=1000, cast=int)
+max_requests_jitter = env("GUNICORN_MAX_REQUESTS_JITTER", default=100, cast=int)
+
+timeout = env("GUNICORN_TIMEOUT", default=30, cast=int)
+graceful_timeout = env("GUNICORN_GRACEFUL_TIMEOUT", default=30, cast=int)
+keepalive = env("GUNICORN_KEEPALIVE", default=5, cast=int)
+
+# Heartbeat dos workers em memória (em containers, /tmp pode ser um overlay lento)
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Métricas do Prometheus somadas entre os workers: cada processo grava seus
+# valores neste diretório (definido antes de a aplicação ser carregada)
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(worker_tmp_dir or tempfile.gettempdir(), "projeto-social-metrics"),
+)
+
+
+def _load_templates():
+    from django.template.loader import get_template
+
+    for name in (
+        "donations/donation_page.html",
+        "donations/waiting_payment.html",
+        "donations/dashboard.html",
+    ):
+        get_template(name)
+
+
+def on_starting(server):
+    """Descarta as métricas de execuções anteriores do servidor."""
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    """
+    Com `preload_app`, compila os templates no processo principal: o cache
+    do loader é herdado (e compartilhado) pelos workers.
+    """
+    if server.cfg.preload_app:
+        _load_templates()
+
+
+def pre_fork(server, worker):
+    """
+    Fecha as conexões com o banco do processo principal antes do fork, para
+    que nenhum worker herde (e compartilhe) um socket aberto.
+    """
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def child_exit(server, worker):
+    """Remove as métricas "ao vivo" do worker encerrado (as somadas permanecem)."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    """
+    Aquece o worker depois que a aplicação está carregada (com ou sem
+    `preload_app`) e antes da primeira requisição:
+
+    - abre uma conexão com o banco, validando-o (com DB_POOL_ENABLED, a
+      conexão volta ao pool do processo e fica pronta para as threads);
+    - compila os templates das páginas (já em cache com `preload_app`);
+    - com MP_PRECONNECT, pré-conecta o pool HTTP do Mercado Pago.
+    """
+    from django.conf import settings
+    from django.db import connection
+
+    try:
+        connection.ensure_connection()
+    except Exception as e:
+        worker.log.warning("Falha ao conectar ao banco no aquecimento: %s", e)
+    finally:
+        connection.close()
+
+    _load_templates()
+
+    if settings.MP_PRECONNECT:
+        from services.mercadopago import warm_up_connection_pool
+
+        warm_up_connection_pool()
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import WebhookJob
+
+
+@admin.register(WebhookJob)
+class WebhookJobAdmin(admin.ModelAdmin):
+    list_display = ["id", "mp_payment_id", "status", "attempts", "coalesced", "next_attempt_at", "created_at"]
+    list_filter = ["status"]
+    search_fields = ["mp_payment_id"]
+    readonly_fields = ["created_at", "updated_at", "locked_at"]
+    list_per_page = 20
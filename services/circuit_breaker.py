@@ -0,0 +1,183 @@
+"""
+Circuit breaker das chamadas ao Mercado Pago.
+
+Fechado, as chamadas passam e os resultados são contados em janelas de
+MP_BREAKER_WINDOW segundos. Contam como falha os erros de conexão, timeouts,
+respostas 5xx ou 429 e as chamadas mais lentas que
+MP_BREAKER_SLOW_CALL_SECONDS (erros 4xx são problemas da requisição, não
+indisponibilidade). Com pelo menos MP_BREAKER_MIN_CALLS chamadas na janela e
+uma taxa de falhas de MP_BREAKER_FAILURE_RATE, o circuito abre: durante
+MP_BREAKER_OPEN_SECONDS as chamadas falham na hora com CircuitOpenError, sem
+ocupar o worker esperando o Mercado Pago. Passado esse tempo (meio aberto),
+uma única chamada de teste é liberada: se der certo o circuito fecha, senão
+abre de novo.
+
+O estado fica no cache "shared", compartilhado pelos workers: o Redis de
+CACHE_URL ou, sem ele, uma tabela no banco. Só com CACHE_URL=locmem:// cada
+processo tem o seu.
+"""
+
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from donations.metrics import circuit_breaker_rejections, circuit_breaker_transitions
+
+logger = logging.getLogger(__name__)
+
+cache = ConnectionProxy(caches, "shared")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Chamada recusada sem contatar o Mercado Pago, com o circuito aberto."""
+
+
+def is_failure(exc: Exception) -> bool:
+    """Se o erro indica indisponibilidade do Mercado Pago."""
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status is None or status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.opened_key = f"circuit-breaker:{name}:opened-at"
+        self.probe_key = f"circuit-breaker:{name}:probe"
+
+    def _window_keys(self) -> tuple[str, str]:
+        window = int(time.time() // settings.MP_BREAKER_WINDOW)
+        prefix = f"circuit-breaker:{self.name}:{window}"
+        return f"{prefix}:calls", f"{prefix}:failures"
+
+    def _incr(self, key: str) -> int:
+        timeout = settings.MP_BREAKER_WINDOW * 2
+        cache.add(key, 0, timeout=timeout)
+        try:
+            return cache.incr(key)
+        except ValueError:  # Expirou entre o add e o incr
+            cache.set(key, 1, timeout=timeout)
+            return 1
+
+    def _probe_timeout(self) -> float:
+        """Tempo máximo de uma chamada (com novas tentativas), para liberar o teste."""
+        attempts = settings.MP_MAX_RETRIES + 1
+        backoff = settings.MP_RETRY_BACKOFF * (2 ** settings.MP_MAX_RETRIES - 1)
+        return (settings.MP_CONNECT_TIMEOUT + settings.MP_READ_TIMEOUT) * attempts + backoff
+
+    def _transition(self, from_state: str, to_state: str, detail: str = ""):
+        circuit_breaker_transitions.labels(self.name, from_state, to_state).inc()
+        log = logger.warning if to_state == OPEN else logger.info
+        log("Circuit breaker %s: %s -> %s %s", self.name, from_state, to_state, detail)
+
+    def state(self) -> str:
+        opened_at = cache.get(self.opened_key)
+        if opened_at is None:
+            return CLOSED
+        if time.time() - opened_at < settings.MP_BREAKER_OPEN_SECONDS:
+            return OPEN
+        return HALF_OPEN
+
+    def retry_after(self) -> int:
+        """Segundos até o circuito liberar uma chamada de teste (0 se fechado)."""
+        opened_at = cache.get(self.opened_key)
+        if opened_at is None:
+            return 0
+        return max(0, round(opened_at + settings.MP_BREAKER_OPEN_SECONDS - time.time()))
+
+    def before_call(self) -> bool:
+        """
+        Libera ou recusa uma chamada.
+
+        Returns:
+            bool: se a chamada é o teste do circuito meio aberto
+
+        Raises:
+            CircuitOpenError: se o circuito está aberto ou outro teste está em andamento
+        """
+        if not settings.MP_BREAKER_ENABLED:
+            return False
+
+        state = self.state()
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and cache.add(self.probe_key, True, timeout=self._probe_timeout()):
+            self._transition(OPEN, HALF_OPEN)
+            return True
+
+        circuit_breaker_rejections.labels(self.name).inc()
+        raise CircuitOpenError(
+            "Mercado Pago temporariamente indisponível; nova tentativa em "
+            f"{max(self.retry_after(), 1)}s."
+        )
+
+    def record(self, probe: bool, failed: bool):
+        """Registra o resultado de uma chamada liberada por `before_call`."""
+        if not settings.MP_BREAKER_ENABLED:
+            return
+
+        if probe:
+            cache.delete(self.probe_key)
+            if failed:
+                cache.set(self.opened_key, time.time(), timeout=None)
+                self._transition(HALF_OPEN, OPEN, "(falha na chamada de teste)")
+            else:
+                cache.delete_many([self.opened_key, *self._window_keys()])
+                self._transition(HALF_OPEN, CLOSED)
+            return
+
+        calls_key, failures_key = self._window_keys()
+        calls = self._incr(calls_key)
+        if not failed:
+            return
+
+        failures = self._incr(failures_key)
+        if (
+            calls >= settings.MP_BREAKER_MIN_CALLS
+            and failures / calls >= settings.MP_BREAKER_FAILURE_RATE
+            and cache.add(self.opened_key, time.time(), timeout=None)
+        ):
+            self._transition(CLOSED, OPEN, f"({failures} falhas em {calls} chamadas)")
+
+    def reset(self):
+        """Fecha o circuito e descarta as contagens da janela atual."""
+        cache.delete_many([self.opened_key, self.probe_key, *self._window_keys()])
+
+    def _is_slow(self, started: float) -> bool:
+        return time.monotonic() - started > settings.MP_BREAKER_SLOW_CALL_SECONDS
+
+    @contextmanager
+    def guard(self):
+        """Protege uma chamada: recusa com o circuito aberto e registra o resultado."""
+        probe = self.before_call()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.record(probe, is_failure(e) or self._is_slow(started))
+            raise
+        self.record(probe, self._is_slow(started))
+
+    @asynccontextmanager
+    async def aguard(self):
+        """Versão assíncrona de `guard` (o acesso ao cache roda em uma thread)."""
+        probe = await sync_to_async(self.before_call, thread_sensitive=False)()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            failed = is_failure(e) or self._is_slow(started)
+            await sync_to_async(self.record, thread_sensitive=False)(probe, failed)
+            raise
+        await sync_to_async(self.record, thread_sensitive=False)(probe, self._is_slow(started))
+
+
+mercadopago_breaker = CircuitBreaker("mercadopago")
@@ -0,0 +1,101 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from donations.metrics import start_exporter
+from services.webhooks import claim_jobs, process_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Processa a fila de notificações (webhooks) do Mercado Pago"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.WEBHOOK_BATCH_SIZE,
+            help=f"Notificações reivindicadas por lote (padrão: {settings.WEBHOOK_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.WEBHOOK_CONCURRENCY,
+            help=f"Consultas simultâneas ao Mercado Pago (padrão: {settings.WEBHOOK_CONCURRENCY})",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Espera em segundos quando a fila está vazia (padrão: 1)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Processa os lotes disponíveis e encerra",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=settings.WEBHOOK_METRICS_PORT,
+            help="Porta das métricas do Prometheus deste worker (padrão: "
+            f"{settings.WEBHOOK_METRICS_PORT}; 0 desativa)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        concurrency = options["concurrency"]
+
+        self.stdout.write("🔄 Processando fila de webhooks do Mercado Pago...")
+
+        # As mudanças de status e as consultas ao Mercado Pago deste processo
+        # não passam pelo /metrics do gunicorn
+        exporter = None
+        if options["metrics_port"]:
+            exporter, _ = start_exporter(options["metrics_port"])
+            self.stdout.write(f"📈 Métricas em http://0.0.0.0:{options['metrics_port']}/metrics")
+
+        try:
+            while True:
+                # Como a cada requisição: descarta conexões com o banco
+                # encerradas ou além de CONN_MAX_AGE antes de usá-las
+                close_old_connections()
+                try:
+                    jobs = claim_jobs(batch_size)
+                    stats = process_jobs(jobs, concurrency) if jobs else None
+                except Exception:
+                    # Banco fora do ar ou conexão derrubada: tenta de novo. Os
+                    # jobs já reivindicados voltam à fila após WEBHOOK_LOCK_TIMEOUT
+                    if options["once"]:
+                        raise
+                    logger.exception("Erro ao processar a fila de webhooks")
+                    self.stderr.write("⚠️ Erro ao processar a fila; tentando novamente")
+                    time.sleep(options["sleep"])
+                    continue
+
+                if not jobs:
+                    if options["once"]:
+                        break
+                    time.sleep(options["sleep"])
+                    continue
+
+                self.stdout.write(
+                    f"📦 Lote de {len(jobs)} notificações: "
+                    f"{stats['done']} processadas, "
+                    f"{stats['retried']} reagendadas, "
+                    f"{stats['dead']} descartadas, "
+                    f"{stats['coalesced']} duplicadas agrupadas, "
+                    f"{stats['pool']} do estoque PIX"
+                )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if exporter is not None:
+                exporter.shutdown()
+                exporter.server_close()
+
+        self.stdout.write(self.style.SUCCESS("✅ Worker de webhooks encerrado"))
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.reconciliation import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Confere os pagamentos pendentes com o Mercado Pago e atualiza os status"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=5,
+            help="Ignora pagamentos criados há menos de N minutos (padrão: 5)",
+        )
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=7,
+            help="Ignora pagamentos criados há mais de N dias (padrão: 7)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Pagamentos por lote (padrão: 200)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Consultas individuais simultâneas ao Mercado Pago (padrão: 4)",
+        )
+        parser.add_argument(
+            "--no-search",
+            action="store_true",
+            help="Não usa a pesquisa em bloco; consulta cada pagamento individualmente",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Mostra o que seria atualizado sem gravar no banco",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--batch-size e --concurrency devem ser maiores que zero.")
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("⚠️  Dry-run: nenhuma alteração será gravada"))
+
+        self.stdout.write("🔄 Conferindo pagamentos pendentes com o Mercado Pago...")
+
+        def report(stats):
+            self.stdout.write(
+                f"📦 {stats['checked']} conferidos, {stats['updated']} atualizados "
+                f"({stats['checked'] / max(stats['elapsed'], 1e-6):.1f} pagamentos/s)"
+            )
+
+        stats = reconcile_pending_payments(
+            min_age=timedelta(minutes=options["min_age"]),
+            max_age=timedelta(days=options["max_age"]),
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            dry_run=options["dry_run"],
+            use_search=not options["no_search"],
+            on_batch=report,
+        )
+
+        throughput = stats["checked"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Conciliação concluída: {stats['checked']} conferidos, "
+                f"{stats['updated']} atualizados, {stats['not_found']} não encontrados "
+                f"({stats['searched']} via pesquisa, {stats['fetched']} via consulta "
+                f"individual) em {stats['elapsed']:.2f}s - {throughput:.1f} pagamentos/s"
+            )
+        )
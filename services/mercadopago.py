@@ -1,3 +1,7 @@
+import logging
+import os
+import threading
+import time
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict
@@ -6,6 +10,133 @@ from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import requests
 from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from donations.logs import payment_log_fields
+from donations.metrics import observe_mercadopago_request
+
+from .circuit_breaker import CircuitOpenError, mercadopago_breaker
+from .payment_cache import PaymentInfoCache
+
+# Status HTTP considerados transitórios (elegíveis para nova tentativa)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+logger = logging.getLogger(__name__)
+
+_http_sessions = {}
+_http_sessions_pid = None
+_http_session_lock = threading.Lock()
+
+_payment_info_cache = None
+_payment_info_cache_lock = threading.Lock()
+
+
+def _build_http_session(method: str) -> requests.Session:
+    """
+    Cria a sessão HTTP com pool de conexões keep-alive e política de retry.
+
+    Na sessão dos GETs (seguros), o adapter repete falhas de conexão, timeouts
+    de leitura e status transitórios. A dos POSTs não repete nada: as novas
+    tentativas ficam em `MercadoPagoService._post`, reenviando a mesma
+    `X-Idempotency-Key`. Assim cada chamada faz no máximo MP_MAX_RETRIES + 1
+    tentativas (o que o circuit breaker assume em `_probe_timeout`).
+    """
+    if method == "POST":
+        retry = Retry(total=0, read=False, raise_on_status=False)
+    else:
+        retry = Retry(
+            total=settings.MP_MAX_RETRIES,
+            connect=settings.MP_MAX_RETRIES,
+            read=settings.MP_MAX_RETRIES,
+            status=settings.MP_MAX_RETRIES,
+            backoff_factor=settings.MP_RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.MP_HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session(method: str = "GET") -> requests.Session:
+    """
+    Retorna a sessão HTTP do processo para o método (GET ou POST).
+
+    As sessões são recriadas quando o PID muda, para que processos filhos
+    (workers do gunicorn) nunca compartilhem sockets abertos pelo processo pai.
+    """
+    global _http_sessions, _http_sessions_pid
+
+    kind = "POST" if method == "POST" else "GET"
+    pid = os.getpid()
+    session = _http_sessions.get(kind) if _http_sessions_pid == pid else None
+    if session is None:
+        with _http_session_lock:
+            if _http_sessions_pid != pid:
+                _http_sessions, _http_sessions_pid = {}, pid
+            if kind not in _http_sessions:
+                _http_sessions[kind] = _build_http_session(kind)
+            session = _http_sessions[kind]
+    return session
+
+
+def get_http_timeout() -> tuple[float, float]:
+    """Timeouts (conexão, leitura) usados nas requisições ao Mercado Pago."""
+    return (settings.MP_CONNECT_TIMEOUT, settings.MP_READ_TIMEOUT)
+
+
+def get_payment_info_cache() -> PaymentInfoCache:
+    """
+    Retorna o cache de `get_payment_info` do processo, apoiado no cache
+    padrão do Django quando este é compartilhado (CACHE_URL com Redis).
+    """
+    global _payment_info_cache
+
+    if _payment_info_cache is None:
+        with _payment_info_cache_lock:
+            if _payment_info_cache is None:
+                _payment_info_cache = PaymentInfoCache(
+                    max_size=settings.MP_CACHE_MAX_SIZE,
+                    pending_ttl=settings.MP_CACHE_PENDING_TTL,
+                    terminal_ttl=settings.MP_CACHE_TERMINAL_TTL,
+                    # Sem Redis o cache padrão também é por processo e só
+                    # duplicaria a memória
+                    shared=caches["default"]
+                    if settings.CACHE_URL.startswith(("redis://", "rediss://"))
+                    and settings.MP_CACHE_MAX_SIZE > 0
+                    else None,
+                )
+    return _payment_info_cache
+
+
+def warm_up_connection_pool() -> bool:
+    """
+    Abre antecipadamente as conexões (TCP + TLS) com a API do Mercado Pago,
+    uma por sessão (GET e POST).
+
+    Usado no boot dos workers do gunicorn para que a primeira doação após um
+    deploy não pague o custo do handshake. Falhas são ignoradas.
+    """
+    try:
+        for method in ("GET", "POST"):
+            response = get_http_session(method).head(
+                settings.MP_BASE_API_URL.strip().rstrip("/"), timeout=get_http_timeout()
+            )
+            response.close()
+        return True
+    except requests.exceptions.RequestException:
+        return False
 
 
 class MercadoPagoService:
@@ -120,9 +251,32 @@ class MercadoPagoService:
         payer_email: str,
         payer_cpf: str,
         description: str = "Pagamento",
+        expiration_minutes: int = 30,
     ):
         """
-        Cria um pagamento via Pix.
+        Cria um pagamento via Pix, que expira em `expiration_minutes` minutos.
+        """
+        payload = self._build_pix_payload(
+            amount, payer_email, payer_cpf, description, expiration_minutes
+        )
+
+        try:
+            return self._create_payment(payload)
+        except Exception as e:
+            if isinstance(e, (ValueError, RuntimeError)):
+                raise
+            raise RuntimeError(f"Erro inesperado ao criar pagamento PIX: {str(e)}")
+
+    def _build_pix_payload(
+        self,
+        amount: float,
+        payer_email: str,
+        payer_cpf: str,
+        description: str = "Pagamento",
+        expiration_minutes: int = 30,
+    ) -> dict:
+        """
+        Valida os dados e monta o payload de um pagamento via Pix.
         """
         # Validações de entrada
         if not amount or amount <= 0:
@@ -137,27 +291,23 @@ class MercadoPagoService:
         if not description or description.strip() == "":
             raise ValueError("Descrição do pagamento não pode estar vazia.")
 
-        try:
-            payload = {
-                "payment_method_id": "pix",
-                "transaction_amount": float(amount),
-                "description": description.strip(),
-                "date_of_expiration": self.generate_payment_expiration_date(minutes=30),
-                "payer": {
-                    "email": payer_email.strip(),
-                    "identification": {
-                        "type": "CPF",
-                        "number": payer_cpf.replace(".", "").replace("-", ""),
-                    },
+        return {
+            "payment_method_id": "pix",
+            "transaction_amount": float(amount),
+            "description": description.strip(),
+            "date_of_expiration": self.generate_payment_expiration_date(
+                minutes=expiration_minutes
+            ),
+            "payer": {
+                "email": payer_email.strip(),
+                "identification": {
+                    "type": "CPF",
+                    "number": payer_cpf.replace(".", "").replace("-", ""),
                 },
-                "external_reference": f"ID-PIX-{uuid.uuid4()}",
-                "notification_url": self._notification_url,
-            }
-            return self._create_payment(payload)
-        except Exception as e:
-            if isinstance(e, (ValueError, RuntimeError)):
-                raise
-            raise RuntimeError(f"Erro inesperado ao criar pagamento PIX: {str(e)}")
+            },
+            "external_reference": f"ID-PIX-{uuid.uuid4()}",
+            "notification_url": self._notification_url,
+        }
 
     def pay_with_boleto(
         self,
@@ -325,17 +475,30 @@ class MercadoPagoService:
                 f"Erro inesperado ao criar pagamento com cartão: {str(e)}"
             )
 
-    def get_payment_info(self, transaction_id: str):
+    def get_payment_info(self, transaction_id: str, refresh: bool = False):
         """
         Obtém informações detalhadas sobre um pagamento específico.
+
+        As respostas passam pelo cache do processo (`get_payment_info_cache`):
+        chamadas simultâneas para o mesmo ID compartilham uma única requisição.
+        Com `refresh=True` o cache é ignorado e a resposta nova é gravada nele
+        (usado pelo processamento de webhooks; com CACHE_URL, a gravação chega
+        aos workers web pelo cache compartilhado).
         """
         if not transaction_id or transaction_id.strip() == "":
             raise ValueError("ID da transação não pode estar vazio.")
 
-        try:
-            data = self._get(f"/v1/payments/{transaction_id.strip()}")
-            print(f"Dados do pagamento: {data}")
+        transaction_id = transaction_id.strip()
+
+        def fetch():
+            data = self._get(f"/v1/payments/{transaction_id}")
+            logger.info("Pagamento consultado no Mercado Pago", extra=payment_log_fields(data))
             return data
+
+        try:
+            return get_payment_info_cache().get_or_fetch(
+                transaction_id, fetch, refresh=refresh
+            )
         except Exception as e:
             if isinstance(e, (ValueError, RuntimeError)):
                 raise
@@ -343,11 +506,39 @@ class MercadoPagoService:
                 f"Erro inesperado ao buscar informações do pagamento: {str(e)}"
             )
 
+    def search_payments(self, **filters) -> dict:
+        """
+        Pesquisa pagamentos (GET /v1/payments/search).
+
+        Os filtros são repassados como query string, por exemplo:
+        `range="date_created", begin_date=..., end_date=..., limit=100, offset=0`.
+        Retorna o corpo da resposta: {"paging": {...}, "results": [...]}.
+        """
+        try:
+            return self._get("/v1/payments/search", params=filters)
+        except Exception as e:
+            if isinstance(e, (ValueError, RuntimeError)):
+                raise
+            raise RuntimeError(f"Erro inesperado ao pesquisar pagamentos: {str(e)}")
+
     def create_preference_with_card(self, items: list[dict], order_id: str = None) -> dict:
         """
         Cria uma preferência de pagamento com cartão de crédito ou débito.
         Valida se cada item contém as chaves obrigatórias antes de enviar.
         """
+        payload = self._build_preference_payload(items, order_id)
+
+        try:
+            return self._post("/checkout/preferences", payload)
+        except Exception as e:
+            if isinstance(e, (ValueError, RuntimeError)):
+                raise
+            raise RuntimeError(f"Erro inesperado ao criar preferência: {str(e)}")
+
+    def _build_preference_payload(self, items: list[dict], order_id: str = None) -> dict:
+        """
+        Valida os itens e monta o payload de uma preferência de pagamento.
+        """
         if not items or not isinstance(items, list):
             raise ValueError("A lista de itens não pode estar vazia e deve ser uma lista.")
 
@@ -362,28 +553,23 @@ class MercadoPagoService:
 
         # Usar a URL base da aplicação ao invés da URL de notificação
         base_url = settings.BASE_APPLICATION_URL.rstrip('/')
-        
-        try:
-            payload = {
-                "items": items,
-                "back_urls": {
-                    "success": f"{base_url}/checkout/pagamento-realizado/{order_id or '1'}/",
-                    "failure": f"{base_url}/checkout/erro-pagamento/{order_id or '1'}/",
-                    "pending": f"{base_url}/checkout/aguardando-pagamento/{order_id or '1'}/",
-                },
-                "auto_return": "approved",
-                "notification_url": self._notification_url,
-            }
-            
-            # Adiciona external_reference se order_id for fornecido
-            if order_id:
-                payload["external_reference"] = str(order_id)
-                
-            return self._post("/checkout/preferences", payload)
-        except Exception as e:
-            if isinstance(e, (ValueError, RuntimeError)):
-                raise
-            raise RuntimeError(f"Erro inesperado ao criar preferência: {str(e)}")
+
+        payload = {
+            "items": items,
+            "back_urls": {
+                "success": f"{base_url}/checkout/pagamento-realizado/{order_id or '1'}/",
+                "failure": f"{base_url}/checkout/erro-pagamento/{order_id or '1'}/",
+                "pending": f"{base_url}/checkout/aguardando-pagamento/{order_id or '1'}/",
+            },
+            "auto_return": "approved",
+            "notification_url": self._notification_url,
+        }
+
+        # Adiciona external_reference se order_id for fornecido
+        if order_id:
+            payload["external_reference"] = str(order_id)
+
+        return payload
 
 
     # --- Métodos Internos Auxiliares ---
@@ -420,6 +606,10 @@ class MercadoPagoService:
     def _post(self, path: str, payload: dict, use_idempotency_key: bool = True):
         """
         Executa uma requisição POST para a API do Mercado Pago.
+
+        Com `use_idempotency_key`, falhas transitórias são repetidas com backoff
+        exponencial reenviando a mesma `X-Idempotency-Key`, o que evita criar
+        pagamentos duplicados.
         """
         url = f"{self._base_url}{path}"
         headers = self._headers.copy()
@@ -427,12 +617,38 @@ class MercadoPagoService:
         if use_idempotency_key:
             headers["X-Idempotency-Key"] = str(uuid.uuid4())
 
+        max_attempts = settings.MP_MAX_RETRIES + 1 if use_idempotency_key else 1
+
         try:
-            response = requests.post(
-                url=url, headers=headers, json=payload, timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+            with (
+                mercadopago_breaker.guard(),
+                observe_mercadopago_request("POST", path) as observation,
+            ):
+                for attempt in range(1, max_attempts + 1):
+                    try:
+                        response = get_http_session("POST").post(
+                            url=url, headers=headers, json=payload, timeout=get_http_timeout()
+                        )
+                    except (
+                        requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout,
+                    ):
+                        if attempt == max_attempts:
+                            raise
+                    else:
+                        if (
+                            response.status_code not in RETRY_STATUS_CODES
+                            or attempt == max_attempts
+                        ):
+                            break
+
+                    time.sleep(settings.MP_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+                observation.status = response.status_code
+                response.raise_for_status()
+                return response.json()
+        except CircuitOpenError:
+            raise
         except requests.exceptions.HTTPError as e:
             error_message = self._handle_api_error(e.response)
             raise RuntimeError(error_message)
@@ -441,16 +657,25 @@ class MercadoPagoService:
         except Exception as e:
             raise RuntimeError(f"Erro inesperado na requisição POST: {str(e)}")
 
-    def _get(self, path: str):
+    def _get(self, path: str, params: dict | None = None):
         """
         Executa uma requisição GET para a API do Mercado Pago.
         """
         url = f"{self._base_url}{path}"
 
         try:
-            response = requests.get(url, headers=self._headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
+            with (
+                mercadopago_breaker.guard(),
+                observe_mercadopago_request("GET", path) as observation,
+            ):
+                response = get_http_session().get(
+                    url, headers=self._headers, params=params, timeout=get_http_timeout()
+                )
+                observation.status = response.status_code
+                response.raise_for_status()
+                return response.json()
+        except CircuitOpenError:
+            raise
         except requests.exceptions.HTTPError as e:
             try:
                 error = e.response.json()
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import os
+import uuid
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from donations.logs import payment_log_fields
+from donations.metrics import observe_mercadopago_request
+
+from .circuit_breaker import CircuitOpenError, mercadopago_breaker
+from .mercadopago import RETRY_STATUS_CODES, MercadoPagoService, get_payment_info_cache
+
+logger = logging.getLogger(__name__)
+
+# Um cliente por (processo, event loop), fechado quando o loop termina
+_async_clients = {}
+
+
+def _build_async_client() -> httpx.AsyncClient:
+    """
+    Cria o cliente HTTP assíncrono com pool de conexões keep-alive.
+
+    O transporte não repete nada: todas as novas tentativas (falhas de
+    conexão, timeouts e status transitórios) ficam em
+    `AsyncMercadoPagoService._request`, então cada chamada faz no máximo
+    MP_MAX_RETRIES + 1 tentativas.
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.MP_READ_TIMEOUT, connect=settings.MP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.MP_ASYNC_POOL_SIZE,
+            max_keepalive_connections=settings.MP_ASYNC_POOL_SIZE,
+        ),
+    )
+
+
+async def _client_lifetime(key, client: httpx.AsyncClient):
+    """
+    Mantém o cliente do loop aberto até o loop ser encerrado: ao terminar, o
+    `asyncio.run` (usado pelo servidor ASGI e pelo `async_to_sync`) finaliza
+    os geradores assíncronos pendentes, o que fecha o cliente e suas conexões.
+    """
+    try:
+        yield
+    finally:
+        _async_clients.pop(key, None)
+        await client.aclose()
+
+
+async def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente HTTP assíncrono do event loop atual.
+
+    As conexões de um `AsyncClient` pertencem ao event loop em que foram
+    abertas, então há um cliente por processo e loop. Sob ASGI o loop (e o
+    cliente) dura o processo todo; fora dele, cada `async_to_sync` cria um
+    loop, e o cliente é fechado ao fim dele.
+    """
+    key = (os.getpid(), asyncio.get_running_loop())
+    entry = _async_clients.get(key)
+    if entry is None:
+        client = _build_async_client()
+        lifetime = _client_lifetime(key, client)
+        entry = _async_clients[key] = (client, lifetime)
+        # A primeira iteração registra o gerador no loop (que guarda só uma
+        # referência fraca, por isso o gerador também fica no dicionário)
+        await lifetime.asend(None)
+    return entry[0]
+
+
+class AsyncMercadoPagoService(MercadoPagoService):
+    """
+    Versão assíncrona do `MercadoPagoService`, para as views servidas via ASGI.
+
+    Valida e monta os payloads da mesma forma que o serviço síncrono, mas
+    envia as requisições com `httpx.AsyncClient`: uma chamada lenta ao
+    Mercado Pago não ocupa um worker, apenas uma corrotina.
+    """
+
+    async def pay_with_pix(
+        self,
+        amount: float,
+        payer_email: str,
+        payer_cpf: str,
+        description: str = "Pagamento",
+        expiration_minutes: int = 30,
+    ):
+        """
+        Cria um pagamento via Pix, que expira em `expiration_minutes` minutos.
+        """
+        payload = self._build_pix_payload(
+            amount, payer_email, payer_cpf, description, expiration_minutes
+        )
+
+        try:
+            return await self._create_payment(payload)
+        except Exception as e:
+            if isinstance(e, (ValueError, RuntimeError)):
+                raise
+            raise RuntimeError(f"Erro inesperado ao criar pagamento PIX: {str(e)}")
+
+    async def pay_with_boleto(self, *args, **kwargs):
+        """
+        Cria um pagamento via Boleto Bancário (executa o serviço síncrono em
+        uma thread; não é usado pelas views).
+        """
+        return await sync_to_async(MercadoPagoService().pay_with_boleto, thread_sensitive=False)(
+            *args, **kwargs
+        )
+
+    async def pay_with_card(self, *args, **kwargs):
+        """
+        Cria um pagamento via Cartão de Crédito (executa o serviço síncrono em
+        uma thread; não é usado pelas views).
+        """
+        return await sync_to_async(MercadoPagoService().pay_with_card, thread_sensitive=False)(
+            *args, **kwargs
+        )
+
+    async def get_payment_info(self, transaction_id: str, refresh: bool = False):
+        """
+        Obtém informações detalhadas sobre um pagamento específico.
+
+        Usa o mesmo cache do serviço síncrono; corrotinas simultâneas para o
+        mesmo ID compartilham uma única requisição.
+        """
+        if not transaction_id or transaction_id.strip() == "":
+            raise ValueError("ID da transação não pode estar vazio.")
+
+        transaction_id = transaction_id.strip()
+
+        async def fetch():
+            data = await self._get(f"/v1/payments/{transaction_id}")
+            logger.info("Pagamento consultado no Mercado Pago", extra=payment_log_fields(data))
+            return data
+
+        try:
+            return await get_payment_info_cache().aget_or_fetch(
+                transaction_id, fetch, refresh=refresh
+            )
+        except Exception as e:
+            if isinstance(e, (ValueError, RuntimeError)):
+                raise
+            raise RuntimeError(
+                f"Erro inesperado ao buscar informações do pagamento: {str(e)}"
+            )
+
+    async def search_payments(self, **filters) -> dict:
+        """
+        Pesquisa pagamentos (GET /v1/payments/search).
+        """
+        try:
+            return await self._get("/v1/payments/search", params=filters)
+        except Exception as e:
+            if isinstance(e, (ValueError, RuntimeError)):
+                raise
+            raise RuntimeError(f"Erro inesperado ao pesquisar pagamentos: {str(e)}")
+
+    async def create_preference_with_card(self, items: list[dict], order_id: str = None) -> dict:
+        """
+        Cria uma preferência de pagamento com cartão de crédito ou débito.
+        """
+        payload = self._build_preference_payload(items, order_id)
+
+        try:
+            return await self._post("/checkout/preferences", payload)
+        except Exception as e:
+            if isinstance(e, (ValueError, RuntimeError)):
+                raise
+            raise RuntimeError(f"Erro inesperado ao criar preferência: {str(e)}")
+
+    # --- Métodos Internos Auxiliares ---
+
+    async def _request(self, method: str, url: str, retry: bool, **kwargs) -> httpx.Response:
+        """
+        Executa a requisição, repetindo (quando `retry`) timeouts, falhas de
+        conexão e status transitórios com backoff exponencial.
+        """
+        max_attempts = settings.MP_MAX_RETRIES + 1 if retry else 1
+        client = await get_async_http_client()
+
+        for attempt in range(1, max_attempts + 1):
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == max_attempts:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == max_attempts:
+                    return response
+
+            await asyncio.sleep(settings.MP_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+    async def _post(self, path: str, payload: dict, use_idempotency_key: bool = True):
+        """
+        Executa uma requisição POST para a API do Mercado Pago.
+
+        Com `use_idempotency_key`, as novas tentativas reenviam a mesma
+        `X-Idempotency-Key`, o que evita criar pagamentos duplicados.
+        """
+        url = f"{self._base_url}{path}"
+        headers = self._headers.copy()
+
+        if use_idempotency_key:
+            headers["X-Idempotency-Key"] = str(uuid.uuid4())
+
+        try:
+            async with mercadopago_breaker.aguard():
+                with observe_mercadopago_request("POST", path) as observation:
+                    response = await self._request(
+                        "POST", url, retry=use_idempotency_key, headers=headers, json=payload
+                    )
+                    observation.status = response.status_code
+                    response.raise_for_status()
+                    return response.json()
+        except CircuitOpenError:
+            raise
+        except httpx.HTTPStatusError as e:
+            raise RuntimeError(self._handle_api_error(e.response))
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Erro de conexão com a API do Mercado Pago: {str(e)}")
+        except Exception as e:
+            raise RuntimeError(f"Erro inesperado na requisição POST: {str(e)}")
+
+    async def _get(self, path: str, params: dict | None = None):
+        """
+        Executa uma requisição GET para a API do Mercado Pago.
+        """
+        url = f"{self._base_url}{path}"
+
+        try:
+            async with mercadopago_breaker.aguard():
+                with observe_mercadopago_request("GET", path) as observation:
+                    response = await self._request(
+                        "GET", url, retry=True, headers=self._headers, params=params
+                    )
+                    observation.status = response.status_code
+                    response.raise_for_status()
+                    return response.json()
+        except CircuitOpenError:
+            raise
+        except httpx.HTTPStatusError as e:
+            try:
+                error = e.response.json()
+            except ValueError:
+                error = e.response.text
+
+            raise RuntimeError(f"Erro ao acessar {url}: {error}")
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Erro de conexão com a API do Mercado Pago: {str(e)}")
+        except Exception as e:
+            raise RuntimeError(f"Erro inesperado na requisição GET: {str(e)}")
+
+    async def _create_payment(self, payload: dict):
+        """
+        Cria um novo pagamento, adicionando a URL de notificação se configurada.
+        """
+        try:
+            if self._notification_url:
+                payload["notification_url"] = self._notification_url
+
+            payment_response = await self._post("/v1/payments", payload)
+
+            if not payment_response:
+                raise RuntimeError("Resposta vazia ao criar pagamento.")
+
+            return payment_response
+        except RuntimeError:
+            # Re-propaga erros já tratados
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Erro inesperado ao criar pagamento: {str(e)}")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mp_payment_id', models.CharField(max_length=255, verbose_name='ID do Pagamento (Mercado Pago)')),
+                ('payload', models.JSONField(default=dict, verbose_name='Notificação recebida')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('processing', 'Processando'), ('done', 'Concluído'), ('dead', 'Falhou (descartado)')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Em processamento desde')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Recebido em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Notificação do Mercado Pago',
+                'verbose_name_plural': 'Notificações do Mercado Pago',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='webhookjob_status_next_idx')],
+            },
+        ),
+    ]
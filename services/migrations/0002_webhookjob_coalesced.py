@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookjob',
+            name='coalesced',
+            field=models.PositiveIntegerField(default=0, verbose_name='Notificações duplicadas agrupadas'),
+        ),
+        migrations.AlterField(
+            model_name='webhookjob',
+            name='mp_payment_id',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='ID do Pagamento (Mercado Pago)'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import models
+from django.utils import timezone
+
+
+class WebhookJob(models.Model):
+    """
+    Notificação do Mercado Pago aguardando processamento.
+
+    O webhook apenas grava a notificação e responde imediatamente; o comando
+    `process_webhooks` consulta o Mercado Pago e atualiza o pagamento.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pendente"),
+        ("processing", "Processando"),
+        ("done", "Concluído"),
+        ("dead", "Falhou (descartado)"),
+    ]
+
+    mp_payment_id = models.CharField(
+        max_length=255, db_index=True, verbose_name="ID do Pagamento (Mercado Pago)"
+    )
+    payload = models.JSONField(default=dict, verbose_name="Notificação recebida")
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="Status"
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    coalesced = models.PositiveIntegerField(
+        default=0, verbose_name="Notificações duplicadas agrupadas"
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Próxima tentativa"
+    )
+    locked_at = models.DateTimeField(
+        blank=True, null=True, verbose_name="Em processamento desde"
+    )
+    last_error = models.TextField(blank=True, default="", verbose_name="Último erro")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Recebido em")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    class Meta:
+        verbose_name = "Notificação do Mercado Pago"
+        verbose_name_plural = "Notificações do Mercado Pago"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="webhookjob_status_next_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Notificação #{self.id} - pagamento {self.mp_payment_id} ({self.status})"
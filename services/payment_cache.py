@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from donations.metrics import mercadopago_cache_requests
+
+logger = logging.getLogger(__name__)
+
+# Status do Mercado Pago que não mudam mais (ou mudam raramente)
+TERMINAL_STATUSES = {"approved", "rejected", "cancelled", "refunded", "charged_back"}
+
+
+class _InFlight:
+    """Consulta em andamento, compartilhada pelos chamadores do mesmo ID."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PaymentInfoCache:
+    """
+    Cache em memória (por processo) das respostas de `get_payment_info`.
+
+    - TTL curto para status não finais e longo para status finais;
+    - LRU com tamanho máximo (`max_size`);
+    - single-flight: chamadores simultâneos do mesmo ID aguardam uma única
+      requisição HTTP em vez de dispararem várias;
+    - métricas de acertos, falhas, chamadas agrupadas e remoções.
+
+    Com `shared` (um cache do Django compartilhado, como o Redis), cada
+    resposta gravada também vai para ele, e uma falta na memória é buscada
+    lá antes de consultar o Mercado Pago. É assim que a resposta obtida pelo
+    worker de webhooks (outro processo) chega aos workers web.
+    """
+
+    def __init__(
+        self, max_size: int, pending_ttl: float, terminal_ttl: float, shared=None
+    ):
+        self.max_size = max_size
+        self.pending_ttl = pending_ttl
+        self.terminal_ttl = terminal_ttl
+        self.shared = shared
+
+        self._entries = OrderedDict()  # id -> (expira_em, dados)
+        self._inflight = {}  # (id, refresh) -> _InFlight
+        self._async_inflight = {}  # (event loop, id, refresh) -> asyncio.Future
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _ttl_for(self, data: dict) -> float:
+        if (data or {}).get("status") in TERMINAL_STATUSES:
+            return self.terminal_ttl
+        return self.pending_ttl
+
+    def get(self, key: str):
+        """Retorna os dados em cache (ou None se ausentes/expirados)."""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return data
+
+    def _shared_key(self, key: str) -> str:
+        return f"mp-payment-info:{key}"
+
+    def _shared_get(self, key: str):
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(self._shared_key(key))
+        except Exception:
+            logger.warning("Falha ao ler o cache compartilhado de pagamentos", exc_info=True)
+            return None
+
+    def _shared_set(self, key: str, data: dict):
+        if self.shared is None:
+            return
+        ttl = self._ttl_for(data)
+        try:
+            if ttl > 0:
+                self.shared.set(self._shared_key(key), data, timeout=ttl)
+            else:
+                self.shared.delete(self._shared_key(key))
+        except Exception:
+            logger.warning("Falha ao gravar o cache compartilhado de pagamentos", exc_info=True)
+
+    async def _ashared_get(self, key: str):
+        if self.shared is None:
+            return None
+        try:
+            return await self.shared.aget(self._shared_key(key))
+        except Exception:
+            logger.warning("Falha ao ler o cache compartilhado de pagamentos", exc_info=True)
+            return None
+
+    async def _ashared_set(self, key: str, data: dict):
+        if self.shared is None:
+            return
+        ttl = self._ttl_for(data)
+        try:
+            if ttl > 0:
+                await self.shared.aset(self._shared_key(key), data, timeout=ttl)
+            else:
+                await self.shared.adelete(self._shared_key(key))
+        except Exception:
+            logger.warning("Falha ao gravar o cache compartilhado de pagamentos", exc_info=True)
+
+    def _count_lookup(self, shared_hit: bool):
+        """Contabiliza a consulta do chamador que não achou o ID na memória."""
+        with self._lock:
+            if shared_hit:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+        mercadopago_cache_requests.labels("shared_hit" if shared_hit else "miss").inc()
+
+    def set(self, key: str, data: dict):
+        """Grava (write-through) os dados mais recentes de um pagamento."""
+        self._set_local(key, data)
+        self._shared_set(key, data)
+
+    def _set_local(self, key: str, data: dict):
+        ttl = self._ttl_for(data)
+        with self._lock:
+            if ttl <= 0:
+                self._entries.pop(key, None)
+                return
+
+            self._entries[key] = (time.monotonic() + ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            try:
+                self.shared.delete(self._shared_key(key))
+            except Exception:
+                logger.warning("Falha ao gravar o cache compartilhado de pagamentos", exc_info=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_fetch(self, key: str, fetch, refresh: bool = False):
+        """
+        Retorna os dados do cache ou executa `fetch()` uma única vez por ID,
+        mesmo com várias threads pedindo o mesmo pagamento ao mesmo tempo.
+
+        Com `refresh=True` o valor em cache é ignorado, mas o resultado da
+        consulta é gravado no cache. Chamadas com e sem `refresh` não se
+        agrupam: a sem `refresh` pode responder com o cache compartilhado.
+        """
+        flight_key = (key, refresh)
+
+        with self._lock:
+            if not refresh:
+                data = self._get_locked(key)
+                if data is not None:
+                    self.hits += 1
+                    mercadopago_cache_requests.labels("hit").inc()
+                    return data
+
+            call = self._inflight.get(flight_key)
+            leader = call is None
+            if leader:
+                call = self._inflight[flight_key] = _InFlight()
+            else:
+                self.coalesced += 1
+                mercadopago_cache_requests.labels("coalesced").inc()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            data = None if refresh else self._shared_get(key)
+            self._count_lookup(shared_hit=data is not None)
+            if data is not None:
+                self._set_local(key, data)
+            else:
+                data = fetch()
+                self.set(key, data)
+            call.result = data
+            return data
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+            call.event.set()
+
+    async def aget_or_fetch(self, key: str, fetch, refresh: bool = False):
+        """
+        Versão assíncrona de `get_or_fetch`: `fetch` é uma corrotina e as
+        corrotinas do mesmo event loop que pedem o mesmo ID aguardam uma única
+        consulta, sem bloquear o loop.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key, refresh)
+
+        with self._lock:
+            if not refresh:
+                data = self._get_locked(key)
+                if data is not None:
+                    self.hits += 1
+                    mercadopago_cache_requests.labels("hit").inc()
+                    return data
+
+            future = self._async_inflight.get(flight_key)
+            leader = future is None
+            if leader:
+                future = self._async_inflight[flight_key] = loop.create_future()
+            else:
+                self.coalesced += 1
+                mercadopago_cache_requests.labels("coalesced").inc()
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = None if refresh else await self._ashared_get(key)
+            self._count_lookup(shared_hit=result is not None)
+            if result is not None:
+                self._set_local(key, result)
+            else:
+                result = await fetch()
+                self._set_local(key, result)
+                await self._ashared_set(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Evita o aviso de exceção não consumida
+            raise
+        finally:
+            with self._lock:
+                self._async_inflight.pop(flight_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,120 @@
+import logging
+from datetime import datetime
+
+from django.utils import timezone
+
+from donations.models import Payment
+from donations.logs import bind
+from donations.rollups import save_payment
+
+logger = logging.getLogger(__name__)
+
+# Mapeamento de status do Mercado Pago para status do sistema
+MP_STATUS_MAPPING = {
+    "approved": "approved",
+    "pending": "pending",
+    "in_process": "pending",
+    "rejected": "rejected",
+    "cancelled": "cancelled",
+    "refunded": "cancelled",
+    "charged_back": "cancelled",
+}
+
+
+def apply_mp_status(payment: Payment, status: str, date_approved: str = None) -> bool:
+    """
+    Aplica (sem salvar) o status do Mercado Pago ao pagamento.
+
+    Returns:
+        bool: True se algum campo do pagamento foi alterado
+    """
+    old_values = (payment.status, payment.data)
+
+    # Atualizar status do pagamento
+    payment.status = MP_STATUS_MAPPING.get(status, "pending")
+
+    # Se foi aprovado, registrar a data de aprovação
+    if payment.status == "approved" and date_approved:
+        try:
+            payment.data = datetime.fromisoformat(date_approved.replace("Z", "+00:00"))
+        except Exception:
+            pass  # Manter a data original se houver erro
+
+    changed = (payment.status, payment.data) != old_values
+    if changed:
+        # bulk_update não aplica o auto_now de `atualizado_em`
+        payment.atualizado_em = timezone.now()
+    return changed
+
+
+def update_payment_status(
+    payment_id: str,
+    status: str,
+    status_detail: str,
+    date_approved: str = None,
+    external_reference: str = None,
+) -> dict:
+    """
+    Atualiza o status de um pagamento no banco de dados.
+
+    Args:
+        payment_id: ID do pagamento no Mercado Pago
+        status: Status do pagamento (approved, pending, rejected, etc.)
+        status_detail: Detalhe do status
+        date_approved: Data de aprovação do pagamento
+        external_reference: Referência externa (opcional)
+
+    Returns:
+        dict: {"success": bool, "message": str, "payment": Payment}
+    """
+    try:
+        # Buscar pagamento pelo payment_id do Mercado Pago
+        try:
+            payment = Payment.objects.get(payment_id=payment_id)
+        except Payment.DoesNotExist:
+            return {
+                "success": False,
+                "message": f"Pagamento com payment_id {payment_id} não encontrado",
+                "payment": None,
+            }
+
+        old_status = payment.status
+        bind(donation_id=payment.id)
+
+        # Notificação repetida ou status sem mudança: nada a gravar (e o
+        # `atualizado_em` não muda, sem acordar quem acompanha a página)
+        if not apply_mp_status(payment, status, date_approved):
+            return {
+                "success": True,
+                "message": f"Pagamento #{payment.id} sem alteração: {old_status}",
+                "payment": payment,
+            }
+
+        new_status = payment.status
+
+        # Grava e atualiza os totais por período (DonationRollup)
+        save_payment(payment)
+
+        logger.info(
+            "Status do pagamento atualizado",
+            extra={"from_status": old_status, "to_status": new_status},
+        )
+
+        message = f"Pagamento #{payment.id} atualizado: {old_status} → {new_status}"
+
+        # Log adicional se foi aprovado
+        if new_status == "approved":
+            message += f" | Doação de R$ {payment.valor} confirmada!"
+
+        return {
+            "success": True,
+            "message": message,
+            "payment": payment,
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Erro ao atualizar pagamento: {str(e)}",
+            "payment": None,
+        }
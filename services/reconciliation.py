@@ -0,0 +1,167 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+from donations.models import Payment
+from donations.rollups import bulk_update_payments
+
+from .mercadopago import MercadoPagoService
+from .payments import apply_mp_status
+
+# Margem aplicada ao intervalo de datas pesquisado no Mercado Pago
+SEARCH_DATE_MARGIN = timedelta(minutes=10)
+# Tamanho de página e limite de resultados lidos por lote na pesquisa
+SEARCH_PAGE_SIZE = 100
+SEARCH_MAX_RESULTS = 1000
+
+
+def pending_payments(min_age: timedelta, max_age: timedelta):
+    """
+    Itera (com `iterator()`) sobre os pagamentos pendentes com ID do Mercado
+    Pago criados entre `max_age` e `min_age` atrás.
+    """
+    now = timezone.now()
+    return (
+        Payment.objects.filter(
+            status="pending",
+            payment_id__isnull=False,
+            data__gte=now - max_age,
+            data__lte=now - min_age,
+        )
+        .only("id", "payment_id", "status", "data", "valor", "tipo_doacao")
+        .order_by("id")
+    )
+
+
+def _search_batch(service: MercadoPagoService, payments: list[Payment]) -> dict:
+    """
+    Busca os pagamentos do lote com `/v1/payments/search`, pelo intervalo de
+    criação do lote. Retorna {payment_id: dados do Mercado Pago}.
+    """
+    wanted = {payment.payment_id for payment in payments}
+    begin = min(payment.data for payment in payments) - SEARCH_DATE_MARGIN
+    end = max(payment.data for payment in payments) + SEARCH_DATE_MARGIN
+
+    found = {}
+    offset = 0
+    while wanted - found.keys() and offset < SEARCH_MAX_RESULTS:
+        page = service.search_payments(
+            range="date_created",
+            begin_date=begin.isoformat(timespec="milliseconds"),
+            end_date=end.isoformat(timespec="milliseconds"),
+            sort="date_created",
+            criteria="asc",
+            limit=SEARCH_PAGE_SIZE,
+            offset=offset,
+        )
+        results = page.get("results") or []
+        for result in results:
+            mp_payment_id = str(result.get("id"))
+            if mp_payment_id in wanted:
+                found[mp_payment_id] = result
+
+        offset += len(results)
+        if not results or offset >= page.get("paging", {}).get("total", 0):
+            break
+
+    return found
+
+
+def _fetch_individually(payment_ids: list[str], concurrency: int) -> dict:
+    """
+    Consulta os pagamentos um a um com `get_payment_info`, com no máximo
+    `concurrency` requisições simultâneas. Falhas são omitidas do resultado.
+    """
+
+    def fetch(mp_payment_id):
+        try:
+            return mp_payment_id, MercadoPagoService().get_payment_info(
+                mp_payment_id, refresh=True
+            )
+        except Exception:
+            return mp_payment_id, None
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return {
+            mp_payment_id: data
+            for mp_payment_id, data in executor.map(fetch, payment_ids)
+            if data
+        }
+
+
+def reconcile_pending_payments(
+    min_age: timedelta,
+    max_age: timedelta,
+    batch_size: int = 200,
+    concurrency: int = 4,
+    dry_run: bool = False,
+    use_search: bool = True,
+    on_batch=None,
+) -> dict:
+    """
+    Confere os pagamentos pendentes com o Mercado Pago e aplica as mudanças
+    de status com `bulk_update`, em lotes de `batch_size`.
+
+    Cada lote é pesquisado em bloco com `/v1/payments/search`; os pagamentos
+    que não aparecem na pesquisa (ou todos, se `use_search` for False) são
+    consultados individualmente em paralelo.
+
+    `on_batch`, se informado, é chamado com as estatísticas parciais após
+    cada lote.
+
+    Returns:
+        dict: {"checked", "updated", "not_found", "searched", "fetched", "elapsed"}
+    """
+    stats = {
+        "checked": 0,
+        "updated": 0,
+        "not_found": 0,
+        "searched": 0,
+        "fetched": 0,
+        "elapsed": 0.0,
+    }
+    started = time.monotonic()
+    service = MercadoPagoService()
+
+    payments = pending_payments(min_age, max_age).iterator(chunk_size=batch_size)
+    while batch := list(islice(payments, batch_size)):
+        found = {}
+        if use_search:
+            try:
+                found = _search_batch(service, batch)
+            except RuntimeError:
+                found = {}  # Pesquisa indisponível: consulta individual
+            stats["searched"] += len(found)
+
+        missing = [p.payment_id for p in batch if p.payment_id not in found]
+        if missing:
+            fetched = _fetch_individually(missing, concurrency)
+            stats["fetched"] += len(fetched)
+            found.update(fetched)
+
+        changed = []
+        for payment in batch:
+            mp_data = found.get(payment.payment_id)
+            if not mp_data:
+                stats["not_found"] += 1
+                continue
+            if apply_mp_status(payment, mp_data.get("status"), mp_data.get("date_approved")):
+                changed.append(payment)
+
+        if changed and not dry_run:
+            bulk_update_payments(
+                changed, ["status", "data", "atualizado_em"], batch_size=batch_size
+            )
+
+        stats["checked"] += len(batch)
+        stats["updated"] += len(changed)
+        stats["elapsed"] = time.monotonic() - started
+
+        if on_batch:
+            on_batch(stats)
+
+    stats["elapsed"] = time.monotonic() - started
+    return stats
@@ -0,0 +1,1033 @@
+import asyncio
+import io
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+from donations.logs import CorrelationFilter, QueueHandler
+from donations.metrics import start_exporter
+from donations.models import DonationRollup, Payment, PixPoolCharge
+from donations.rollups import rebuild_rollups
+
+from . import mercadopago, mercadopago_async
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitOpenError, mercadopago_breaker
+from .mercadopago import MercadoPagoService, get_payment_info_cache
+from .mercadopago_async import AsyncMercadoPagoService
+from .models import WebhookJob
+from .payment_cache import PaymentInfoCache
+from .payments import update_payment_status
+from .reconciliation import reconcile_pending_payments
+from .views import webhook_mercadopago_async
+from .webhooks import claim_jobs, process_jobs
+
+
+def post_webhook(client, data):
+    return client.post(
+        reverse("webhook_mercadopago"), data=json.dumps(data), content_type="application/json"
+    )
+
+
+class WebhookViewTests(TestCase):
+    def test_enqueues_topic_format(self):
+        response = post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+        self.assertEqual(response.status_code, 200)
+        job = WebhookJob.objects.get()
+        self.assertEqual(job.mp_payment_id, "123")
+        self.assertEqual(job.status, "pending")
+
+    def test_enqueues_action_format(self):
+        response = post_webhook(
+            self.client, {"action": "payment.updated", "data": {"id": "456"}}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookJob.objects.get().mp_payment_id, "456")
+
+    def test_does_not_call_mercado_pago(self):
+        with mock.patch("services.webhooks.MercadoPagoService") as service:
+            post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+        service.assert_not_called()
+
+    def test_duplicate_notifications_are_coalesced(self):
+        post_webhook(self.client, {"resource": "123", "topic": "payment"})
+        post_webhook(self.client, {"action": "payment.updated", "data": {"id": "123"}})
+        post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+        job = WebhookJob.objects.get()
+        self.assertEqual(job.coalesced, 2)
+
+    def test_notifications_after_dedup_window_are_enqueued(self):
+        WebhookJob.objects.create(mp_payment_id="123", status="done")
+        WebhookJob.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+        self.assertEqual(WebhookJob.objects.filter(status="pending").count(), 1)
+
+    def test_new_notification_skips_backoff_of_pending_job(self):
+        job = WebhookJob.objects.create(
+            mp_payment_id="123", attempts=3, next_attempt_at=timezone.now() + timedelta(hours=1)
+        )
+
+        post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+        job.refresh_from_db()
+        self.assertEqual(job.coalesced, 1)
+        self.assertLessEqual(job.next_attempt_at, timezone.now())
+
+    def test_coalesced_done_job_does_not_absorb_notifications(self):
+        WebhookJob.objects.create(mp_payment_id="123", status="done", attempts=0)
+
+        post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+        self.assertEqual(WebhookJob.objects.filter(status="pending").count(), 1)
+
+    def test_ignores_other_topics(self):
+        response = post_webhook(self.client, {"resource": "1", "topic": "merchant_order"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(WebhookJob.objects.exists())
+
+    def test_invalid_payload(self):
+        response = post_webhook(self.client, {"foo": "bar"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookJob.objects.exists())
+
+    def test_query_budget(self):
+        # Busca de notificação pendente do mesmo pagamento e INSERT do job
+        with self.assertNumQueries(2):
+            post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+        # Notificação duplicada: a mesma busca e o UPDATE do contador
+        with self.assertNumQueries(2):
+            post_webhook(self.client, {"resource": "123", "topic": "payment"})
+
+
+@override_settings(WEBHOOK_MAX_ATTEMPTS=2, WEBHOOK_RETRY_BACKOFF=10)
+class WebhookWorkerTests(TestCase):
+    def setUp(self):
+        self.payment = Payment.objects.create(valor=Decimal("10.00"), payment_id="123")
+        self.service = mock.patch("services.webhooks.MercadoPagoService").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def run_worker(self):
+        return process_jobs(claim_jobs(10), concurrency=2)
+
+    def test_applies_status(self):
+        self.service.return_value.get_payment_info.return_value = {"status": "approved"}
+        WebhookJob.objects.create(mp_payment_id="123")
+
+        stats = self.run_worker()
+
+        self.assertEqual(stats["done"], 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "approved")
+        self.assertEqual(WebhookJob.objects.get().status, "done")
+
+    def test_update_payment_status_query_budget(self):
+        Payment.objects.create(valor=Decimal("5.00"), status="approved")
+        rebuild_rollups()
+
+        # SELECT pelo payment_id (indexado); na transação, SELECT FOR UPDATE,
+        # UPDATE do pagamento e um UPDATE por total afetado (hora e dia do
+        # status anterior e do novo)
+        with self.assertNumQueries(9):
+            result = update_payment_status("123", "approved", "accredited")
+
+        self.assertTrue(result["success"])
+
+    def test_update_payment_status_without_change_does_not_write(self):
+        self.payment.status = "approved"
+        self.payment.save()
+        updated_at = Payment.objects.get().atualizado_em
+
+        with CaptureQueriesContext(connection) as queries:
+            result = update_payment_status("123", "approved", "accredited")
+
+        self.assertTrue(result["success"])
+        self.assertIn("sem alteração", result["message"])
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(any(q["sql"].startswith("UPDATE") for q in queries.captured_queries))
+        self.assertEqual(Payment.objects.get().atualizado_em, updated_at)
+
+    def test_same_payment_in_batch_is_fetched_once(self):
+        self.service.return_value.get_payment_info.return_value = {"status": "approved"}
+        WebhookJob.objects.bulk_create(WebhookJob(mp_payment_id="123") for _ in range(3))
+
+        stats = self.run_worker()
+
+        self.assertEqual(stats["done"], 1)
+        self.assertEqual(stats["coalesced"], 2)
+        self.assertEqual(self.service.return_value.get_payment_info.call_count, 1)
+        self.assertEqual(WebhookJob.objects.filter(status="done").count(), 3)
+
+    def test_worker_survives_database_errors(self):
+        claim = mock.patch(
+            "services.management.commands.process_webhooks.claim_jobs",
+            side_effect=[OperationalError("conexão encerrada"), [], KeyboardInterrupt],
+        ).start()
+        close = mock.patch(
+            "services.management.commands.process_webhooks.close_old_connections"
+        ).start()
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        with self.assertLogs("services.management.commands.process_webhooks", "ERROR"):
+            call_command("process_webhooks", "--sleep", "0", stdout=stdout, stderr=stderr)
+
+        self.assertEqual(claim.call_count, 3)
+        self.assertEqual(close.call_count, 3)
+        self.assertIn("tentando novamente", stderr.getvalue())
+        self.assertIn("Worker de webhooks encerrado", stdout.getvalue())
+
+    def test_worker_once_reports_database_errors(self):
+        mock.patch(
+            "services.management.commands.process_webhooks.claim_jobs",
+            side_effect=OperationalError("conexão encerrada"),
+        ).start()
+
+        with self.assertRaises(OperationalError):
+            call_command("process_webhooks", "--once", stdout=io.StringIO())
+
+    def test_worker_exports_status_transitions(self):
+        self.service.return_value.get_payment_info.return_value = {"status": "approved"}
+        WebhookJob.objects.create(mp_payment_id="123")
+        labels = {"from_status": "pending", "to_status": "approved"}
+        approved = sample("payment_status_transitions_total", **labels)
+        server, _ = start_exporter(0, addr="127.0.0.1")
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_worker()
+
+        # O que o Prometheus coleta do container worker
+        response = requests.get(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5)
+        exported = {
+            (value.name, tuple(sorted(value.labels.items()))): value.value
+            for family in text_string_to_metric_families(response.text)
+            for value in family.samples
+        }
+        key = ("payment_status_transitions_total", tuple(sorted(labels.items())))
+        self.assertEqual(exported[key], approved + 1)
+
+    def test_worker_serves_metrics_while_running(self):
+        server = mock.Mock()
+        exporter = mock.patch(
+            "services.management.commands.process_webhooks.start_exporter",
+            return_value=(server, None),
+        ).start()
+
+        call_command("process_webhooks", "--once", "--metrics-port", "9100", stdout=io.StringIO())
+
+        exporter.assert_called_once_with(9100)
+        server.shutdown.assert_called_once()
+
+    def test_recently_fetched_payment_is_not_fetched_again(self):
+        WebhookJob.objects.create(mp_payment_id="123", status="done", attempts=1)
+        WebhookJob.objects.create(mp_payment_id="123")
+
+        stats = self.run_worker()
+
+        self.assertEqual(stats["coalesced"], 1)
+        self.service.return_value.get_payment_info.assert_not_called()
+
+    def test_coalesced_duplicates_do_not_count_as_fetched(self):
+        self.service.return_value.get_payment_info.return_value = {"status": "approved"}
+        WebhookJob.objects.create(mp_payment_id="123", status="done", attempts=0)
+        WebhookJob.objects.create(mp_payment_id="123")
+
+        stats = self.run_worker()
+
+        self.assertEqual(stats["done"], 1)
+        self.service.return_value.get_payment_info.assert_called_once()
+
+    def test_claimed_jobs_are_not_claimed_twice(self):
+        WebhookJob.objects.create(mp_payment_id="123")
+
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_scheduled_jobs_wait_for_next_attempt(self):
+        WebhookJob.objects.create(
+            mp_payment_id="123", next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_retry_then_dead_letter(self):
+        self.service.return_value.get_payment_info.side_effect = RuntimeError("timeout")
+        WebhookJob.objects.create(mp_payment_id="123")
+
+        self.assertEqual(self.run_worker()["retried"], 1)
+        job = WebhookJob.objects.get()
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt_at, timezone.now())
+
+        WebhookJob.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(self.run_worker()["dead"], 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "dead")
+        self.assertEqual(job.last_error, "timeout")
+
+    def test_pool_charge_notifications_finish_without_fetching(self):
+        PixPoolCharge.objects.create(
+            valor=Decimal("10.00"),
+            payment_id="pool-1",
+            expira_em=timezone.now() - timedelta(minutes=1),
+            descartada=True,
+        )
+        WebhookJob.objects.create(mp_payment_id="pool-1")
+
+        stats = self.run_worker()
+
+        self.assertEqual(stats["pool"], 1)
+        self.assertEqual(WebhookJob.objects.get().status, "done")
+        self.service.return_value.get_payment_info.assert_not_called()
+
+    def test_unknown_payment_is_retried(self):
+        self.service.return_value.get_payment_info.return_value = {"status": "approved"}
+        WebhookJob.objects.create(mp_payment_id="999")
+
+        self.assertEqual(self.run_worker()["retried"], 1)
+
+    def test_stale_processing_jobs_are_reclaimed(self):
+        WebhookJob.objects.create(
+            mp_payment_id="123",
+            status="processing",
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+
+        self.assertEqual(len(claim_jobs(10)), 1)
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        created = timezone.now() - timedelta(hours=1)
+        self.approved = Payment.objects.create(valor=Decimal("10.00"), payment_id="1", data=created)
+        self.still_pending = Payment.objects.create(
+            valor=Decimal("10.00"), payment_id="2", data=created
+        )
+        self.missing = Payment.objects.create(valor=Decimal("10.00"), payment_id="3", data=created)
+        self.recent = Payment.objects.create(valor=Decimal("10.00"), payment_id="4")
+
+        self.service = mock.patch("services.reconciliation.MercadoPagoService").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def reconcile(self, **kwargs):
+        options = {"min_age": timedelta(minutes=5), "max_age": timedelta(days=7)}
+        options.update(kwargs)
+        return reconcile_pending_payments(**options)
+
+    def test_uses_search_and_falls_back_to_individual_lookups(self):
+        self.service.return_value.search_payments.return_value = {
+            "paging": {"total": 2},
+            "results": [{"id": 1, "status": "approved"}, {"id": 2, "status": "pending"}],
+        }
+        self.service.return_value.get_payment_info.return_value = {"status": "cancelled"}
+        started = timezone.now()
+
+        stats = self.reconcile()
+
+        self.assertEqual(stats["checked"], 3)
+        self.assertEqual(stats["searched"], 2)
+        self.assertEqual(stats["fetched"], 1)
+        self.assertEqual(stats["updated"], 2)
+        self.service.return_value.get_payment_info.assert_called_once_with("3", refresh=True)
+
+        self.approved.refresh_from_db()
+        self.missing.refresh_from_db()
+        self.recent.refresh_from_db()
+        self.assertEqual(self.approved.status, "approved")
+        self.assertEqual(self.missing.status, "cancelled")
+        self.assertEqual(self.recent.status, "pending")
+        self.assertGreaterEqual(self.approved.atualizado_em, started)
+
+    def test_updates_rollups(self):
+        rebuild_rollups()
+        self.service.return_value.search_payments.return_value = {
+            "paging": {"total": 1},
+            "results": [{"id": 1, "status": "approved"}],
+        }
+        self.service.return_value.get_payment_info.return_value = {"status": "pending"}
+
+        self.reconcile()
+
+        day_totals = dict(
+            DonationRollup.objects.filter(granularidade="day")
+            .values("status")
+            .annotate(total=Sum("quantidade"))
+            .values_list("status", "total")
+        )
+        self.assertEqual(day_totals, {"approved": 1, "pending": 3})
+
+    def test_without_search(self):
+        self.service.return_value.get_payment_info.return_value = {"status": "rejected"}
+
+        stats = self.reconcile(use_search=False, batch_size=2, concurrency=2)
+
+        self.assertEqual(stats["fetched"], 3)
+        self.service.return_value.search_payments.assert_not_called()
+        self.assertEqual(Payment.objects.filter(status="rejected").count(), 3)
+
+    def test_dry_run_does_not_write(self):
+        self.service.return_value.search_payments.side_effect = RuntimeError("indisponível")
+        self.service.return_value.get_payment_info.return_value = {"status": "approved"}
+
+        stats = self.reconcile(dry_run=True)
+
+        self.assertEqual(stats["updated"], 3)
+        self.assertEqual(Payment.objects.filter(status="approved").count(), 0)
+
+
+class PaymentInfoCacheTests(TestCase):
+    def setUp(self):
+        self.cache = PaymentInfoCache(max_size=2, pending_ttl=60, terminal_ttl=3600)
+
+    def test_hit_and_miss(self):
+        fetch = mock.Mock(return_value={"status": "pending"})
+
+        self.cache.get_or_fetch("1", fetch)
+        self.cache.get_or_fetch("1", fetch)
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_ttl_depends_on_status(self):
+        self.cache.pending_ttl = 0
+        self.cache.set("pending", {"status": "pending"})
+        self.cache.set("approved", {"status": "approved"})
+
+        self.assertIsNone(self.cache.get("pending"))
+        self.assertEqual(self.cache.get("approved"), {"status": "approved"})
+
+    def test_lru_eviction(self):
+        self.cache.set("1", {"status": "approved"})
+        self.cache.set("2", {"status": "approved"})
+        self.cache.get("1")
+        self.cache.set("3", {"status": "approved"})
+
+        self.assertIsNone(self.cache.get("2"))
+        self.assertIsNotNone(self.cache.get("1"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_refresh_writes_through(self):
+        self.cache.set("1", {"status": "pending"})
+
+        data = self.cache.get_or_fetch("1", lambda: {"status": "approved"}, refresh=True)
+
+        self.assertEqual(data, {"status": "approved"})
+        self.assertEqual(self.cache.get("1"), {"status": "approved"})
+
+    def test_refresh_reaches_other_processes_through_shared_cache(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Caches de dois processos (worker de webhooks e worker web)
+        webhook_worker = PaymentInfoCache(2, pending_ttl=60, terminal_ttl=3600, shared=cache)
+        web_worker = PaymentInfoCache(2, pending_ttl=60, terminal_ttl=3600, shared=cache)
+        web_worker.set("1", {"status": "pending"})
+        web_worker.clear()  # Expirou na memória do worker web
+        fetch = mock.Mock(return_value={"status": "pending"})
+
+        webhook_worker.get_or_fetch("1", lambda: {"status": "approved"}, refresh=True)
+
+        self.assertEqual(web_worker.get_or_fetch("1", fetch), {"status": "approved"})
+        fetch.assert_not_called()
+        self.assertEqual(web_worker.stats()["shared_hits"], 1)
+
+    async def test_async_reads_shared_cache(self):
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        shared = PaymentInfoCache(2, pending_ttl=60, terminal_ttl=3600, shared=cache)
+        await cache.aset("mp-payment-info:1", {"status": "approved"})
+
+        async def fetch():
+            raise AssertionError("não deveria consultar o Mercado Pago")
+
+        self.assertEqual(await shared.aget_or_fetch("1", fetch), {"status": "approved"})
+
+    def test_concurrent_callers_share_one_fetch(self):
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return {"status": "approved"}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_fetch("1", fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while self.cache.stats()["coalesced"] < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"status": "approved"}] * 5)
+
+    def test_refresh_does_not_join_a_lookup_served_from_shared_cache(self):
+        reading = threading.Event()
+        release = threading.Event()
+
+        def stale_get(key):
+            reading.set()
+            release.wait(5)
+            return {"status": "pending"}
+
+        shared = mock.Mock(get=mock.Mock(side_effect=stale_get))
+        payment_cache = PaymentInfoCache(2, pending_ttl=60, terminal_ttl=3600, shared=shared)
+        results = {}
+        reader = threading.Thread(
+            target=lambda: results.update(cached=payment_cache.get_or_fetch("1", mock.Mock()))
+        )
+        reader.start()
+        reading.wait(5)
+
+        fetch = mock.Mock(return_value={"status": "approved"})
+        fresh = payment_cache.get_or_fetch("1", fetch, refresh=True)
+        release.set()
+        reader.join()
+
+        self.assertEqual(fresh, {"status": "approved"})
+        fetch.assert_called_once()
+        self.assertEqual(results["cached"], {"status": "pending"})
+        self.assertEqual(payment_cache.stats()["coalesced"], 0)
+
+    async def test_async_refresh_does_not_join_a_lookup_served_from_shared_cache(self):
+        reading = asyncio.Event()
+        release = asyncio.Event()
+
+        async def stale_get(key):
+            reading.set()
+            await release.wait()
+            return {"status": "pending"}
+
+        shared = mock.Mock(aget=stale_get)
+        payment_cache = PaymentInfoCache(2, pending_ttl=60, terminal_ttl=3600, shared=shared)
+        shared.aset = mock.AsyncMock()
+
+        async def fetch():
+            return {"status": "approved"}
+
+        cached = asyncio.create_task(payment_cache.aget_or_fetch("1", fetch))
+        await reading.wait()
+        fresh = await asyncio.wait_for(
+            payment_cache.aget_or_fetch("1", fetch, refresh=True), timeout=5
+        )
+        release.set()
+
+        self.assertEqual(fresh, {"status": "approved"})
+        self.assertEqual(await cached, {"status": "pending"})
+
+    def test_errors_are_shared_and_not_cached(self):
+        fetch = mock.Mock(side_effect=RuntimeError("falhou"))
+
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_fetch("1", fetch)
+
+        self.assertIsNone(self.cache.get("1"))
+
+
+class MercadoPagoHTTPServer(ThreadingHTTPServer):
+    """Servidor local que responde, em ordem, os status de `statuses` (depois, 500)."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def respond(handler):
+                length = int(handler.headers.get("Content-Length") or 0)
+                handler.rfile.read(length)
+                self.requests.append((handler.command, dict(handler.headers)))
+                status = self.statuses.pop(0) if self.statuses else 500
+                body = json.dumps({"id": 1, "status": "approved"}).encode()
+                handler.send_response(status)
+                handler.send_header("Content-Type", "application/json")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            do_GET = do_POST = respond
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@override_settings(MP_RETRY_BACKOFF=0, MP_MAX_RETRIES=2)
+class MercadoPagoSessionTests(TestCase):
+    def setUp(self):
+        mercadopago_breaker.reset()
+        get_payment_info_cache().clear()
+        # Sessões novas, criadas com as configurações do teste
+        mock.patch.object(mercadopago, "_http_sessions", {}).start()
+        mock.patch.object(mercadopago, "_http_sessions_pid", None).start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(mercadopago_breaker.reset)
+
+    def serve(self, *statuses):
+        server = MercadoPagoHTTPServer(statuses)
+        self.addCleanup(server.stop)
+        override = override_settings(MP_BASE_API_URL=server.url)
+        override.enable()
+        self.addCleanup(override.disable)
+        return server
+
+    def test_sessions_rebuilt_when_pid_changes(self):
+        with mock.patch.object(mercadopago.os, "getpid", return_value=1):
+            parent_get = mercadopago.get_http_session()
+            parent_post = mercadopago.get_http_session("POST")
+            self.assertIs(mercadopago.get_http_session(), parent_get)
+            self.assertIsNot(parent_post, parent_get)
+
+        with mock.patch.object(mercadopago.os, "getpid", return_value=2):
+            self.assertIsNot(mercadopago.get_http_session(), parent_get)
+            self.assertIsNot(mercadopago.get_http_session("POST"), parent_post)
+
+    def test_get_retries_transient_status(self):
+        server = self.serve(503, 200)
+
+        response = MercadoPagoService().get_payment_info("123")
+
+        self.assertEqual(response["status"], "approved")
+        self.assertEqual([method for method, _ in server.requests], ["GET", "GET"])
+
+    def test_post_retries_with_same_idempotency_key(self):
+        server = self.serve(503, 201)
+
+        response = MercadoPagoService().pay_with_pix(
+            amount=10, payer_email="a@b.com", payer_cpf="00000000000"
+        )
+
+        self.assertEqual(response["id"], 1)
+        self.assertEqual(len(server.requests), 2)
+        keys = {headers["X-Idempotency-Key"] for _, headers in server.requests}
+        self.assertEqual(len(keys), 1)
+
+    def test_post_connection_failures_are_not_retried_twice(self):
+        self.serve()
+        refused = mock.patch(
+            "urllib3.util.connection.create_connection",
+            side_effect=ConnectionRefusedError("recusada"),
+        ).start()
+
+        with self.assertRaises(RuntimeError):
+            MercadoPagoService().pay_with_pix(
+                amount=10, payer_email="a@b.com", payer_cpf="00000000000"
+            )
+
+        # MP_MAX_RETRIES + 1 tentativas, e não (MP_MAX_RETRIES + 1) ** 2
+        self.assertEqual(refused.call_count, 3)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(MP_RETRY_BACKOFF=0, MP_MAX_RETRIES=0)
+class MercadoPagoMetricsTests(TestCase):
+    def setUp(self):
+        get_payment_info_cache().clear()
+        self.session = mock.patch("services.mercadopago.get_http_session").start().return_value
+        self.addCleanup(mock.patch.stopall)
+
+    def test_request_latency_by_endpoint_and_status(self):
+        self.session.get.return_value = mock.Mock(
+            status_code=200, json=mock.Mock(return_value={"status": "approved"})
+        )
+        labels = {"endpoint": "/v1/payments/{id}", "method": "GET", "status": "200"}
+        before = sample("mercadopago_request_duration_seconds_count", **labels)
+
+        MercadoPagoService().get_payment_info("123456")
+
+        self.assertEqual(sample("mercadopago_request_duration_seconds_count", **labels), before + 1)
+
+    def test_errors_counted_by_class(self):
+        self.session.post.side_effect = requests.exceptions.ConnectionError("recusada")
+        labels = {"endpoint": "/v1/payments", "method": "POST"}
+        errors = sample("mercadopago_request_errors_total", error="ConnectionError", **labels)
+        failed = sample("mercadopago_request_duration_seconds_count", status="error", **labels)
+
+        with self.assertRaises(RuntimeError):
+            MercadoPagoService().pay_with_pix(
+                amount=10, payer_email="a@b.com", payer_cpf="00000000000"
+            )
+
+        self.assertEqual(
+            sample("mercadopago_request_errors_total", error="ConnectionError", **labels),
+            errors + 1,
+        )
+        self.assertEqual(
+            sample("mercadopago_request_duration_seconds_count", status="error", **labels),
+            failed + 1,
+        )
+
+    def test_cache_hits_and_misses(self):
+        self.session.get.return_value = mock.Mock(
+            status_code=200, json=mock.Mock(return_value={"status": "approved"})
+        )
+        hits = sample("mercadopago_payment_cache_requests_total", result="hit")
+        misses = sample("mercadopago_payment_cache_requests_total", result="miss")
+
+        service = MercadoPagoService()
+        service.get_payment_info("1")
+        service.get_payment_info("1")
+
+        self.assertEqual(sample("mercadopago_payment_cache_requests_total", result="miss"), misses + 1)
+        self.assertEqual(sample("mercadopago_payment_cache_requests_total", result="hit"), hits + 1)
+
+
+@override_settings(MP_RETRY_BACKOFF=0, MP_MAX_RETRIES=0)
+class MercadoPagoLoggingTests(TestCase):
+    def setUp(self):
+        get_payment_info_cache().clear()
+        self.session = mock.patch("services.mercadopago.get_http_session").start().return_value
+        self.addCleanup(mock.patch.stopall)
+        self.session.get.return_value = mock.Mock(
+            status_code=200,
+            json=mock.Mock(
+                return_value={
+                    "id": 123,
+                    "status": "approved",
+                    "payer": {"email": "a@b.com"},
+                    "point_of_interaction": {"transaction_data": {"qr_code_base64": "A" * 5000}},
+                }
+            ),
+        )
+
+    @override_settings(LOG_PAYLOAD_SAMPLE_RATE=0)
+    def test_payment_info_logs_summary_only(self):
+        with self.assertLogs("services.mercadopago", "INFO") as logs:
+            MercadoPagoService().get_payment_info("123")
+
+        (record,) = logs.records
+        self.assertEqual(record.mp_payment_id, 123)
+        self.assertEqual(record.mp_status, "approved")
+        self.assertFalse(hasattr(record, "payload"))
+
+    @override_settings(LOG_PAYLOAD_SAMPLE_RATE=1)
+    def test_sampled_payload_is_redacted_and_truncated(self):
+        stream = io.StringIO()
+        handler = QueueHandler(max_length=100, stream=stream)
+        logger = logging.getLogger("services.mercadopago")
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        MercadoPagoService().get_payment_info("123")
+        handler.close()
+
+        payload = json.loads(stream.getvalue())["payload"]
+        self.assertEqual(payload["payer"], {"email": "[redacted]"})
+        qr_code = payload["point_of_interaction"]["transaction_data"]["qr_code_base64"]
+        self.assertLess(len(qr_code), 150)
+
+    def test_webhook_logs_carry_correlation_ids(self):
+        stream = io.StringIO()
+        handler = QueueHandler(stream=stream)
+        handler.addFilter(CorrelationFilter())
+        logger = logging.getLogger("services.views")
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        response = post_webhook(self.client, {"resource": "123", "topic": "payment"})
+        handler.close()
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry["message"], "Notificação do Mercado Pago enfileirada")
+        self.assertEqual(entry["request_id"], response["X-Request-ID"])
+        self.assertEqual(entry["mp_payment_id"], "123")
+        self.assertEqual(entry["webhook_job_id"], WebhookJob.objects.get().id)
+
+
+@override_settings(
+    MP_RETRY_BACKOFF=0,
+    MP_MAX_RETRIES=0,
+    MP_BREAKER_MIN_CALLS=2,
+    MP_BREAKER_FAILURE_RATE=0.5,
+    MP_BREAKER_OPEN_SECONDS=30,
+)
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        mercadopago_breaker.reset()
+        get_payment_info_cache().clear()
+        self.session = mock.patch("services.mercadopago.get_http_session").start().return_value
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(mercadopago_breaker.reset)
+
+    def pay(self):
+        return MercadoPagoService().pay_with_pix(
+            amount=10, payer_email="a@b.com", payer_cpf="00000000000"
+        )
+
+    def open_circuit(self, seconds_ago=0):
+        caches["shared"].set(mercadopago_breaker.opened_key, time.time() - seconds_ago, timeout=None)
+
+    def test_state_is_shared_between_processes(self):
+        # Outro worker: outra instância do cache, apoiada na mesma tabela
+        other_worker = DatabaseCache(
+            "cache_compartilhado", {"KEY_PREFIX": settings.CACHES["shared"]["KEY_PREFIX"]}
+        )
+        other_worker.set(mercadopago_breaker.opened_key, time.time(), timeout=None)
+
+        self.assertEqual(mercadopago_breaker.state(), OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.pay()
+        self.session.post.assert_not_called()
+
+    def test_opens_after_failures_and_fails_fast(self):
+        self.session.post.side_effect = requests.exceptions.ConnectionError("recusada")
+        opened = sample(
+            "mercadopago_circuit_breaker_transitions_total",
+            breaker="mercadopago",
+            from_state=CLOSED,
+            to_state=OPEN,
+        )
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                self.pay()
+        with self.assertRaises(CircuitOpenError):
+            self.pay()
+
+        self.assertEqual(self.session.post.call_count, 2)
+        self.assertEqual(mercadopago_breaker.state(), OPEN)
+        self.assertEqual(
+            sample(
+                "mercadopago_circuit_breaker_transitions_total",
+                breaker="mercadopago",
+                from_state=CLOSED,
+                to_state=OPEN,
+            ),
+            opened + 1,
+        )
+
+    def test_client_errors_do_not_open(self):
+        self.session.post.return_value = requests.Response()
+        self.session.post.return_value.status_code = 400
+
+        for _ in range(3):
+            with self.assertRaises(RuntimeError) as raised:
+                self.pay()
+            self.assertNotIsInstance(raised.exception, CircuitOpenError)
+
+        self.assertEqual(mercadopago_breaker.state(), CLOSED)
+
+    @override_settings(MP_BREAKER_SLOW_CALL_SECONDS=0)
+    def test_slow_calls_count_as_failures(self):
+        self.session.get.return_value = mock.Mock(
+            status_code=200, json=mock.Mock(return_value={"status": "pending"})
+        )
+
+        MercadoPagoService().get_payment_info("1")
+        MercadoPagoService().get_payment_info("2")
+
+        self.assertEqual(mercadopago_breaker.state(), OPEN)
+
+    def test_half_open_probe_closes_on_success(self):
+        self.open_circuit(seconds_ago=60)
+        self.assertEqual(mercadopago_breaker.state(), HALF_OPEN)
+        self.session.post.return_value = mock.Mock(
+            status_code=201, json=mock.Mock(return_value={"id": 1})
+        )
+
+        self.assertEqual(self.pay(), {"id": 1})
+        self.assertEqual(mercadopago_breaker.state(), CLOSED)
+
+    def test_half_open_probe_failure_reopens(self):
+        self.open_circuit(seconds_ago=60)
+        self.session.post.side_effect = requests.exceptions.Timeout("lento")
+
+        with self.assertRaises(RuntimeError):
+            self.pay()
+
+        self.assertEqual(mercadopago_breaker.state(), OPEN)
+        self.assertGreater(mercadopago_breaker.retry_after(), 0)
+
+    def test_only_one_probe_while_half_open(self):
+        self.open_circuit(seconds_ago=60)
+        mercadopago_breaker.before_call()  # Chamada de teste em andamento
+
+        with self.assertRaises(CircuitOpenError):
+            self.pay()
+        self.session.post.assert_not_called()
+
+    @override_settings(MP_BREAKER_ENABLED=False)
+    def test_disabled(self):
+        self.open_circuit()
+        self.session.post.return_value = mock.Mock(
+            status_code=201, json=mock.Mock(return_value={"id": 1})
+        )
+
+        self.assertEqual(self.pay(), {"id": 1})
+
+
+@override_settings(MP_RETRY_BACKOFF=0, MP_MAX_RETRIES=2)
+class AsyncMercadoPagoServiceTests(TestCase):
+    def setUp(self):
+        self.requests = []
+        self.responses = []
+        get_payment_info_cache().clear()
+
+        def handler(request):
+            self.requests.append(request)
+            return self.responses.pop(0) if self.responses else httpx.Response(500)
+
+        transport = httpx.MockTransport(handler)
+        mock.patch.object(
+            mercadopago_async,
+            "_build_async_client",
+            lambda: httpx.AsyncClient(transport=transport),
+        ).start()
+        mock.patch.object(mercadopago_async, "_async_clients", {}).start()
+        self.addCleanup(mock.patch.stopall)
+
+    async def test_pay_with_pix_retries_with_same_idempotency_key(self):
+        self.responses = [httpx.Response(503), httpx.Response(201, json={"id": 1})]
+
+        response = await AsyncMercadoPagoService().pay_with_pix(
+            amount=10, payer_email="a@b.com", payer_cpf="00000000000"
+        )
+
+        self.assertEqual(response, {"id": 1})
+        self.assertEqual(len(self.requests), 2)
+        self.assertTrue(self.requests[0].url.path.endswith("/v1/payments"))
+        keys = {request.headers["X-Idempotency-Key"] for request in self.requests}
+        self.assertEqual(len(keys), 1)
+
+    async def test_transport_errors_are_retried_once_per_attempt(self):
+        def refuse(request):
+            self.requests.append(request)
+            raise httpx.ConnectError("recusada", request=request)
+
+        mock.patch.object(
+            mercadopago_async,
+            "_build_async_client",
+            lambda: httpx.AsyncClient(transport=httpx.MockTransport(refuse)),
+        ).start()
+
+        with self.assertRaises(RuntimeError):
+            await AsyncMercadoPagoService().get_payment_info("123")
+
+        self.assertEqual(len(self.requests), 3)  # MP_MAX_RETRIES + 1
+
+    def test_client_is_closed_with_its_event_loop(self):
+        client = async_to_sync(mercadopago_async.get_async_http_client)()
+        other = async_to_sync(mercadopago_async.get_async_http_client)()
+
+        self.assertIsNot(client, other)
+        self.assertTrue(client.is_closed)
+        self.assertTrue(other.is_closed)
+        self.assertEqual(mercadopago_async._async_clients, {})
+
+    async def test_client_is_shared_within_event_loop(self):
+        client = await mercadopago_async.get_async_http_client()
+
+        self.assertIs(await mercadopago_async.get_async_http_client(), client)
+        self.assertFalse(client.is_closed)
+
+    async def test_validation_happens_before_request(self):
+        with self.assertRaises(ValueError):
+            await AsyncMercadoPagoService().pay_with_pix(
+                amount=0, payer_email="a@b.com", payer_cpf="00000000000"
+            )
+
+        self.assertEqual(self.requests, [])
+
+    async def test_api_error(self):
+        self.responses = [httpx.Response(400, json={"message": "invalid"})]
+
+        with self.assertRaises(RuntimeError):
+            await AsyncMercadoPagoService().create_preference_with_card(
+                [{"id": "1", "title": "x", "quantity": 1, "currency_id": "BRL", "unit_price": 1}]
+            )
+
+    async def test_api_error_recorded_in_metrics(self):
+        self.responses = [httpx.Response(400, json={"message": "invalid"})]
+        labels = {"endpoint": "/checkout/preferences", "method": "POST"}
+        errors = sample("mercadopago_request_errors_total", error="HTTPStatusError", **labels)
+        requests_400 = sample("mercadopago_request_duration_seconds_count", status="400", **labels)
+
+        with self.assertRaises(RuntimeError):
+            await AsyncMercadoPagoService().create_preference_with_card(
+                [{"id": "1", "title": "x", "quantity": 1, "currency_id": "BRL", "unit_price": 1}]
+            )
+
+        self.assertEqual(
+            sample("mercadopago_request_errors_total", error="HTTPStatusError", **labels),
+            errors + 1,
+        )
+        self.assertEqual(
+            sample("mercadopago_request_duration_seconds_count", status="400", **labels),
+            requests_400 + 1,
+        )
+
+    async def test_circuit_open_fails_fast(self):
+        mock.patch.object(mercadopago_breaker, "state", return_value=OPEN).start()
+
+        with self.assertRaises(CircuitOpenError):
+            await AsyncMercadoPagoService().get_payment_info("123")
+
+        self.assertEqual(self.requests, [])
+
+    async def test_concurrent_payment_info_shares_one_request(self):
+        self.responses = [httpx.Response(200, json={"status": "approved"})]
+        service = AsyncMercadoPagoService()
+
+        results = await asyncio.gather(*(service.get_payment_info("123") for _ in range(5)))
+
+        self.assertEqual(results, [{"status": "approved"}] * 5)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_async_webhook_enqueues(self):
+        request = AsyncRequestFactory().post(
+            "/services/webhook/mercadopago/",
+            data=json.dumps({"resource": "123", "topic": "payment"}),
+            content_type="application/json",
+        )
+
+        response = await webhook_mercadopago_async(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await WebhookJob.objects.filter(mp_payment_id="123").acount(), 1)
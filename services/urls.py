@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+# Com ASYNC_VIEWS (servidor ASGI) o webhook usa a view assíncrona
+webhook_view = (
+    views.webhook_mercadopago_async if settings.ASYNC_VIEWS else views.webhook_mercadopago
+)
+
 urlpatterns = [
-    path("webhook/mercadopago/", views.webhook_mercadopago, name="webhook_mercadopago"),
+    path("webhook/mercadopago/", webhook_view, name="webhook_mercadopago"),
 ]
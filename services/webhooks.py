@@ -0,0 +1,250 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from donations.logs import correlation
+from donations.pix_pool import pool_payment_ids
+
+from .mercadopago import MercadoPagoService
+from .models import WebhookJob
+from .payments import update_payment_status
+
+logger = logging.getLogger(__name__)
+
+
+def _dedup_window_start():
+    return timezone.now() - timedelta(seconds=settings.WEBHOOK_DEDUP_WINDOW)
+
+
+def _recently_fetched(window_start) -> Q:
+    """
+    Jobs que consultaram o Mercado Pago com sucesso desde `window_start` (os
+    concluídos como duplicata não consultaram nada e têm `attempts=0`).
+    """
+    return Q(status="done", attempts__gt=0, updated_at__gte=window_start)
+
+
+def enqueue_notification(payment_id: str, payload: dict) -> tuple[WebhookJob, bool]:
+    """
+    Grava uma notificação do Mercado Pago para processamento assíncrono.
+
+    O Mercado Pago envia o mesmo evento várias vezes (nos formatos
+    topic/resource e action/data). Se já existe uma notificação do mesmo
+    pagamento aguardando processamento, em andamento ou consultada há menos
+    de `WEBHOOK_DEDUP_WINDOW` segundos, a nova é agrupada a ela (apenas o
+    contador `coalesced` é incrementado). Uma notificação pendente reagendada
+    após falhas volta a ser elegível imediatamente: a nova notificação indica
+    mudança no pagamento e não deve esperar o backoff.
+
+    Returns:
+        tuple: (job, created) - `created` é False quando a notificação foi agrupada
+    """
+    payment_id = str(payment_id)
+    now = timezone.now()
+    window_start = _dedup_window_start()
+
+    existing = (
+        WebhookJob.objects.filter(mp_payment_id=payment_id)
+        .filter(
+            Q(status="pending")
+            | Q(status="processing", locked_at__gte=window_start)
+            | _recently_fetched(window_start)
+        )
+        .order_by("-id")
+        .first()
+    )
+    if existing:
+        WebhookJob.objects.filter(pk=existing.pk).update(
+            coalesced=F("coalesced") + 1,
+            next_attempt_at=Least(F("next_attempt_at"), Value(now)),
+        )
+        existing.coalesced += 1
+        existing.next_attempt_at = min(existing.next_attempt_at, now)
+        return existing, False
+
+    return WebhookJob.objects.create(mp_payment_id=payment_id, payload=payload), True
+
+
+def claim_jobs(batch_size: int) -> list[WebhookJob]:
+    """
+    Reivindica até `batch_size` notificações prontas para processamento.
+
+    No PostgreSQL usa `SELECT ... FOR UPDATE SKIP LOCKED`, permitindo vários
+    workers em paralelo. Em bancos sem esse recurso (SQLite), cada job é
+    reivindicado com um UPDATE condicional e só é devolvido se este worker
+    venceu a disputa. Jobs presos em "processing" por mais de
+    `WEBHOOK_LOCK_TIMEOUT` segundos (worker morto) voltam a ser elegíveis.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.WEBHOOK_LOCK_TIMEOUT)
+
+    ready = WebhookJob.objects.filter(
+        Q(status="pending", next_attempt_at__lte=now)
+        | Q(status="processing", locked_at__lt=stale_before)
+    ).order_by("next_attempt_at", "id")
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = list(ready.select_for_update(skip_locked=True)[:batch_size])
+            WebhookJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status="processing", locked_at=now
+            )
+    else:
+        jobs = []
+        for job in ready[:batch_size]:
+            claimed = WebhookJob.objects.filter(
+                pk=job.pk, status=job.status, locked_at=job.locked_at
+            ).update(status="processing", locked_at=now)
+            if claimed:
+                jobs.append(job)
+
+    for job in jobs:
+        job.status = "processing"
+        job.locked_at = now
+    return jobs
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Backoff exponencial limitado a `WEBHOOK_RETRY_MAX_DELAY` segundos."""
+    delay = settings.WEBHOOK_RETRY_BACKOFF * (2 ** (attempts - 1))
+    return timedelta(seconds=min(delay, settings.WEBHOOK_RETRY_MAX_DELAY))
+
+
+def _fetch_payment_info(mp_payment_id: str) -> dict:
+    # A notificação indica mudança: ignora o cache e grava a resposta nova nele
+    return MercadoPagoService().get_payment_info(mp_payment_id, refresh=True)
+
+
+def _mark_done(job: WebhookJob):
+    job.status = "done"
+    job.attempts += 1
+    job.locked_at = None
+    job.last_error = ""
+    job.save(update_fields=["status", "attempts", "locked_at", "last_error", "updated_at"])
+
+
+def _mark_coalesced(job: WebhookJob):
+    """Conclui um job sem consultar o Mercado Pago (duplicado ou sem doação)."""
+    job.status = "done"
+    job.locked_at = None
+    job.save(update_fields=["status", "locked_at", "updated_at"])
+
+
+def _mark_failed(job: WebhookJob, error: str):
+    """
+    Registra a falha e reagenda o job, ou o descarta (dead letter) após
+    `WEBHOOK_MAX_ATTEMPTS` tentativas.
+    """
+    job.attempts += 1
+    job.locked_at = None
+    job.last_error = error
+
+    if job.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+        job.status = "dead"
+    else:
+        job.status = "pending"
+        job.next_attempt_at = timezone.now() + _retry_delay(job.attempts)
+
+    job.save(
+        update_fields=[
+            "status",
+            "attempts",
+            "locked_at",
+            "last_error",
+            "next_attempt_at",
+            "updated_at",
+        ]
+    )
+
+
+def process_jobs(jobs: list[WebhookJob], concurrency: int) -> dict:
+    """
+    Processa notificações reivindicadas.
+
+    Jobs do mesmo pagamento no lote compartilham uma única consulta ao
+    Mercado Pago, e jobs de pagamentos consultados com sucesso há menos de
+    `WEBHOOK_DEDUP_WINDOW` segundos são concluídos sem nova consulta. As
+    consultas são feitas em paralelo (no máximo `concurrency` simultâneas); as
+    escritas no banco ficam na thread atual.
+
+    Notificações de cobranças do estoque PIX ainda não usadas por uma doação
+    (criadas ou vencidas sem doador) são concluídas sem consulta: não há
+    pagamento a atualizar.
+
+    Returns:
+        dict: {"done": int, "retried": int, "dead": int, "coalesced": int, "pool": int}
+    """
+    stats = {"done": 0, "retried": 0, "dead": 0, "coalesced": 0, "pool": 0}
+    if not jobs:
+        return stats
+
+    # Agrupa os jobs por pagamento: o primeiro de cada grupo faz a consulta
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.mp_payment_id, []).append(job)
+
+    for mp_payment_id in pool_payment_ids(groups.keys()):
+        for job in groups.pop(mp_payment_id):
+            _mark_coalesced(job)
+            stats["pool"] += 1
+    if not groups:
+        return stats
+
+    recently_done = set(
+        WebhookJob.objects.filter(
+            _recently_fetched(_dedup_window_start()), mp_payment_id__in=groups.keys()
+        ).values_list("mp_payment_id", flat=True)
+    )
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [
+            (group, executor.submit(_fetch_payment_info, mp_payment_id))
+            for mp_payment_id, group in groups.items()
+            if mp_payment_id not in recently_done
+        ]
+
+        for mp_payment_id in recently_done & groups.keys():
+            for job in groups[mp_payment_id]:
+                _mark_coalesced(job)
+                stats["coalesced"] += 1
+
+        for group, future in futures:
+            job, duplicates = group[0], group[1:]
+            with correlation(webhook_job_id=job.id, mp_payment_id=job.mp_payment_id):
+                try:
+                    payment_data = future.result()
+                    if not payment_data:
+                        raise RuntimeError("Pagamento não encontrado no Mercado Pago")
+
+                    update_result = update_payment_status(
+                        payment_id=job.mp_payment_id,
+                        status=payment_data.get("status"),
+                        status_detail=payment_data.get("status_detail"),
+                        date_approved=payment_data.get("date_approved"),
+                        external_reference=payment_data.get("external_reference"),
+                    )
+                    if not update_result["success"]:
+                        raise RuntimeError(update_result["message"])
+
+                    _mark_done(job)
+                    stats["done"] += 1
+                except Exception as e:
+                    _mark_failed(job, str(e))
+                    stats["dead" if job.status == "dead" else "retried"] += 1
+                    logger.warning(
+                        "Falha ao processar notificação do Mercado Pago",
+                        extra={"error": str(e), "attempts": job.attempts, "job_status": job.status},
+                    )
+
+            # Duplicatas seguem o resultado (ou a nova tentativa) do primeiro job
+            for duplicate in duplicates:
+                _mark_coalesced(duplicate)
+                stats["coalesced"] += 1
+
+    return stats